@@ -4,9 +4,15 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, Query
 
-from backend.app.admin.schema.login_log import GetLoginLogDetail
+from backend.app.admin.schema.login_log import GetLoginLogDetail, SearchLoginLogParam
 from backend.app.admin.service.login_log_service import login_log_service
-from backend.common.pagination import DependsPagination, PageData, paging_data
+from backend.common.pagination import (
+    CursorPageData,
+    DependsPagination,
+    PageData,
+    cursor_paging_data,
+    paging_data,
+)
 from backend.common.response.response_schema import ResponseModel, ResponseSchemaModel, response_base
 from backend.common.security.jwt import DependsJwtAuth
 from backend.common.security.permission import RequestPermission
@@ -35,6 +41,22 @@ async def get_pagination_login_logs(
     return response_base.success(data=page_data)
 
 
+@router.post(
+    '/search',
+    summary='游标分页获取登录日志',
+    dependencies=[DependsJwtAuth],
+)
+async def search_login_logs(
+    db: CurrentSession, obj: SearchLoginLogParam
+) -> ResponseSchemaModel[CursorPageData[GetLoginLogDetail]]:
+    """
+    分页参数放在请求体中，按游标翻页，深分页不会变慢；with_total 为 true 时才统计总数
+    """
+    log_select = await login_log_service.get_select(username=obj.username, status=obj.status, ip=obj.ip)
+    page_data = await cursor_paging_data(db, log_select, obj)
+    return response_base.success(data=page_data)
+
+
 @router.delete(
     '',
     summary='批量删除登录日志',
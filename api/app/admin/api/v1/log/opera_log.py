@@ -4,9 +4,15 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, Query
 
-from backend.app.admin.schema.opera_log import GetOperaLogDetail
+from backend.app.admin.schema.opera_log import GetOperaLogDetail, SearchOperaLogParam
 from backend.app.admin.service.opera_log_service import opera_log_service
-from backend.common.pagination import DependsPagination, PageData, paging_data
+from backend.common.pagination import (
+    CursorPageData,
+    DependsPagination,
+    PageData,
+    cursor_paging_data,
+    paging_data,
+)
 from backend.common.response.response_schema import ResponseModel, ResponseSchemaModel, response_base
 from backend.common.security.jwt import DependsJwtAuth
 from backend.common.security.permission import RequestPermission
@@ -35,6 +41,22 @@ async def get_pagination_opera_logs(
     return response_base.success(data=page_data)
 
 
+@router.post(
+    '/search',
+    summary='游标分页获取操作日志',
+    dependencies=[DependsJwtAuth],
+)
+async def search_opera_logs(
+    db: CurrentSession, obj: SearchOperaLogParam
+) -> ResponseSchemaModel[CursorPageData[GetOperaLogDetail]]:
+    """
+    分页参数放在请求体中，按游标翻页，深分页不会变慢；with_total 为 true 时才统计总数
+    """
+    log_select = await opera_log_service.get_select(username=obj.username, status=obj.status, ip=obj.ip)
+    page_data = await cursor_paging_data(db, log_select, obj)
+    return response_base.success(data=page_data)
+
+
 @router.delete(
     '',
     summary='批量删除操作日志',
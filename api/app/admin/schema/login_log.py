@@ -4,6 +4,7 @@ from datetime import datetime
 
 from pydantic import ConfigDict, Field
 
+from backend.common.pagination import CursorPageParams
 from backend.common.schema import SchemaBase
 
 
@@ -40,3 +41,11 @@ class GetLoginLogDetail(LoginLogSchemaBase):
 
     id: int = Field(description='日志 ID')
     created_time: datetime = Field(description='创建时间')
+
+
+class SearchLoginLogParam(SchemaBase, CursorPageParams):
+    """搜索登录日志参数"""
+
+    username: str | None = Field(None, description='用户名')
+    status: int | None = Field(None, description='状态')
+    ip: str | None = Field(None, description='IP 地址')
@@ -6,6 +6,7 @@ from typing import Any
 from pydantic import ConfigDict, Field
 
 from backend.common.enums import StatusType
+from backend.common.pagination import CursorPageParams
 from backend.common.schema import SchemaBase
 
 
@@ -48,3 +49,11 @@ class GetOperaLogDetail(OperaLogSchemaBase):
 
     id: int = Field(description='日志 ID')
     created_time: datetime = Field(description='创建时间')
+
+
+class SearchOperaLogParam(SchemaBase, CursorPageParams):
+    """搜索操作日志参数"""
+
+    username: str | None = Field(None, description='用户名')
+    status: int | None = Field(None, description='状态')
+    ip: str | None = Field(None, description='IP 地址')
@@ -2,10 +2,12 @@ from fastapi import APIRouter
 from loguru import logger
 from starlette.requests import Request
 
-from backend.app.client.schema.mcp import AddMcpServerParam
+from backend.app.client.schema.mcp import AddMcpApiParam, AddMcpServerParam
 from backend.app.client.service.mcp_server_service import mcp_server_service
-from backend.app.task.celery_task.tasks import create_serverless
+from backend.app.task.celery_task.tasks import create_serverless, introspect_local_mcp
+from backend.common.enums import McpServerType
 from backend.common.response.response_schema import ResponseModel, response_base
+from backend.common.security.jwt import DependsJwtAuth
 
 router = APIRouter()
 
@@ -21,6 +23,7 @@ router = APIRouter()
 @router.post(
     '/stdio',
     summary='编译mcp server stdio',
+    dependencies=[DependsJwtAuth],
 )
 async def compile_stdio(request: Request, obj: AddMcpServerParam) -> ResponseModel:
     """
@@ -28,6 +31,7 @@ async def compile_stdio(request: Request, obj: AddMcpServerParam) -> ResponseMod
     1. 提交到阿里云serverless
     2. 查询可用的资源 使用官方API
     3. 如果有tool 则获取tool_list
+    server_type 为 local 时不部署，调用时在本机以 stdio 子进程运行，仅管理员可注册，只能运行允许的 npx / uvx 包
     :param request:
     :param obj:
     :return:
@@ -37,6 +41,12 @@ async def compile_stdio(request: Request, obj: AddMcpServerParam) -> ResponseMod
     mcp_server = list(obj.mcpServers.items())[0]
 
     mcp_title, mcp_config = mcp_server
+    if obj.server_type == McpServerType.local:
+        # 本地运行：调用时在本机启动 stdio 子进程，只需要获取工具列表
+        mcp_server_id, command = await mcp_server_service.add_local_mcp(request, mcp_title, obj, mcp_config)
+        introspect_local_mcp.delay(mcp_server_id, command)
+        return response_base.success(data={'id': mcp_server_id})
+
     base_command = mcp_server_service.compile_command(mcp_config)
     image = mcp_server_service.get_base_image(mcp_config.command)
     logger.info(f'mcp_title: {mcp_title}, base_command: {base_command}, image:{image}, env: {mcp_config.env}')
@@ -52,6 +62,23 @@ async def compile_stdio(request: Request, obj: AddMcpServerParam) -> ResponseMod
     return response_base.success()
 
 
+@router.post(
+    '/api',
+    summary='注册 OpenAPI 转发的 mcp server',
+    dependencies=[DependsJwtAuth],
+)
+async def register_api(request: Request, obj: AddMcpApiParam) -> ResponseModel:
+    """
+    解析 OpenAPI 文档，每个接口转换为一个工具，调用时在进程内直接转发，无需构建和部署
+    文档地址和接口地址只能指向公网
+    :param request:
+    :param obj:
+    :return:
+    """
+    mcp_server_id = await mcp_server_service.add_api_mcp(request, obj)
+    return response_base.success(data={'id': mcp_server_id})
+
+
 @router.post(
     '/package',
     summary='编译mcp package',
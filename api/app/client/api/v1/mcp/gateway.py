@@ -0,0 +1,51 @@
+from typing import Annotated, List
+
+from fastapi import APIRouter, Path, Query, Request
+from starlette.responses import Response
+
+from backend.app.client.schema.bundle import AddMcpBundleParam, GetMcpBundleDetail
+from backend.app.client.service.mcp_gateway_service import mcp_gateway_service
+from backend.common.response.response_schema import ResponseModel, ResponseSchemaModel, response_base
+from backend.common.security.jwt import DependsJwtAuth
+from backend.utils.request_parse import parse_mcp_caller
+
+router = APIRouter()
+
+
+@router.get('/sse', summary='聚合网关 SSE 端点')
+async def gateway_sse(
+    request: Request,
+    mcp_ids: Annotated[List[int], Query(description='聚合的 mcp server id 列表')],
+) -> Response:
+    """
+    将多个 mcp server 聚合为一个 mcp 端点，agent 只需保持一个连接
+
+    工具、提示词以 mcp{mcp_id}__{name} 命名，资源 URI 为 wemcp://mcp{mcp_id}/{原始 URI}
+    """
+    return await mcp_gateway_service.connect(mcp_ids, parse_mcp_caller(request))
+
+
+@router.get('/bundle/{bundle_id}/sse', summary='组合网关 SSE 端点')
+async def bundle_sse(request: Request, bundle_id: Annotated[int, Path(description='组合 id')]) -> Response:
+    bundle = await mcp_gateway_service.get_bundle(bundle_id)
+    return await mcp_gateway_service.connect(bundle.mcp_ids, parse_mcp_caller(request))
+
+
+@router.post('/messages/', summary='聚合网关消息端点')
+async def gateway_messages() -> Response:
+    """
+    客户端通过 SSE 的 endpoint 事件获取该地址，session_id 由 SSE 连接分配
+    """
+    return mcp_gateway_service.handle_message()
+
+
+@router.post('/bundle', summary='保存 mcp server 组合', dependencies=[DependsJwtAuth])
+async def add_bundle(request: Request, obj: AddMcpBundleParam) -> ResponseModel:
+    bundle_id = await mcp_gateway_service.add_bundle(request, obj)
+    return response_base.success(data={'id': bundle_id})
+
+
+@router.get('/bundle/{bundle_id}', summary='mcp server 组合详情')
+async def get_bundle(bundle_id: Annotated[int, Path(description='组合 id')]) -> ResponseSchemaModel[GetMcpBundleDetail]:
+    bundle = await mcp_gateway_service.get_bundle(bundle_id)
+    return response_base.success(data=bundle)
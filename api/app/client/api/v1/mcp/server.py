@@ -1,14 +1,35 @@
 from typing import Annotated, List
 
-from fastapi import APIRouter, Path
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from fastapi import APIRouter, Path, Query, Request, Response
+from starlette.responses import PlainTextResponse, StreamingResponse
 
-from backend.app.client.schema.mcp import CallToolParam, GetMcpDetail, GetMcpFeedDetail, SearchMcpParam
+from backend.app.client.conf import client_settings
+from backend.app.client.schema.mcp import (
+    BatchCallToolParam,
+    CallToolParam,
+    GetBatchCallToolResult,
+    GetMcpDetail,
+    GetMcpFeedDetail,
+    GetMcpHealthDetail,
+    GetMcpSearchPage,
+    GetMcpSuggestDetail,
+    GetMcpToolDetail,
+    SearchMcpParam,
+    SearchMcpToolParam,
+    UpdateMcpPublicParam,
+    UpdateMcpReplicaParam,
+    UpdateMcpUserKeyParam,
+)
 from backend.app.client.service.mcp_server_service import mcp_server_service
-from backend.common.pagination import DependsPagination, PageData, paging_data
-from backend.common.response.response_schema import ResponseSchemaModel, response_base
+from backend.app.client.utils.etag import build_etag, etag_matches, not_modified, set_etag
+from backend.app.client.utils.mcp_call import cancel_on_disconnect
+from backend.common.enums import McpSearchMode
+from backend.common.pagination import CursorPageData, cursor_paging_data
+from backend.common.response.response_schema import ResponseModel, ResponseSchemaModel, response_base
+from backend.common.security.jwt import DependsJwtAuth
 from backend.database.db import CurrentSession
+from backend.utils.request_parse import parse_mcp_caller
+from backend.utils.timezone import timezone
 
 router = APIRouter()
 
@@ -16,58 +37,292 @@ router = APIRouter()
 @router.post(
     '/search',
     summary='搜索mcp',
-    dependencies=[
-        DependsPagination,
-    ],
 )
 async def search_mcp(
+    request: Request,
+    response: Response,
     db: CurrentSession,
     obj: SearchMcpParam,
-) -> ResponseSchemaModel[PageData[GetMcpDetail]]:
+) -> ResponseSchemaModel[GetMcpSearchPage]:
     """
     后台基础搜索：关键字搜索，支持排序、分类过滤、分页
-    1. 一期支持分类过滤、搜索、分页
+    1. 一期支持分类、标签、运行方式过滤、搜索、分页
     2. 二期支持排序
+    关键字检索标题、描述、总结及工具，结果按相关度排序
+    mode 为 semantic 时按语义相似度排序，hybrid 时与关键字相关度按 semantic_weight 加权
+    mode 为 fusion 时关键字与语义检索结果按 RRF 合并后按调用量重排，debug 为 true 时返回 explain
+    facets 为预先统计的分面计数，不随搜索条件变化
+    分页参数放在请求体中，按游标翻页，with_total 为 true 时才统计总数
+    响应带 ETag（目录版本号与搜索参数），请求头 If-None-Match 一致时返回 304，不查询数据库
+    :param request:
+    :param response:
     :param obj: 搜索参数
     :param db:
     :return:
     """
-    keyword = obj.keyword
-    mcp_select = await mcp_server_service.get_select(keyword=keyword)
-    page_data = await paging_data(db, mcp_select)
+    fusion = obj.mode == McpSearchMode.fusion and bool(obj.keyword)
+    # 融合搜索的调用量按天统计，排序每天变化
+    day = str(timezone.now().date()) if fusion else None
+    etag = await mcp_server_service.get_catalog_etag('search', obj.model_dump(mode='json'), day)
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    if fusion:
+        page_data = await mcp_server_service.search_fusion(obj)
+    else:
+        mcp_select = await mcp_server_service.get_select(
+            keyword=obj.keyword,
+            category_id=obj.category_id,
+            tag_ids=obj.tag_ids,
+            server_type=obj.server_type,
+            mode=obj.mode,
+            semantic_weight=obj.semantic_weight,
+        )
+        await mcp_server_service.prepare_search(db, obj.mode)
+        page_data = await cursor_paging_data(db, mcp_select, obj)
+    page_data['facets'] = await mcp_server_service.get_facets()
+    set_etag(response, etag)
+    return response_base.success(data=page_data)
+
+
+@router.post('/tool/search', summary='检索工具')
+async def search_tool(
+    request: Request,
+    response: Response,
+    db: CurrentSession,
+    obj: SearchMcpToolParam,
+) -> ResponseSchemaModel[CursorPageData[GetMcpToolDetail]]:
+    """
+    检索公开 server 的工具，按工具名称排序
+
+    params 中每个条件按参数名称匹配，type、required 不为空时同时匹配，如 [{"name": "query", "type": "string"}]
+    嵌套参数以 . 连接，数组元素的属性以 [] 标记，如 options.limit、items[].id
+    响应带 ETag（目录版本号与检索参数），请求头 If-None-Match 一致时返回 304，不查询数据库
+    :param request:
+    :param response:
+    :param db:
+    :param obj: 检索参数
+    :return:
+    """
+    etag = await mcp_server_service.get_catalog_etag('tool', obj.model_dump(mode='json'))
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    tool_select = await mcp_server_service.get_tool_select(name=obj.name, keyword=obj.keyword, params=obj.params)
+    page_data = await cursor_paging_data(db, tool_select, obj)
+    set_etag(response, etag)
     return response_base.success(data=page_data)
 
 
+@router.get('/suggest', summary='输入联想')
+async def suggest_mcp(
+    keyword: Annotated[str, Query(min_length=1, max_length=64, description='关键字')],
+    size: Annotated[int, Query(ge=1, le=client_settings.MCP_SUGGEST_MAX_SIZE, description='数量')] = 10,
+) -> ResponseSchemaModel[List[GetMcpSuggestDetail]]:
+    """
+    按前缀匹配公开 server 的标题、标签和工具名称，关键字不少于 3 个字符时同时按包含匹配
+    完整文本前缀匹配的排在前面，其次是词前缀匹配（如 search 匹配 web_search），同级按包含的 server 数量降序
+    结果来自进程内索引，server 变更后通过 Redis 发布订阅同步，不查询数据库
+    :param keyword: 关键字
+    :param size: 数量
+    :return:
+    """
+    result = mcp_server_service.get_suggestions(keyword, size)
+    return response_base.success(data=result)
+
+
 @router.get(
     '/detail/{mcp_id}',
     summary='mcp detail',
 )
-async def get_mcp(mcp_id: Annotated[int, Path(description='mcp_id')]) -> ResponseSchemaModel[GetMcpDetail | None]:
+async def get_mcp(
+    request: Request, response: Response, mcp_id: Annotated[int, Path(description='mcp_id')]
+) -> ResponseSchemaModel[GetMcpDetail | None]:
     """
-    todo: 异步唤醒云函数
+    返回详情的同时在后台唤醒云函数
+
+    熔断健康状态随调用实时变化，通过 /detail/{mcp_id}/health 单独获取
+    响应带 ETag（server 版本号），请求头 If-None-Match 一致时返回 304，不查询数据库
     """
-    result = await mcp_server_service.get_mcp(mcp_id)
+    etag = await mcp_server_service.get_mcp_detail_etag(mcp_id)
+    if etag and etag_matches(request, etag):
+        await mcp_server_service.warm_mcp(mcp_id)
+        return not_modified(etag)
+    result = await mcp_server_service.get_mcp_detail(mcp_id)
+    set_etag(response, etag)
+    return response_base.success(data=result)
+
+
+@router.get(
+    '/detail/{mcp_id}/health',
+    summary='mcp 健康状态',
+)
+async def get_mcp_health(mcp_id: Annotated[int, Path(description='mcp_id')]) -> ResponseSchemaModel[GetMcpHealthDetail]:
+    """
+    熔断健康状态，state 非 closed 时前端标记为降级；随调用实时变化，不带 ETag
+    """
+    result = await mcp_server_service.get_mcp_health(mcp_id)
     return response_base.success(data=result)
 
 
 @router.get('/feed')
-async def get_feed() -> ResponseSchemaModel[List[GetMcpFeedDetail] | None]:
+async def get_feed(
+    request: Request,
+    response: Response,
+    page: Annotated[int, Query(ge=1, description='页码')] = 1,
+    size: Annotated[int, Query(ge=1, le=client_settings.MCP_FEED_MAX_PAGE_SIZE, description='每页数量')] = 20,
+) -> ResponseSchemaModel[List[GetMcpFeedDetail] | None]:
+    """
+    仅显示最近一周公开的，按更新时间倒序，由 server 公开或变更时写入 Redis，不查询数据库
+    列表项会随时间移出，ETag 按本页内容生成
+    """
+    result = await mcp_server_service.get_feed(page, size)
+    etag = build_etag('feed', result)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return response_base.success(data=result)
+
+
+@router.post('/call/batch', summary='批量调用工具')
+async def call_tool_batch(
+    request: Request, obj: BatchCallToolParam
+) -> ResponseSchemaModel[List[GetBatchCallToolResult]]:
     """
-    仅显示最近一周的
+    批量调用工具，同一 mcp server 的调用共用一个会话并发执行，结果按请求顺序返回
     """
-    result = await mcp_server_service.get_mcp_last_7_day()
+    result = await cancel_on_disconnect(request, mcp_server_service.call_tool_batch(obj, parse_mcp_caller(request)))
     return response_base.success(data=result)
 
 
 @router.post('/call/{mcp_id}')
-async def call_tool(mcp_id: Annotated[int, Path(description='mcp_id')], call_param: CallToolParam):
+async def call_tool(request: Request, mcp_id: Annotated[int, Path(description='mcp_id')], call_param: CallToolParam):
+    """
+    根据mcp_id查询 sse_url，复用会话池中的会话调用工具
+
+    受每日调用配额限制：X-Agent-Id 标识 agent 调用，携带 X-Mcp-User-Key 时使用用户自己的 key，不计配额；
+    X-Request-Timeout 指定超时时间（秒），不超过 server 配置的上限，超时或客户端断开时取消上游调用
+    """
+    result = await cancel_on_disconnect(
+        request, mcp_server_service.call_tool(mcp_id, call_param, parse_mcp_caller(request))
+    )
+    return response_base.success(data=await mcp_server_service.dump_result(mcp_id, call_param.tool_name, result))
+
+
+@router.post('/call/{mcp_id}/stream', summary='流式调用工具')
+async def call_tool_stream(
+    request: Request, mcp_id: Annotated[int, Path(description='mcp_id')], call_param: CallToolParam
+) -> StreamingResponse:
+    """
+    以 SSE 返回工具调用：progress 为上游进度通知，content 为结果内容分片，最后以 result 或 error 事件结束
+    """
+    stream = await mcp_server_service.stream_tool(mcp_id, call_param, parse_mcp_caller(request))
+    return StreamingResponse(
+        stream,
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.get(
+    '/warmup/stats',
+    summary='冷启动统计',
+    dependencies=[DependsJwtAuth],
+)
+async def get_warmup_stats(
+    limit: Annotated[int, Query(ge=1, le=200, description='按近期调用量排序的数量')] = 20,
+) -> ResponseModel:
+    result = await mcp_server_service.get_warmup_stats(limit)
+    return response_base.success(data=result)
+
+
+@router.get(
+    '/metrics',
+    summary='调用耗时指标',
+    dependencies=[DependsJwtAuth],
+)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Prometheus 文本格式，按 phase（connect / initialize / call / serialize）、mcp_id、tool、outcome 统计，汇总所有 worker
+    """
+    result = await mcp_server_service.get_metrics()
+    return PlainTextResponse(result, media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@router.put(
+    '/{mcp_id}/replicas',
+    summary='更新副本端点',
+    dependencies=[DependsJwtAuth],
+)
+async def update_replicas(
+    request: Request, mcp_id: Annotated[int, Path(description='mcp_id')], obj: UpdateMcpReplicaParam
+) -> ResponseModel:
+    """
+    配置部署在其他地域的相同 server，调用时选择耗时最低的副本，幂等工具超过 p95 耗时未返回时向下一个副本对冲
+    仅所有者或管理员可操作
+    """
+    result = await mcp_server_service.update_replicas(request, mcp_id, obj)
+    return response_base.success(data=result)
+
+
+@router.put(
+    '/{mcp_id}/public',
+    summary='公开或取消公开',
+    dependencies=[DependsJwtAuth],
+)
+async def update_public(
+    request: Request, mcp_id: Annotated[int, Path(description='mcp_id')], obj: UpdateMcpPublicParam
+) -> ResponseModel:
     """
-    根据mcp_id查询 sse_url
+    取消公开后立即从搜索结果中移除，重新公开后在后台生成语义检索向量，仅所有者或管理员可操作
     """
-    mcp_server = await mcp_server_service.get_mcp(mcp_id)
-    async with sse_client(f'{mcp_server.mcp_endpoint}/sse') as streams:
-        async with ClientSession(streams[0], streams[1]) as session:
-            await session.initialize()
-            # maps_geo {'address': '大望路', 'city': '北京'}
-            result = await session.call_tool(call_param.tool_name, call_param.arguments)
-            return response_base.success(data=result)
+    await mcp_server_service.set_public(request, mcp_id, obj.is_public)
+    return response_base.success()
+
+
+@router.put(
+    '/{mcp_id}/key',
+    summary='保存自己的 key',
+    dependencies=[DependsJwtAuth],
+)
+async def update_user_key(
+    request: Request, mcp_id: Annotated[int, Path(description='mcp_id')], obj: UpdateMcpUserKeyParam
+) -> ResponseModel:
+    """
+    只保存摘要，之后调用时请求头 X-Mcp-User-Key 与保存的 key 一致才不计免费次数，仍受 server 每日上限限制
+    """
+    await mcp_server_service.set_user_key(mcp_id, parse_mcp_caller(request), obj.user_key)
+    return response_base.success()
+
+
+@router.get(
+    '/hedge/stats',
+    summary='对冲请求统计',
+    dependencies=[DependsJwtAuth],
+)
+async def get_hedge_stats() -> ResponseModel:
+    result = mcp_server_service.get_hedge_stats()
+    return response_base.success(data=result)
+
+
+@router.get(
+    '/cache/stats',
+    summary='工具结果缓存命中统计',
+    dependencies=[DependsJwtAuth],
+)
+async def get_tool_cache_stats() -> ResponseModel:
+    result = mcp_server_service.get_tool_cache_stats()
+    return response_base.success(data=result)
+
+
+@router.delete(
+    '/cache/{mcp_id}',
+    summary='失效工具结果缓存',
+    dependencies=[DependsJwtAuth],
+)
+async def invalidate_tool_cache(
+    request: Request,
+    mcp_id: Annotated[int, Path(description='mcp_id')],
+    tool_name: Annotated[str | None, Query(description='工具名称，为空时失效全部工具')] = None,
+) -> ResponseModel:
+    """仅所有者或管理员可操作"""
+    await mcp_server_service.invalidate_tool_cache(request, mcp_id, tool_name)
+    return response_base.success()
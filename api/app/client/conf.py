@@ -25,6 +25,176 @@ class ClientSettings(BaseSettings):
     # redirect fronted
     OAUTH2_FRONTEND_REDIRECT_URI: str = 'http://localhost:3000/auth/callback'
 
+    # MCP 会话池
+    MCP_SESSION_POOL_MAX_SIZE: int = 4  # 每个 mcp server 的最大会话数
+    MCP_SESSION_MAX_CONCURRENCY: int = 16  # 单个会话的最大并发请求数
+    MCP_SESSION_IDLE_TIMEOUT: int = 300  # 空闲会话回收时间（秒）
+    MCP_SESSION_PING_INTERVAL: int = 60  # 空闲会话健康检查间隔（秒）
+    MCP_SESSION_CONNECT_TIMEOUT: int = 30  # 建立会话超时时间（秒）
+    MCP_SESSION_ACQUIRE_TIMEOUT: int = 30  # 等待可用会话超时时间（秒）
+
+    # MCP 多副本对冲请求（仅对标记为幂等的工具）
+    MCP_HEDGE_MAX_ATTEMPTS: int = 2  # 单次调用最多发送到的副本数
+    MCP_HEDGE_QUANTILE: float = 0.95  # 超过该分位耗时仍未返回时向下一个副本发送请求
+    MCP_HEDGE_WINDOW: int = 200  # 每个工具保留的最近耗时样本数
+    MCP_HEDGE_MIN_SAMPLES: int = 20  # 样本数不足时使用默认对冲延迟
+    MCP_HEDGE_DEFAULT_DELAY: float = 1  # 默认对冲延迟（秒）
+    MCP_HEDGE_MIN_DELAY: float = 0.05  # 对冲延迟下限（秒），避免耗时极短的工具请求量翻倍
+    MCP_HEDGE_EWMA_ALPHA: float = 0.2  # 副本耗时指数移动平均的平滑系数
+    MCP_HEDGE_FAILURE_PENALTY: float = 10  # 副本请求失败时计入的耗时（秒）
+
+    # MCP 本地 stdio 进程池（server_type 为 local 的 server 在本机以子进程运行，仅管理员可注册）
+    MCP_STDIO_ALLOWED_PACKAGES: list[str] = [
+        '@playwright/mcp',
+        '@modelcontextprotocol/server-filesystem',
+        '@modelcontextprotocol/server-memory',
+        '@modelcontextprotocol/server-sequential-thinking',
+        'mcp-server-fetch',
+        'mcp-server-time',
+    ]  # 允许通过 npx / uvx 运行的包，不含版本号
+    MCP_STDIO_USER: str | None = None  # 运行子进程的系统用户，为空时与 API 进程相同，生产环境应配置为无权限的用户
+    MCP_STDIO_HOME: str = '/tmp/wemcp-stdio'  # 子进程的 HOME 和工作目录，不使用 API 进程的 HOME
+    MCP_STDIO_POOL_MAX_SIZE: int = 2  # 每个 mcp server 的最大进程数
+    MCP_STDIO_MAX_CONCURRENCY: int = 4  # 单个进程的最大并发请求数
+    MCP_STDIO_MAX_CALLS: int = 500  # 单个进程处理该数量的调用后回收，0 表示不限制
+    MCP_STDIO_MAX_MEMORY_MB: int = 1024  # 单个进程（含子进程）的内存上限，超出后回收，0 表示不限制
+    MCP_STDIO_MEMORY_CHECK_INTERVAL: int = 10  # 进程内存检查间隔（秒）
+    MCP_STDIO_TERMINATE_TIMEOUT: float = 3  # 进程退出等待时间（秒），超时后强制结束
+
+    # MCP Streamable HTTP 共享连接池
+    MCP_HTTP_MAX_CONNECTIONS: int = 500
+    MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    MCP_HTTP_KEEPALIVE_EXPIRY: int = 60  # 空闲连接保活时间（秒）
+    # SSE 会话独占一条 GET 长连接，使用独立的连接池，避免占满 Streamable HTTP 共享连接池
+    MCP_SSE_MAX_CONNECTIONS: int = 200  # 含 GET 长连接和消息 POST 请求，超出后等待可用连接
+    MCP_SSE_MAX_KEEPALIVE_CONNECTIONS: int = 50
+
+    # MCP 工具结果缓存
+    MCP_TOOL_CACHE_REDIS_PREFIX: str = 'wemcp:mcp:tool_cache'
+    MCP_TOOL_CACHE_LOCAL_MAX_SIZE: int = 2048  # 进程内 LRU 最大条目数
+    MCP_TOOL_CACHE_LOCAL_TTL: int = 10  # 进程内缓存最长存活时间（秒），限制跨进程失效的延迟
+
+    # MCP 工具调用超时
+    MCP_CALL_TIMEOUT: int = 60  # 未配置 McpServer.call_timeout 时的默认超时时间及上限（秒）
+
+    # MCP 工具调用路由缓存
+    MCP_ROUTE_CACHE_REDIS_PREFIX: str = 'wemcp:mcp:route'
+    MCP_ROUTE_CACHE_TTL: int = 3600  # Redis 缓存过期时间（秒），长期未调用的 mcp server 不再占用 Redis
+    MCP_ROUTE_CACHE_LOCAL_MAX_SIZE: int = 4096  # 进程内 LRU 最大条目数
+    MCP_ROUTE_CACHE_LOCAL_TTL: int = 10  # 进程内缓存最长存活时间（秒），限制跨进程失效的延迟
+
+    # MCP 调用配额，按天统计，0 表示不限制
+    MCP_QUOTA_REDIS_PREFIX: str = 'wemcp:mcp:quota'
+    MCP_QUOTA_SERVER_DAILY: int = 1000  # 每个 mcp server 每天的调用次数
+    MCP_QUOTA_USER_DAILY: int = 100  # 每个用户每天的免费调用次数
+    MCP_QUOTA_AGENT_DAILY: int = 100  # 每个 agent 每天的免费调用次数
+    MCP_QUOTA_FLUSH_BATCH_SIZE: int = 1000  # 调用量落库的单批行数
+
+    # MCP 相同调用合并
+    MCP_SINGLE_FLIGHT_REDIS: bool = False  # 是否通过 Redis 锁跨 worker 合并
+    MCP_SINGLE_FLIGHT_REDIS_PREFIX: str = 'wemcp:mcp:single_flight'
+    MCP_SINGLE_FLIGHT_LOCK_TTL: float = 60  # 锁的最长持有时间（秒），也是等待其他 worker 结果的最长时间
+    MCP_SINGLE_FLIGHT_RESULT_TTL: float = 5  # 结果保留时间（秒），只需覆盖等待方的轮询间隔
+    MCP_SINGLE_FLIGHT_POLL_INTERVAL: float = 0.05  # 等待其他 worker 结果的轮询间隔（秒）
+
+    # MCP 批量工具调用
+    MCP_BATCH_MAX_SIZE: int = 50  # 单次批量调用的最大数量
+    MCP_BATCH_MAX_CONCURRENCY: int = 8  # 单次批量调用的最大并发数
+    MCP_BATCH_ITEM_TIMEOUT: int = 60  # 单个调用的默认超时时间（秒）
+
+    # MCP 流式工具调用
+    MCP_STREAM_PROGRESS_QUEUE_SIZE: int = 64  # 未发送的进度通知上限，超出时丢弃最旧的
+    MCP_STREAM_CHUNK_SIZE: int = 16 * 1024  # 内容分片大小（字符）
+
+    # MCP 熔断
+    MCP_CIRCUIT_REDIS_PREFIX: str = 'wemcp:mcp:circuit'
+    MCP_CIRCUIT_WINDOW_SECONDS: int = 60  # 统计窗口（秒）
+    MCP_CIRCUIT_BUCKET_SECONDS: int = 10  # 窗口分桶粒度（秒）
+    MCP_CIRCUIT_MIN_CALLS: int = 10  # 窗口内调用数达到该值才会判定熔断
+    MCP_CIRCUIT_ERROR_RATE: float = 0.5  # 错误率阈值
+    MCP_CIRCUIT_SLOW_CALL_SECONDS: float = 10  # 慢调用阈值（秒）
+    MCP_CIRCUIT_SLOW_RATE: float = 0.8  # 慢调用率阈值
+    MCP_CIRCUIT_OPEN_SECONDS: int = 30  # 熔断持续时间（秒），之后进入半开状态放行一个探测请求
+    MCP_CIRCUIT_PROBE_TIMEOUT: int = 60  # 半开探测请求的最长占用时间（秒）
+    MCP_CIRCUIT_LOCAL_TTL: float = 1  # 进程内状态快照有效期（秒）
+
+    # MCP OpenAPI 转发
+    MCP_API_RESPONSE_MAX_SIZE: int = 256 * 1024  # 接口响应读取的最大字节数，超出部分丢弃
+    MCP_API_DOCUMENT_MAX_SIZE: int = 5 * 1024 * 1024  # OpenAPI 文档下载的最大字节数
+    MCP_API_REF_MAX_NODES: int = 50000  # OpenAPI 文档 $ref 展开产生的最大节点数，超出时拒绝注册
+    MCP_API_ALLOW_PRIVATE_NETWORK: bool = False  # 是否允许访问内网地址，仅用于本地开发
+
+    # MCP 调用耗时指标
+    MCP_METRICS_REDIS_KEY: str = 'wemcp:mcp:metrics'
+    MCP_METRICS_BUCKETS: list[float] = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+        30,
+        60,
+    ]  # 直方图桶上限（秒）
+    MCP_METRICS_FLUSH_INTERVAL: float = 5  # 进程内数据累加到 Redis 的间隔（秒）
+
+    # MCP 聚合网关
+    MCP_GATEWAY_MAX_SERVERS: int = 20  # 单个网关连接最多聚合的 mcp server 数量
+    MCP_GATEWAY_SEPARATOR: str = '__'  # 工具、提示词名称的命名空间分隔符，如 mcp12__maps_geo
+    MCP_GATEWAY_LIST_TIMEOUT: float = 10  # 列出单个上游工具、提示词、资源的超时时间（秒）
+
+    # MCP 搜索分面计数
+    MCP_FACET_REDIS_PREFIX: str = 'wemcp:mcp:facet'
+    MCP_FACET_LOCAL_TTL: float = 5  # 进程内缓存时间（秒）
+
+    # MCP 全文检索
+    MCP_SEARCH_REBUILD_BATCH_SIZE: int = 200  # 重建全文检索列的单批 server 数量
+
+    # MCP 语义检索（向量保存在 postgresql pgvector）
+    MCP_EMBEDDING_PROVIDER: str = 'local'  # local：本地哈希向量 openai：OpenAI 兼容的 embeddings 接口
+    MCP_EMBEDDING_DIMENSION: int = 512  # 向量维度，与表结构一致，修改后需重建 mcp_embedding 表
+    MCP_EMBEDDING_API_URL: str = 'https://dashscope.aliyuncs.com/compatible-mode/v1/embeddings'
+    MCP_EMBEDDING_API_KEY: str = ''
+    MCP_EMBEDDING_MODEL: str = 'text-embedding-v3'
+    MCP_EMBEDDING_TIMEOUT: float = 30  # embeddings 接口超时时间（秒）
+    MCP_EMBEDDING_MAX_CHARS: int = 8000  # 生成向量的文本最大长度（字符）
+    MCP_EMBEDDING_EF_SEARCH: int = 200  # HNSW 检索的候选数量下限，过小时靠后的分页会缺少结果
+
+    # MCP 最新列表
+    MCP_FEED_REDIS_PREFIX: str = 'wemcp:mcp:feed'
+    MCP_FEED_DAYS: int = 7  # 列表包含最近多少天创建的公开 server
+    MCP_FEED_MAX_PAGE_SIZE: int = 100  # 单页最大数量
+
+    # MCP 响应 ETag
+    MCP_VERSION_REDIS_KEY: str = 'wemcp:mcp:version'
+
+    # MCP 融合搜索（关键字与语义检索结果按 RRF 合并后按调用量重排）
+    MCP_FUSION_CANDIDATES: int = 200  # 每路检索的候选数量，也是可翻页的结果上限
+    MCP_FUSION_RRF_K: int = 60  # RRF 平滑常数，越大排名靠后的结果占比越高
+    MCP_FUSION_KEYWORD_WEIGHT: float = 1  # 关键字检索的权重
+    MCP_FUSION_SEMANTIC_WEIGHT: float = 1  # 语义检索的权重
+    MCP_FUSION_POPULARITY_WEIGHT: float = 0.5  # 调用量的权重，为 1 时调用量最高的 server 加分与单路排名第一相同
+    MCP_FUSION_POPULARITY_DAYS: int = 30  # 调用量统计天数，不含当天，同一天内翻页排序不变
+
+    # MCP 输入联想（进程内前缀与三元组索引，通过 Redis 发布订阅同步变更）
+    MCP_SUGGEST_REDIS_CHANNEL: str = 'wemcp:mcp:suggest'
+    MCP_SUGGEST_MAX_SIZE: int = 20  # 单次返回的最大数量
+    MCP_SUGGEST_MAX_SCAN: int = 200  # 前缀匹配最多检查的词数量，过短的前缀只检查按字典序靠前的词
+    MCP_SUGGEST_RETRY_INTERVAL: float = 5  # 订阅断开后重连的间隔（秒）
+
+    # MCP serverless 预热
+    MCP_WARMUP_REDIS_PREFIX: str = 'wemcp:mcp:warmup'
+    MCP_WARMUP_DEBOUNCE_SECONDS: int = 60  # 同一 server 详情页预热的最小间隔（秒）
+    MCP_WARMUP_TOP_N: int = 20  # 定时预热调用量最高的 server 数量
+    MCP_WARMUP_WINDOW_HOURS: int = 24  # 调用量统计窗口（小时）
+    MCP_WARMUP_CONCURRENCY: int = 5  # 定时预热并发数
+    MCP_WARMUP_COLD_START_SECONDS: float = 1.5  # 新建会话耗时超过该值视为命中冷启动
+
 
 @lru_cache
 def get_client_settings() -> ClientSettings:
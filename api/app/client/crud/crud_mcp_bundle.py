@@ -0,0 +1,17 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy_crud_plus import CRUDPlus
+
+from backend.app.client.model import McpBundle
+
+
+class CRUDMcpBundle(CRUDPlus[McpBundle]):
+    async def get_bundle(self, db: AsyncSession, pk: int) -> McpBundle | None:
+        return await self.select_model(db, pk)
+
+    async def add_bundle(self, db: AsyncSession, obj: McpBundle) -> int:
+        db.add(obj)
+        await db.flush()
+        return obj.id
+
+
+mcp_bundle_dao: CRUDMcpBundle = CRUDMcpBundle(McpBundle)
@@ -0,0 +1,76 @@
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy_crud_plus import CRUDPlus
+
+from backend.app.client.model import McpEmbedding
+from backend.core.conf import settings
+from backend.utils.timezone import timezone
+
+
+class CRUDMcpEmbedding(CRUDPlus[McpEmbedding]):
+    async def get_version(self, db: AsyncSession, pk: int) -> tuple[str, str] | None:
+        """
+        查询已有向量的模型和文本摘要
+
+        :param db:
+        :param pk: mcp server id
+        :return: (模型, 文本摘要)
+        """
+        stmt = select(self.model.model, self.model.content_hash).where(self.model.mcp_server_id == pk)
+        row = (await db.execute(stmt)).first()
+        return tuple(row) if row else None
+
+    async def upsert(self, db: AsyncSession, pk: int, embedding: list[float], model: str, content_hash: str) -> None:
+        """
+        写入向量，已存在时覆盖
+
+        :param db:
+        :param pk: mcp server id
+        :param embedding: 向量
+        :param model: 模型
+        :param content_hash: 文本摘要
+        :return:
+        """
+        now = timezone.now()
+        values = {
+            'mcp_server_id': pk,
+            'embedding': embedding,
+            'model': model,
+            'content_hash': content_hash,
+            'created_time': now,
+        }
+        if settings.DATABASE_TYPE == 'mysql':
+            stmt = mysql.insert(self.model).values(values)
+            changes = stmt.inserted
+        else:
+            stmt = postgresql.insert(self.model).values(values)
+            changes = stmt.excluded
+        set_ = {
+            'embedding': changes.embedding,
+            'model': changes.model,
+            'content_hash': changes.content_hash,
+            'updated_time': now,
+        }
+        if settings.DATABASE_TYPE == 'mysql':
+            stmt = stmt.on_duplicate_key_update(**set_)
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=[self.model.mcp_server_id], set_=set_)
+        await db.execute(stmt)
+
+    async def delete_embedding(self, db: AsyncSession, pk: int) -> int:
+        stmt = delete(self.model).where(self.model.mcp_server_id == pk)
+        return (await db.execute(stmt)).rowcount
+
+    async def set_ef_search(self, db: AsyncSession, ef_search: int) -> None:
+        """
+        设置当前事务的 HNSW 候选数量，检索结果最多只有该数量
+
+        :param db:
+        :param ef_search: 候选数量
+        :return:
+        """
+        await db.execute(text(f'SET LOCAL hnsw.ef_search = {int(ef_search)}'))
+
+
+mcp_embedding_dao: CRUDMcpEmbedding = CRUDMcpEmbedding(McpEmbedding)
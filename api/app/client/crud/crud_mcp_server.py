@@ -1,12 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
+from typing import Sequence
 
-from sqlalchemy import Select, desc, select
+from sqlalchemy import Float, Row, Select, desc, exists, func, literal, select, update
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm import load_only, noload, selectinload
 from sqlalchemy_crud_plus import CRUDPlus
 
-from backend.app.client.model import McpServer, McpTag, McpUser
+from backend.app.client.model import McpCategory, McpEmbedding, McpServer, McpTag, McpUser
+from backend.app.client.model.m2m import mcp_server_tag
 from backend.app.client.schema.mcp import UpdateMcpServerParam
+from backend.app.client.utils.search_index import build_search_document, build_search_query
+from backend.core.conf import settings
+from backend.utils.timezone import timezone
 
 
 class CRUDMcpServer(CRUDPlus[McpServer]):
@@ -26,36 +32,327 @@ class CRUDMcpServer(CRUDPlus[McpServer]):
     async def get_mcp(self, db: AsyncSession, pk: int) -> McpServer:
         return await self.select_model(db, pk)
 
+    async def get_mcp_list_by_ids(self, db: AsyncSession, pks: list[int]) -> Sequence[McpServer]:
+        return await self.select_models(db, id__in=pks)
+
+    async def get_mcp_routes(self, db: AsyncSession, pks: list[int]) -> Sequence[Row]:
+        """仅查询工具调用所需的列，避免加载 tools / prompts / resources 等大字段"""
+        stmt = select(
+            self.model.id,
+            self.model.mcp_endpoint,
+            self.model.mcp_endpoints,
+            self.model.transport,
+            self.model.cache_config,
+            self.model.call_timeout,
+            self.model.idempotent_tools,
+        ).where(self.model.id.in_(pks))
+        result = await db.execute(stmt)
+        return result.all()
+
+    async def get_api_config(self, db: AsyncSession, pk: int) -> dict | None:
+        stmt = select(self.model.api_config).where(self.model.id == pk)
+        return await db.scalar(stmt)
+
+    async def get_envs(self, db: AsyncSession, pk: int) -> dict | None:
+        stmt = select(self.model.envs).where(self.model.id == pk)
+        return await db.scalar(stmt)
+
     async def get_mcp_by_title(self, db: AsyncSession, mcp_user: McpUser, title: str) -> McpServer:
         return await self.select_model_by_column(db, user=mcp_user, title=title)
 
-    async def get_mcp_last_7_day(self) -> Select:
-        now = datetime.utcnow()
-        seven_days_ago = now - timedelta(days=7)
+    async def get_mcp_last_7_day(self, days: int = 7, pk: int | None = None) -> Select:
+        """
+        最近创建的公开 server，按更新时间倒序，仅加载列表展示的列
 
+        :param days: 天数
+        :param pk: mcp server id，仅查询该 server
+        :return:
+        """
         stmt = select(self.model).options(
+            load_only(
+                self.model.id,
+                self.model.title,
+                self.model.description,
+                self.model.capabilities,
+                self.model.user_id,
+                self.model.created_time,
+                self.model.updated_time,
+            ),
             selectinload(self.model.user),
             noload(self.model.category),
-            selectinload(self.model.tags).options(noload(McpTag.servers)),
+            noload(self.model.tags),
         )
 
-        stmt = stmt.filter(self.model.is_public is True)
-        stmt = stmt.filter(self.model.created_time >= seven_days_ago)
-        stmt = stmt.order_by(desc(self.model.updated_time))
+        stmt = stmt.where(self.model.is_public.is_(True))
+        stmt = stmt.where(self.model.created_time >= timezone.now() - timedelta(days=days))
+        if pk is not None:
+            stmt = stmt.where(self.model.id == pk)
+        stmt = stmt.order_by(desc(func.coalesce(self.model.updated_time, self.model.created_time)))
         return stmt
 
-    async def get_list(self, keyword: str | None = None) -> Select:
+    async def get_list(
+        self,
+        keyword: str | None = None,
+        category_id: int | None = None,
+        tag_ids: list[int] | None = None,
+        server_type: str | None = None,
+        embedding: list[float] | None = None,
+        semantic_weight: float = 1,
+    ) -> Select:
+        """
+        构建搜索查询
+
+        :param keyword: 关键字
+        :param category_id: 分类 id
+        :param tag_ids: 标签 id，需同时包含全部标签
+        :param server_type: 运行方式
+        :param embedding: 关键字的向量，不为空时按余弦相似度排序，仅 postgresql
+        :param semantic_weight: 余弦相似度的权重，小于 1 时与关键字相关度加权融合
+        :return:
+        """
         stmt = select(self.model).options(
             noload(self.model.category),
             noload(self.model.user),
             selectinload(self.model.tags).options(noload(McpTag.servers)),
         )
 
-        if keyword:
-            stmt = stmt.filter(self.model.title.ilike(f'%{keyword}%'))
-
-        stmt = stmt.where(self.model.is_public is True).order_by(desc(self.model.updated_time))
+        order_by = None
+        query = build_search_query(keyword) if keyword else None
+        if embedding is not None:
+            distance = McpEmbedding.embedding.op('<=>', return_type=Float)(embedding)
+            stmt = stmt.join(McpEmbedding, McpEmbedding.mcp_server_id == self.model.id)
+            if query is not None and semantic_weight < 1:
+                # 不要求匹配关键字，ts_rank_cd 归一化到 [0, 1) 后与相似度加权
+                rank = func.ts_rank_cd(self.model.search_vector, func.to_tsquery('simple', query), 32)
+                order_by = desc(semantic_weight * (1 - distance) + (1 - semantic_weight) * rank)
+            else:
+                # 直接按距离排序才能使用 HNSW 索引
+                order_by = distance
+        elif keyword:
+            if query is None:
+                # 关键字中没有可检索的词位（如单个字符、仅有符号）
+                stmt = stmt.filter(self.model.title.ilike(f'%{keyword}%'))
+            elif settings.DATABASE_TYPE == 'postgresql':
+                tsquery = func.to_tsquery('simple', query)
+                stmt = stmt.where(self.model.search_vector.op('@@')(tsquery))
+                order_by = desc(func.ts_rank_cd(self.model.search_vector, tsquery))
+            else:
+                rank = match(self.model.search_vector, against=query).in_natural_language_mode()
+                stmt = stmt.where(rank > 0)
+                order_by = desc(rank)
+        stmt = self._filter(stmt, category_id, tag_ids, server_type)
+        # 未更新过的 server 没有 updated_time，游标分页的排序键不能为 NULL
+        updated_time = func.coalesce(self.model.updated_time, self.model.created_time)
+        if order_by is not None:
+            stmt = stmt.order_by(order_by, desc(updated_time))
+        else:
+            stmt = stmt.order_by(desc(updated_time))
         return stmt
 
+    def _filter(
+        self, stmt: Select, category_id: int | None, tag_ids: list[int] | None, server_type: str | None
+    ) -> Select:
+        """
+        搜索的过滤条件
+
+        :param stmt: 查询语句
+        :param category_id: 分类 id
+        :param tag_ids: 标签 id，需同时包含全部标签
+        :param server_type: 运行方式
+        :return:
+        """
+        if category_id is not None:
+            stmt = stmt.where(self.model.category_id == category_id)
+        # 需同时包含全部标签
+        for tag_id in tag_ids or []:
+            stmt = stmt.where(
+                exists().where(mcp_server_tag.c.server_id == self.model.id, mcp_server_tag.c.tag_id == tag_id)
+            )
+        if server_type:
+            stmt = stmt.where(self.model.server_type == server_type)
+        # 查询时过滤，取消公开后立即从结果中移除
+        return stmt.where(self.model.is_public.is_(True))
+
+    async def get_keyword_candidates(
+        self,
+        db: AsyncSession,
+        keyword: str,
+        category_id: int | None,
+        tag_ids: list[int] | None,
+        server_type: str | None,
+        limit: int,
+    ) -> list[tuple[int, float]]:
+        """
+        按关键字相关度查询候选 server
+
+        :param db: 数据库会话
+        :param keyword: 关键字
+        :param category_id: 分类 id
+        :param tag_ids: 标签 id
+        :param server_type: 运行方式
+        :param limit: 数量
+        :return: [(mcp server id, 相关度)]，按相关度降序
+        """
+        query = build_search_query(keyword)
+        if query is None:
+            # 关键字中没有可检索的词位时按标题匹配，不区分相关度
+            score = literal(0.0)
+            condition = self.model.title.ilike(f'%{keyword}%')
+        elif settings.DATABASE_TYPE == 'postgresql':
+            tsquery = func.to_tsquery('simple', query)
+            score = func.ts_rank_cd(self.model.search_vector, tsquery)
+            condition = self.model.search_vector.op('@@')(tsquery)
+        else:
+            score = match(self.model.search_vector, against=query).in_natural_language_mode()
+            condition = score > 0
+        stmt = self._filter(select(self.model.id, score).where(condition), category_id, tag_ids, server_type)
+        stmt = stmt.order_by(desc(score), self.model.id).limit(limit)
+        return [(row[0], float(row[1])) for row in await db.execute(stmt)]
+
+    async def get_semantic_candidates(
+        self,
+        db: AsyncSession,
+        embedding: list[float],
+        category_id: int | None,
+        tag_ids: list[int] | None,
+        server_type: str | None,
+        limit: int,
+    ) -> list[tuple[int, float]]:
+        """
+        按与关键字向量的余弦距离查询候选 server，仅 postgresql
+
+        :param db: 数据库会话
+        :param embedding: 关键字的向量
+        :param category_id: 分类 id
+        :param tag_ids: 标签 id
+        :param server_type: 运行方式
+        :param limit: 数量
+        :return: [(mcp server id, 余弦距离)]，按距离升序
+        """
+        distance = McpEmbedding.embedding.op('<=>', return_type=Float)(embedding)
+        stmt = select(self.model.id, distance).join(McpEmbedding, McpEmbedding.mcp_server_id == self.model.id)
+        stmt = self._filter(stmt, category_id, tag_ids, server_type).order_by(distance).limit(limit)
+        return [(row[0], float(row[1])) for row in await db.execute(stmt)]
+
+    async def get_search_list(self, db: AsyncSession, pks: list[int]) -> Sequence[McpServer]:
+        """
+        按 id 查询搜索结果，加载的关联与 get_list 一致
+
+        :param db: 数据库会话
+        :param pks: mcp server id 列表
+        :return:
+        """
+        stmt = (
+            select(self.model)
+            .options(
+                noload(self.model.category),
+                noload(self.model.user),
+                selectinload(self.model.tags).options(noload(McpTag.servers)),
+            )
+            .where(self.model.id.in_(pks))
+        )
+        return (await db.scalars(stmt)).all()
+
+    async def get_search_source(self, db: AsyncSession, pk: int) -> Row | None:
+        """
+        查询生成检索内容所需的列
+
+        :param db: 数据库会话
+        :param pk: mcp server id
+        :return:
+        """
+        stmt = select(
+            self.model.title, self.model.description, self.model.summary, self.model.tools, self.model.is_public
+        ).where(self.model.id == pk)
+        return (await db.execute(stmt)).first()
+
+    async def set_public(self, db: AsyncSession, pk: int, is_public: bool) -> int:
+        stmt = update(self.model).where(self.model.id == pk).values(is_public=is_public)
+        return (await db.execute(stmt)).rowcount
+
+    async def refresh_search_vector(self, db: AsyncSession, pk: int) -> None:
+        """
+        根据当前的标题、描述、总结、工具列表更新全文检索列
+
+        :param db: 数据库会话
+        :param pk: mcp server id
+        :return:
+        """
+        row = await self.get_search_source(db, pk)
+        if row is None:
+            return
+        document = build_search_document(row.title, row.description, row.summary, row.tools)
+        await db.execute(update(self.model).where(self.model.id == pk).values(search_vector=document))
+
+    async def get_search_pks(self, db: AsyncSession, after: int, limit: int) -> Sequence[int]:
+        """
+        按 id 分批查询 mcp server，用于重建全文检索列
+
+        :param db: 数据库会话
+        :param after: 上一批的最大 id
+        :param limit: 批量大小
+        :return:
+        """
+        stmt = select(self.model.id).where(self.model.id > after).order_by(self.model.id).limit(limit)
+        return (await db.scalars(stmt)).all()
+
+    async def get_facet_rows(self, db: AsyncSession, pks: list[int] | None = None) -> Sequence[Row]:
+        """
+        查询 mcp server 的分类、运行方式
+
+        :param db: 数据库会话
+        :param pks: mcp server id 列表，为空时查询全部公开的 server
+        :return:
+        """
+        stmt = select(
+            self.model.id,
+            self.model.is_public,
+            self.model.category_id,
+            McpCategory.name.label('category_name'),
+            self.model.server_type,
+        ).outerjoin(McpCategory, McpCategory.id == self.model.category_id)
+        if pks is None:
+            stmt = stmt.where(self.model.is_public.is_(True))
+        else:
+            stmt = stmt.where(self.model.id.in_(pks))
+        result = await db.execute(stmt)
+        return result.all()
+
+    async def get_facet_tag_rows(self, db: AsyncSession, pks: list[int] | None = None) -> Sequence[Row]:
+        """
+        查询 mcp server 的标签
+
+        :param db: 数据库会话
+        :param pks: mcp server id 列表，为空时查询全部公开的 server
+        :return:
+        """
+        stmt = select(mcp_server_tag.c.server_id, McpTag.id, McpTag.name).join(
+            McpTag, McpTag.id == mcp_server_tag.c.tag_id
+        )
+        if pks is None:
+            stmt = stmt.join(self.model, self.model.id == mcp_server_tag.c.server_id).where(
+                self.model.is_public.is_(True)
+            )
+        else:
+            stmt = stmt.where(mcp_server_tag.c.server_id.in_(pks))
+        result = await db.execute(stmt)
+        return result.all()
+
+    async def get_suggest_rows(self, db: AsyncSession, pks: list[int] | None = None) -> Sequence[Row]:
+        """
+        查询 mcp server 的标题，用于输入联想
+
+        :param db: 数据库会话
+        :param pks: mcp server id 列表，为空时查询全部公开的 server
+        :return:
+        """
+        stmt = select(self.model.id, self.model.title, self.model.is_public)
+        if pks is None:
+            stmt = stmt.where(self.model.is_public.is_(True))
+        else:
+            stmt = stmt.where(self.model.id.in_(pks))
+        result = await db.execute(stmt)
+        return result.all()
+
 
 mcp_server_dao: CRUDMcpServer = CRUDMcpServer(McpServer)
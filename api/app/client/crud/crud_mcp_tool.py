@@ -0,0 +1,102 @@
+import json
+
+from typing import Any, Sequence
+
+from sqlalchemy import JSON, Row, Select, cast, delete, func, literal, literal_column, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from sqlalchemy_crud_plus import CRUDPlus
+
+from backend.app.client.model import McpServer, McpTool
+from backend.app.client.schema.mcp import McpToolParamFilter
+from backend.core.conf import settings
+
+
+class CRUDMcpTool(CRUDPlus[McpTool]):
+    async def get_by_server(self, db: AsyncSession, pk: int) -> Sequence[McpTool]:
+        return await self.select_models(db, mcp_server_id=pk)
+
+    async def sync_tools(self, db: AsyncSession, pk: int, rows: list[dict[str, Any]]) -> int:
+        """
+        增量同步 server 的工具：新增、更新有变化的工具，删除已不存在的工具
+
+        :param db: 数据库会话
+        :param pk: mcp server id
+        :param rows: tool_index.build_tool_rows 的结果
+        :return: 变更的工具数量
+        """
+        existing = {tool.name: tool for tool in await self.get_by_server(db, pk)}
+        changed = 0
+        for row in rows:
+            tool = existing.pop(row['name'], None)
+            if tool is None:
+                db.add(self.model(mcp_server_id=pk, **row))
+                changed += 1
+            elif tool.description != row['description'] or tool.params != row['params']:
+                tool.description = row['description']
+                tool.params = row['params']
+                changed += 1
+        if existing:
+            await db.execute(delete(self.model).where(self.model.id.in_([tool.id for tool in existing.values()])))
+            changed += len(existing)
+        await db.flush()
+        return changed
+
+    async def get_name_rows(self, db: AsyncSession, pks: list[int] | None = None) -> Sequence[Row]:
+        """
+        查询 mcp server 的工具名称，用于输入联想
+
+        :param db: 数据库会话
+        :param pks: mcp server id 列表，为空时查询全部公开的 server
+        :return: [(mcp server id, 工具名称)]
+        """
+        stmt = select(self.model.mcp_server_id, self.model.name)
+        if pks is None:
+            stmt = stmt.join(self.model.server).where(McpServer.is_public.is_(True))
+        else:
+            stmt = stmt.where(self.model.mcp_server_id.in_(pks))
+        result = await db.execute(stmt)
+        return result.all()
+
+    async def get_list(
+        self,
+        name: str | None = None,
+        keyword: str | None = None,
+        params: list[McpToolParamFilter] | None = None,
+    ) -> Select:
+        """
+        检索公开 server 的工具，按名称排序
+
+        :param name: 工具名称，完全匹配
+        :param keyword: 工具名称包含的关键字
+        :param params: 工具需同时包含的参数
+        :return:
+        """
+        stmt = (
+            select(self.model)
+            .join(self.model.server)
+            .options(contains_eager(self.model.server).load_only(McpServer.id, McpServer.title, McpServer.avatar))
+            .where(McpServer.is_public.is_(True))
+        )
+        if name:
+            stmt = stmt.where(self.model.name == name)
+        if keyword:
+            stmt = stmt.where(self.model.name.ilike(f'%{keyword}%'))
+        if params:
+            conditions = [param.model_dump(exclude_none=True) for param in params]
+            if settings.DATABASE_TYPE == 'postgresql':
+                # 数组包含：每个条件都能匹配其中一个参数，使用 GIN 索引
+                stmt = stmt.where(type_coerce(self.model.params, JSONB).contains(conditions))
+            else:
+                names = self.model.params.op('->')(literal_column("'$[*].name'")).self_group()
+                for condition in conditions:
+                    # MEMBER OF 使用参数名称的多值索引，JSON_CONTAINS 再匹配类型和是否必填
+                    stmt = stmt.where(
+                        literal(condition['name']).op('MEMBER OF')(names),
+                        func.json_contains(self.model.params, cast(json.dumps(condition), JSON)),
+                    )
+        return stmt.order_by(self.model.name)
+
+
+mcp_tool_dao: CRUDMcpTool = CRUDMcpTool(McpTool)
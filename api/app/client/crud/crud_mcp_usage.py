@@ -0,0 +1,54 @@
+from datetime import date
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy_crud_plus import CRUDPlus
+
+from backend.app.client.model import McpUsage
+from backend.core.conf import settings
+from backend.utils.timezone import timezone
+
+
+class CRUDMcpUsage(CRUDPlus[McpUsage]):
+    async def add_calls(self, db: AsyncSession, rows: list[dict[str, Any]]) -> None:
+        """
+        累加调用量，不存在时插入
+
+        :param db:
+        :param rows: [{'usage_date', 'mcp_id', 'subject_type', 'subject', 'calls'}]
+        :return:
+        """
+        now = timezone.now()
+        values = [{**row, 'created_time': now} for row in rows]
+        if settings.DATABASE_TYPE == 'mysql':
+            stmt = mysql.insert(self.model).values(values)
+            stmt = stmt.on_duplicate_key_update(calls=self.model.calls + stmt.inserted.calls, updated_time=now)
+        else:
+            stmt = postgresql.insert(self.model).values(values)
+            stmt = stmt.on_conflict_do_update(
+                constraint='uix_usage_date_mcp_subject',
+                set_={'calls': self.model.calls + stmt.excluded.calls, 'updated_time': now},
+            )
+        await db.execute(stmt)
+
+    async def get_calls(self, db: AsyncSession, pks: list[int], start: date, end: date) -> dict[int, int]:
+        """
+        统计 server 在日期范围内的调用量
+
+        :param db:
+        :param pks: mcp server id 列表
+        :param start: 开始日期（含）
+        :param end: 结束日期（不含）
+        :return: {mcp server id: 调用量}，没有调用的 server 不在结果中
+        """
+        stmt = (
+            select(self.model.mcp_id, func.sum(self.model.calls))
+            .where(self.model.mcp_id.in_(pks), self.model.usage_date >= start, self.model.usage_date < end)
+            .group_by(self.model.mcp_id)
+        )
+        return {mcp_id: int(calls) for mcp_id, calls in await db.execute(stmt)}
+
+
+mcp_usage_dao: CRUDMcpUsage = CRUDMcpUsage(McpUsage)
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from backend.app.client.model.bundle import McpBundle
 from backend.app.client.model.category import McpCategory
+from backend.app.client.model.embedding import McpEmbedding
 from backend.app.client.model.mcp import McpServer
 from backend.app.client.model.router import McpRouter
 from backend.app.client.model.tag import McpTag
+from backend.app.client.model.tool import McpTool
 from backend.app.client.model.user import McpUser
 from backend.app.client.model.user_social import UserSocial
+from backend.app.client.model.usage import McpUsage
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import JSON, ForeignKey, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.common.model import Base, id_key
+
+
+class McpBundle(Base):
+    """mcp server 组合，通过网关以一个 mcp 端点对外提供"""
+
+    __tablename__ = 'mcp_bundle'
+    id: Mapped[id_key] = mapped_column(init=False)
+    name: Mapped[str] = mapped_column(String(64), comment='组合名称')
+    mcp_ids: Mapped[list[int]] = mapped_column(JSON, comment='mcp server id 列表')
+    description: Mapped[str | None] = mapped_column(Text, default=None, comment='描述')
+    user_id: Mapped[int | None] = mapped_column(
+        ForeignKey('mcp_user.id', ondelete='SET NULL'), default=None, comment='用户关联ID'
+    )
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import ForeignKey, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.app.client.conf import client_settings
+from backend.app.client.model.types import Vector
+from backend.common.model import Base
+
+
+class McpEmbedding(Base):
+    """mcp server 语义检索向量"""
+
+    __tablename__ = 'mcp_embedding'
+    mcp_server_id: Mapped[int] = mapped_column(
+        ForeignKey('mcp_server.id', ondelete='CASCADE'), primary_key=True, comment='mcp server id'
+    )
+    embedding: Mapped[list[float]] = mapped_column(Vector(client_settings.MCP_EMBEDDING_DIMENSION), comment='向量')
+    # 生成向量的模型，切换模型后需要重新生成
+    model: Mapped[str] = mapped_column(String(64), comment='向量模型')
+    # 生成向量的文本摘要，文本未变更时跳过
+    content_hash: Mapped[str] = mapped_column(String(64), comment='文本摘要')
+
+    __table_args__ = (
+        # 余弦距离 HNSW 索引，仅 postgresql
+        Index(
+            'ix_mcp_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
@@ -5,10 +5,11 @@ from __future__ import annotations
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import JSON, Boolean, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import JSON, Boolean, ForeignKey, Index, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from backend.app.client.model.m2m import mcp_server_tag
+from backend.app.client.model.types import SearchVector
 from backend.common.model import Base, id_key
 
 if TYPE_CHECKING:
@@ -31,7 +32,7 @@ class McpServer(Base):
     title: Mapped[str] = mapped_column(String(255), comment='mcp server title')
     # 提交人填写的
     description: Mapped[str | None] = mapped_column(Text, default=None, comment='描述')
-    # stdio：本地调用 sse：远程调用 api: 支持配置现有的api
+    # stdio：本地调用 sse / streamable_http：远程调用 api: 支持配置现有的api
     transport: Mapped[str | None] = mapped_column(String(20), default=None, comment='mcp transport type')
     # mcp类型 remote local  对于 playwright 等必须在本地执行
     server_type: Mapped[str | None] = mapped_column(String(20), default=None, comment='mcp server type')
@@ -52,11 +53,26 @@ class McpServer(Base):
 
     # 异步写入
     mcp_endpoint: Mapped[str | None] = mapped_column(Text, default=None, comment='sse url')
+    # 部署在其他地域的相同 server，与 mcp_endpoint 一起参与副本选择和对冲请求
+    mcp_endpoints: Mapped[list[str] | None] = mapped_column(JSON, default=None, comment='副本端点')
     capabilities: Mapped[str | None] = mapped_column(JSON, default=None, comment='能力')
     tools: Mapped[str | None] = mapped_column(JSON, default=None, comment='工具列表')
     prompts: Mapped[str | None] = mapped_column(JSON, default=None, comment='提示词列表')
     resources: Mapped[str | None] = mapped_column(JSON, default=None, comment='资源列表')
 
+    # transport 为 api 时的转发配置，由 OpenAPI 文档编译得到 {"base_url", "headers", "operations"}
+    api_config: Mapped[str | None] = mapped_column(JSON, default=None, comment='OpenAPI 转发配置')
+
+    # 工具结果缓存 {"ttl": 60, "tools": {"maps_geo": 3600}}，未配置的工具不缓存
+    cache_config: Mapped[str | None] = mapped_column(JSON, default=None, comment='工具结果缓存配置')
+    # 工具调用的默认超时时间，同时也是客户端通过请求头指定的超时时间上限
+    call_timeout: Mapped[int | None] = mapped_column(default=None, comment='工具调用超时时间（秒）')
+    # 幂等的工具允许同时发送到多个副本，采用最先返回的结果
+    idempotent_tools: Mapped[list[str] | None] = mapped_column(JSON, default=None, comment='幂等工具')
+
+    # 全文检索：标题、描述、总结、工具名称及描述，由 search_index.build_search_document 生成，查询列表时不加载
+    search_vector: Mapped[str | None] = mapped_column(SearchVector, default=None, deferred=True, comment='全文检索')
+
     # 是否公开
     is_public: Mapped[bool | None] = mapped_column(Boolean, default=False, comment='是否公开')
 
@@ -75,4 +91,14 @@ class McpServer(Base):
     )
     user: Mapped[McpUser | None] = relationship(init=False, back_populates='mcps')
 
-    __table_args__ = (UniqueConstraint('user_id', 'title', name='uix_user_title'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'title', name='uix_user_title'),
+        # postgresql 为 GIN 索引，mysql 为 ngram 全文索引
+        Index(
+            'ix_mcp_server_search_vector',
+            'search_vector',
+            postgresql_using='gin',
+            mysql_prefix='FULLTEXT',
+            mysql_with_parser='ngram',
+        ),
+    )
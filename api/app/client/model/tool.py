@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import JSON, ForeignKey, Index, String, Text, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from backend.common.model import Base, id_key
+
+if TYPE_CHECKING:
+    from backend.app.client.model.mcp import McpServer
+
+
+class McpTool(Base):
+    """mcp server 工具，由 McpServer.tools 展开，用于按工具名称和参数检索"""
+
+    __tablename__ = 'mcp_tool'
+    id: Mapped[id_key] = mapped_column(init=False)
+    mcp_server_id: Mapped[int] = mapped_column(ForeignKey('mcp_server.id', ondelete='CASCADE'), comment='mcp server id')
+    name: Mapped[str] = mapped_column(String(128), index=True, comment='工具名称')
+    description: Mapped[str | None] = mapped_column(Text, default=None, comment='工具描述')
+    # 展开后的参数 [{"name": "options.limit", "type": "integer", "required": false}]，由 tool_index.flatten_params 生成
+    params: Mapped[list[dict[str, Any]]] = mapped_column(
+        JSON().with_variant(JSONB(), 'postgresql'), default_factory=list, comment='参数'
+    )
+
+    # 仅在检索时通过 contains_eager 加载
+    server: Mapped[McpServer] = relationship(init=False, lazy='raise')
+
+    __table_args__ = (
+        # 同时用于按 server 查询工具
+        UniqueConstraint('mcp_server_id', 'name', name='uix_mcp_tool_server_name'),
+        # postgresql 按参数包含关系（@>）检索
+        Index(
+            'ix_mcp_tool_params',
+            'params',
+            postgresql_using='gin',
+            postgresql_ops={'params': 'jsonb_path_ops'},
+        ).ddl_if(dialect='postgresql'),
+        # postgresql 按工具名称模糊检索，需要 pg_trgm 扩展
+        Index(
+            'ix_mcp_tool_name_trgm',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+        # mysql 多值索引，按参数名称检索
+        Index('ix_mcp_tool_param_names', text("(CAST(params->'$[*].name' AS CHAR(128) ARRAY))")).ddl_if(
+            dialect='mysql'
+        ),
+    )
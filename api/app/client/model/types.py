@@ -1,5 +1,7 @@
-from sqlalchemy import CHAR, TypeDecorator
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import CHAR, Text, TypeDecorator
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.types import UserDefinedType
 
 
 class StringUUID(TypeDecorator):
@@ -24,3 +26,57 @@ class StringUUID(TypeDecorator):
         if value is None:
             return value
         return str(value)
+
+
+class SearchVector(TypeDecorator):
+    """全文检索列：postgresql 为 tsvector（配合 GIN 索引），mysql 为文本（配合 ngram 全文索引）"""
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(TSVECTOR())
+        else:
+            return dialect.type_descriptor(LONGTEXT())
+
+
+class _PgVector(UserDefinedType):
+    cache_ok = True
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def get_col_spec(self, **kw):
+        return f'VECTOR({self.dimension})'
+
+
+class Vector(TypeDecorator):
+    """
+    向量列：postgresql 为 pgvector 的 vector（需安装 vector 扩展），mysql 以文本保存
+
+    以 pgvector 的文本格式 [1,2,3] 读写，不依赖 pgvector 的 python 包
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, dimension: int):
+        super().__init__()
+        self.dimension = dimension
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(_PgVector(self.dimension))
+        else:
+            return dialect.type_descriptor(LONGTEXT())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        return '[' + ','.join(str(float(item)) for item in value) + ']'
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        return [float(item) for item in value.strip('[]').split(',') if item]
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from sqlalchemy import Date, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.common.model import Base, id_key
+
+
+class McpUsage(Base):
+    """mcp server 调用量，按天汇总，用于计费"""
+
+    __tablename__ = 'mcp_usage'
+    id: Mapped[id_key] = mapped_column(init=False)
+    usage_date: Mapped[date] = mapped_column(Date, index=True, comment='日期')
+    mcp_id: Mapped[int] = mapped_column(index=True, comment='mcp server id')
+    # user：按用户计费 agent：按 agent 计费 key：使用用户自己的 key，不计费
+    subject_type: Mapped[str] = mapped_column(String(20), comment='计费主体类型')
+    subject: Mapped[str] = mapped_column(String(64), comment='计费主体')
+    calls: Mapped[int] = mapped_column(default=0, comment='调用次数')
+
+    __table_args__ = (
+        UniqueConstraint('usage_date', 'mcp_id', 'subject_type', 'subject', name='uix_usage_date_mcp_subject'),
+    )
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from typing import List
+
+from pydantic import ConfigDict, Field
+
+from backend.common.schema import SchemaBase
+
+
+class AddMcpBundleParam(SchemaBase):
+    name: str = Field(max_length=64, description='组合名称')
+    description: str | None = Field(None, description='描述')
+    mcp_ids: List[int] = Field(min_length=1, description='mcp server id 列表')
+
+
+class GetMcpBundleDetail(SchemaBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int = Field(description='id')
+    name: str = Field(description='组合名称')
+    description: str | None = Field(None, description='描述')
+    mcp_ids: List[int] = Field(description='mcp server id 列表')
+    created_time: datetime = Field(description='创建时间')
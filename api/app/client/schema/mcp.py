@@ -3,8 +3,11 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator, validator
+from typing_extensions import Self
 
+from backend.common.enums import McpCircuitState, McpSearchMode, McpServerType, McpSuggestType
+from backend.common.pagination import CursorPageData, CursorPageParams
 from backend.common.schema import SchemaBase
 
 
@@ -24,6 +27,14 @@ class GetMcpSearchDetail(SchemaBase):
     envs: Dict[str, Any] | None = Field(None, description='环境变量')
 
 
+class GetMcpHealthDetail(SchemaBase):
+    state: McpCircuitState = Field(McpCircuitState.closed, description='熔断状态')
+    score: float = Field(1, description='健康分（0~1）')
+    error_rate: float = Field(0, description='窗口内错误率')
+    slow_rate: float = Field(0, description='窗口内慢调用率')
+    total: int = Field(0, description='窗口内调用数')
+
+
 class GetMcpDetail(SchemaBase):
     id: int = Field(description='id')
     title: str | None = Field(None, description='名称')
@@ -34,6 +45,27 @@ class GetMcpDetail(SchemaBase):
     prompts: Dict[str, Any] | None = Field(None, description='提示词')
     resources: Dict[str, Any] | None = Field(None, description='资源')
     envs: Dict[str, Any] | None = Field(None, description='环境变量')
+    cache_config: Dict[str, Any] | None = Field(None, description='工具结果缓存配置')
+
+
+class GetMcpRouteDetail(SchemaBase):
+    """
+    工具调用路由
+    """
+
+    id: int = Field(description='id')
+    mcp_endpoint: str | None = Field(None, description='mcp server endpoint')
+    mcp_endpoints: List[str] | None = Field(None, description='副本端点')
+    transport: str | None = Field(None, description='协商后的传输类型')
+    cache_config: Dict[str, Any] | None = Field(None, description='工具结果缓存配置')
+    call_timeout: int | None = Field(None, description='工具调用超时时间（秒）')
+    idempotent_tools: List[str] | None = Field(None, description='幂等工具，允许对冲请求')
+    tool_names: List[str] | None = Field(None, description='工具名称，未知的工具不作为指标标签')
+
+    @property
+    def endpoints(self) -> list[str]:
+        """全部端点，主端点在前"""
+        return list(dict.fromkeys([self.mcp_endpoint, *(self.mcp_endpoints or [])]))
 
 
 class GetMcpUserDetail(SchemaBase):
@@ -54,9 +86,113 @@ class GetMcpFeedDetail(SchemaBase):
     user: GetMcpUserDetail | None = Field(None, description='用户信息')
 
 
-class SearchMcpParam(SchemaBase):
+class SearchMcpParam(SchemaBase, CursorPageParams):
     category_id: int | None = Field(None, description='分类id')
+    tag_ids: List[int] | None = Field(None, description='标签id，需同时包含全部标签')
+    server_type: McpServerType | None = Field(None, description='运行方式')
     keyword: str | None = Field(None, description='搜索词')
+    mode: McpSearchMode = Field(McpSearchMode.keyword, description='搜索方式：关键字、语义、混合、融合')
+    semantic_weight: float = Field(0.7, ge=0, le=1, description='混合搜索中语义相似度的权重')
+    debug: bool = Field(False, description='融合搜索时返回各路排名和得分')
+
+
+class UpdateMcpPublicParam(SchemaBase):
+    is_public: bool = Field(description='是否公开')
+
+
+class UpdateMcpUserKeyParam(SchemaBase):
+    user_key: str | None = Field(None, max_length=512, description='用户自己的 key，为空时删除')
+
+
+class GetMcpFacetItem(SchemaBase):
+    value: str = Field(description='取值，分类、标签为 id')
+    name: str = Field(description='名称')
+    count: int = Field(description='公开的 server 数量')
+
+
+class GetMcpFacets(SchemaBase):
+    """搜索分面计数，为全部公开 server 的统计，不随搜索条件变化"""
+
+    category: List[GetMcpFacetItem] = Field([], description='分类')
+    tag: List[GetMcpFacetItem] = Field([], description='标签')
+    server_type: List[GetMcpFacetItem] = Field([], description='运行方式')
+
+
+class GetMcpSearchExplainItem(SchemaBase):
+    id: int = Field(description='mcp server id')
+    score: float = Field(description='最终得分')
+    rrf: float = Field(description='RRF 得分')
+    keyword_rank: int | None = Field(None, description='关键字检索排名')
+    keyword_score: float | None = Field(None, description='关键字相关度')
+    semantic_rank: int | None = Field(None, description='语义检索排名')
+    distance: float | None = Field(None, description='余弦距离')
+    calls: int = Field(description='统计期内的调用量')
+    popularity: float = Field(description='归一化的调用量')
+
+
+class GetMcpSearchExplain(SchemaBase):
+    """融合搜索的排序依据，仅 debug 时返回"""
+
+    rrf_k: int = Field(description='RRF 平滑常数')
+    keyword_weight: float = Field(description='关键字检索权重')
+    semantic_weight: float = Field(description='语义检索权重')
+    popularity_weight: float = Field(description='调用量权重')
+    keyword_candidates: int = Field(description='关键字检索候选数量')
+    semantic_candidates: int = Field(description='语义检索候选数量')
+    items: List[GetMcpSearchExplainItem] = Field([], description='当前页各结果的得分')
+
+
+class GetMcpSearchPage(CursorPageData[GetMcpDetail]):
+    facets: GetMcpFacets = Field(description='分面计数')
+    explain: GetMcpSearchExplain | None = Field(None, description='排序依据，仅融合搜索且 debug 时返回')
+
+
+class McpToolParamFilter(SchemaBase):
+    name: str = Field(description='参数名称，嵌套参数如 options.limit、items[].id')
+    type: str | None = Field(None, description='参数类型，如 string、integer、object')
+    required: bool | None = Field(None, description='是否必填')
+
+
+class SearchMcpToolParam(SchemaBase, CursorPageParams):
+    name: str | None = Field(None, description='工具名称，完全匹配')
+    keyword: str | None = Field(None, description='工具名称包含的关键字')
+    params: List[McpToolParamFilter] | None = Field(None, max_length=10, description='工具需同时包含的参数')
+
+
+class GetMcpToolParam(SchemaBase):
+    name: str = Field(description='参数名称')
+    type: str = Field(description='参数类型')
+    required: bool = Field(description='是否必填')
+
+
+class GetMcpToolServerDetail(SchemaBase):
+    id: int = Field(description='id')
+    title: str | None = Field(None, description='名称')
+    avatar: str | None = Field(None, description='头像')
+
+
+class GetMcpToolDetail(SchemaBase):
+    """
+    工具检索结果
+    """
+
+    id: int = Field(description='id')
+    mcp_server_id: int = Field(description='mcp server id')
+    name: str = Field(description='工具名称')
+    description: str | None = Field(None, description='工具描述')
+    params: List[GetMcpToolParam] = Field([], description='参数')
+    server: GetMcpToolServerDetail | None = Field(None, description='mcp server')
+
+
+class GetMcpSuggestDetail(SchemaBase):
+    """
+    输入联想结果
+    """
+
+    type: McpSuggestType = Field(description='类型')
+    text: str = Field(description='联想文本，server 标题、标签名称或工具名称')
+    mcp_id: int | None = Field(None, description='mcp server id，仅 server 类型')
+    count: int = Field(description='包含该标签或工具的公开 server 数量，server 类型为 1')
 
 
 class MCPServersConfig(SchemaBase):
@@ -67,6 +203,7 @@ class MCPServersConfig(SchemaBase):
 
 class UpdateMcpServerParam(SchemaBase):
     mcp_endpoint: str = Field(None, description='mcp server endpoint')
+    transport: str | None = Field(None, description='协商后的传输类型')
     capabilities: Optional[Dict[str, Any]] | None = Field(None, description='能力')
     tools: Optional[Dict[str, Any]] | None = Field(None, description='工具')
     prompts: Optional[Dict[str, Any]] | None = Field(None, description='提示词')
@@ -77,6 +214,13 @@ class UpdateMcpServerParam(SchemaBase):
 class AddMcpServerParam(BaseModel):
     git: str | None = Field(None, description='git address')
     description: str | None = Field(None, description='描述')
+    cache_config: Dict[str, Any] | None = Field(
+        None, description='工具结果缓存配置，如 {"ttl": 60, "tools": {"maps_geo": 3600}}'
+    )
+    call_timeout: int | None = Field(None, gt=0, description='工具调用超时时间（秒）')
+    server_type: McpServerType = Field(
+        McpServerType.remote, description='运行方式：remote 部署到 serverless，local 在本机以 stdio 子进程运行'
+    )
     mcpServers: Dict[str, MCPServersConfig] = Field(None, description='mcp server config')
 
     @validator('mcpServers')
@@ -92,11 +236,64 @@ class AddMcpPackageParam(SchemaBase):
     env: Optional[Dict[str, str]] | None = Field({}, description='Environment variables')
 
 
+class AddMcpApiParam(SchemaBase):
+    """解析 OpenAPI 文档直接转发，不需要构建镜像"""
+
+    title: str = Field(max_length=255, description='mcp server title')
+    description: str | None = Field(None, description='描述')
+    openapi: Dict[str, Any] | None = Field(None, description='OpenAPI 文档')
+    openapi_url: str | None = Field(None, description='OpenAPI 文档地址，未提供 openapi 时下载')
+    base_url: str | None = Field(None, description='接口地址，为空时使用文档中的 servers')
+    headers: Dict[str, str] | None = Field(None, description='转发时附带的请求头，如鉴权信息')
+    cache_config: Dict[str, Any] | None = Field(None, description='工具结果缓存配置')
+    call_timeout: int | None = Field(None, gt=0, description='工具调用超时时间（秒）')
+
+    @model_validator(mode='after')
+    def check_openapi(self) -> Self:
+        if not self.openapi and not self.openapi_url:
+            raise ValueError('openapi 和 openapi_url 不能同时为空')
+        return self
+
+
+class UpdateMcpReplicaParam(SchemaBase):
+    """部署在多个地域的相同 server，调用时选择耗时最低的副本，幂等工具超过 p95 耗时未返回时向下一个副本对冲"""
+
+    mcp_endpoints: List[str] = Field(max_length=5, description='副本端点，不含主端点，为空时取消副本')
+    idempotent_tools: List[str] | None = Field(
+        None, description='幂等工具，为空时使用工具声明的 idempotentHint / readOnlyHint'
+    )
+
+    @validator('mcp_endpoints')
+    def validate_mcp_endpoints(cls, v):
+        for endpoint in v:
+            if not endpoint.startswith(('http://', 'https://')):
+                raise ValueError(f'invalid endpoint: {endpoint}')
+        return [endpoint.rstrip('/') for endpoint in v]
+
+
 class CallToolParam(SchemaBase):
     tool_name: str = Field(description='工具名称')
     arguments: Optional[Dict[str, Any]] = Field(description='工具参数')
 
 
+class BatchCallToolItem(CallToolParam):
+    mcp_id: int = Field(description='mcp_id')
+
+
+class BatchCallToolParam(SchemaBase):
+    calls: List[BatchCallToolItem] = Field(min_length=1, description='工具调用列表')
+    timeout: float | None = Field(None, gt=0, description='单个调用超时时间（秒）')
+
+
+class GetBatchCallToolResult(SchemaBase):
+    index: int = Field(description='请求中的位置')
+    mcp_id: int = Field(description='mcp_id')
+    tool_name: str = Field(description='工具名称')
+    success: bool = Field(description='是否成功')
+    result: Any | None = Field(None, description='工具调用结果')
+    error: str | None = Field(None, description='失败原因')
+
+
 class AddMcpParam(SchemaBase):
     """
     部署mcp参数  主要有的只能在本地运行
@@ -0,0 +1,279 @@
+import asyncio
+
+from typing import Any
+
+from mcp import McpError
+from mcp.server.lowlevel import Server
+from mcp.server.sse import SseServerTransport
+from mcp.types import (
+    INVALID_PARAMS,
+    CallToolRequest,
+    CallToolResult,
+    ErrorData,
+    GetPromptRequest,
+    ListPromptsRequest,
+    ListPromptsResult,
+    ListResourcesRequest,
+    ListResourcesResult,
+    ListToolsRequest,
+    ListToolsResult,
+    ReadResourceRequest,
+    ServerResult,
+    TextContent,
+)
+from pydantic import AnyUrl
+from starlette.requests import Request
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_bundle import mcp_bundle_dao
+from backend.app.client.crud.crud_user import crud_user_dao
+from backend.app.client.model import McpBundle
+from backend.app.client.schema.bundle import AddMcpBundleParam
+from backend.app.client.schema.mcp import CallToolParam
+from backend.app.client.service.mcp_server_service import mcp_server_service
+from backend.app.client.utils.mcp_call import format_call_error
+from backend.app.client.utils.mcp_gateway import AsgiResponse, namespace_name, namespace_uri, split_name, split_uri
+from backend.app.client.utils.route_cache import mcp_route_cache
+from backend.common.dataclasses import McpCaller
+from backend.common.exception import errors
+from backend.common.log import log
+from backend.core.conf import settings
+from backend.database.db import async_db_session
+
+# SSE 会话保存在当前 worker 的内存中，多 worker 部署时需要按 session_id 做会话保持
+_sse_transport = SseServerTransport(f'{settings.FASTAPI_API_V1_PATH}/mcp/gateway/messages/')
+
+
+class McpGatewayService:
+    """
+    mcp 聚合网关：将多个 mcp server 通过一个 SSE 端点对外提供
+
+    工具、提示词以 mcp{mcp_id}__{name} 命名，资源 URI 改写为 wemcp://mcp{mcp_id}/{原始 URI}，
+    请求按命名空间转发到会话池中对应的上游会话，工具调用与 /call 接口共用缓存、熔断、配额和超时逻辑
+    """
+
+    @staticmethod
+    async def _check_mcp_ids(mcp_ids: list[int]) -> list[int]:
+        """
+        校验聚合的 mcp server
+
+        :param mcp_ids: mcp server id 列表
+        :return: 去重后的 mcp server id 列表
+        """
+        mcp_ids = list(dict.fromkeys(mcp_ids))
+        if not mcp_ids:
+            raise errors.RequestError(msg='至少需要一个 MCP server')
+        if len(mcp_ids) > client_settings.MCP_GATEWAY_MAX_SERVERS:
+            raise errors.RequestError(msg=f'单个网关最多聚合 {client_settings.MCP_GATEWAY_MAX_SERVERS} 个 MCP server')
+        routes = await mcp_route_cache.get_many(mcp_ids)
+        missing = [str(pk) for pk in mcp_ids if pk not in routes]
+        if missing:
+            raise errors.NotFoundError(msg=f'MCP server 不存在: {", ".join(missing)}')
+        return mcp_ids
+
+    @staticmethod
+    async def get_bundle(pk: int) -> McpBundle:
+        """
+        获取 mcp server 组合
+
+        :param pk: 组合 id
+        :return:
+        """
+        async with async_db_session() as db:
+            bundle = await mcp_bundle_dao.get_bundle(db, pk)
+        if not bundle:
+            raise errors.NotFoundError(msg='MCP server 组合不存在')
+        return bundle
+
+    @staticmethod
+    async def add_bundle(request: Request, obj: AddMcpBundleParam) -> int:
+        """
+        保存 mcp server 组合
+
+        :param request: FastAPI 请求对象
+        :param obj: 组合参数
+        :return:
+        """
+        mcp_ids = await McpGatewayService._check_mcp_ids(obj.mcp_ids)
+        async with async_db_session.begin() as db:
+            user = await crud_user_dao.get_by_nickname(db, request.user['nickname'])
+            bundle = McpBundle(
+                name=obj.name,
+                mcp_ids=mcp_ids,
+                description=obj.description,
+                user_id=user.id if user else None,
+            )
+            return await mcp_bundle_dao.add_bundle(db, bundle)
+
+    @staticmethod
+    async def _list_upstream(mcp_id: int, capability: str, method: str, field: str) -> list[Any]:
+        """
+        列出单个上游的全部条目，未声明对应能力的上游直接返回空列表
+
+        :param mcp_id: mcp server id
+        :param capability: 能力名称
+        :param method: ClientSession 的列表方法
+        :param field: 列表结果中的字段
+        :return:
+        """
+        async with mcp_server_service.upstream_session(mcp_id) as pooled:
+            if pooled.initialize_result and getattr(pooled.initialize_result.capabilities, capability) is None:
+                return []
+            items, cursor = [], None
+            while True:
+                result = await getattr(pooled.session, method)(cursor)
+                items.extend(getattr(result, field))
+                cursor = result.nextCursor
+                if not cursor:
+                    return items
+
+    @staticmethod
+    async def _list_all(mcp_ids: list[int], capability: str, method: str, field: str) -> list[tuple[int, list[Any]]]:
+        """
+        并发列出全部上游的条目，失败或超时的上游跳过
+
+        :param mcp_ids: mcp server id 列表
+        :param capability: 能力名称
+        :param method: ClientSession 的列表方法
+        :param field: 列表结果中的字段
+        :return: [(mcp_id, 条目列表)]
+        """
+
+        async def list_one(mcp_id: int) -> tuple[int, list[Any]]:
+            try:
+                items = await asyncio.wait_for(
+                    McpGatewayService._list_upstream(mcp_id, capability, method, field),
+                    client_settings.MCP_GATEWAY_LIST_TIMEOUT,
+                )
+            except Exception as e:
+                log.warning(f'MCP 网关列出上游 {field} 失败: {mcp_id}, {e!r}')
+                items = []
+            return mcp_id, items
+
+        return await asyncio.gather(*[list_one(mcp_id) for mcp_id in mcp_ids])
+
+    @staticmethod
+    def _build_server(mcp_ids: list[int], caller: McpCaller) -> Server:
+        """
+        构建聚合多个上游的 mcp server，直接注册请求处理器，不依赖 SDK 装饰器对返回值的转换
+
+        :param mcp_ids: mcp server id 列表
+        :param caller: 调用方，用于配额统计
+        :return:
+        """
+        server = Server('wemcp-gateway')
+        allowed = set(mcp_ids)
+
+        def resolve_name(name: str) -> tuple[int, str]:
+            parsed = split_name(name)
+            if parsed is None or parsed[0] not in allowed:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=f'未知的名称: {name}'))
+            return parsed
+
+        def resolve_uri(uri: str) -> tuple[int, str]:
+            parsed = split_uri(uri)
+            if parsed is None or parsed[0] not in allowed:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=f'未知的资源: {uri}'))
+            return parsed
+
+        async def list_tools(_: ListToolsRequest) -> ServerResult:
+            tools = [
+                tool.model_copy(update={'name': namespace_name(mcp_id, tool.name)})
+                for mcp_id, items in await McpGatewayService._list_all(mcp_ids, 'tools', 'list_tools', 'tools')
+                for tool in items
+            ]
+            return ServerResult(ListToolsResult(tools=tools))
+
+        async def call_tool(req: CallToolRequest) -> ServerResult:
+            progress_callback = None
+            progress_token = req.params.meta.progressToken if req.params.meta else None
+            if progress_token is not None:
+                session = server.request_context.session
+
+                async def progress_callback(progress: float, total: float | None, message: str | None) -> None:
+                    await session.send_progress_notification(progress_token, progress, total, message)
+
+            try:
+                mcp_id, tool_name = resolve_name(req.params.name)
+                result = await mcp_server_service.call_tool(
+                    mcp_id,
+                    CallToolParam(tool_name=tool_name, arguments=req.params.arguments),
+                    caller,
+                    progress_callback,
+                )
+            except Exception as e:
+                result = CallToolResult(content=[TextContent(type='text', text=format_call_error(e))], isError=True)
+            return ServerResult(result)
+
+        async def list_prompts(_: ListPromptsRequest) -> ServerResult:
+            prompts = [
+                prompt.model_copy(update={'name': namespace_name(mcp_id, prompt.name)})
+                for mcp_id, items in await McpGatewayService._list_all(mcp_ids, 'prompts', 'list_prompts', 'prompts')
+                for prompt in items
+            ]
+            return ServerResult(ListPromptsResult(prompts=prompts))
+
+        async def get_prompt(req: GetPromptRequest) -> ServerResult:
+            mcp_id, name = resolve_name(req.params.name)
+            async with mcp_server_service.upstream_session(mcp_id) as pooled:
+                return ServerResult(await pooled.session.get_prompt(name, req.params.arguments))
+
+        async def list_resources(_: ListResourcesRequest) -> ServerResult:
+            resources = [
+                resource.model_copy(update={'uri': AnyUrl(namespace_uri(mcp_id, str(resource.uri)))})
+                for mcp_id, items in await McpGatewayService._list_all(
+                    mcp_ids, 'resources', 'list_resources', 'resources'
+                )
+                for resource in items
+            ]
+            return ServerResult(ListResourcesResult(resources=resources))
+
+        async def read_resource(req: ReadResourceRequest) -> ServerResult:
+            mcp_id, uri = resolve_uri(str(req.params.uri))
+            async with mcp_server_service.upstream_session(mcp_id) as pooled:
+                result = await pooled.session.read_resource(AnyUrl(uri))
+            result.contents = [
+                content.model_copy(update={'uri': AnyUrl(namespace_uri(mcp_id, str(content.uri)))})
+                for content in result.contents
+            ]
+            return ServerResult(result)
+
+        server.request_handlers.update({
+            ListToolsRequest: list_tools,
+            CallToolRequest: call_tool,
+            ListPromptsRequest: list_prompts,
+            GetPromptRequest: get_prompt,
+            ListResourcesRequest: list_resources,
+            ReadResourceRequest: read_resource,
+        })
+        return server
+
+    @staticmethod
+    async def connect(mcp_ids: list[int], caller: McpCaller) -> AsgiResponse:
+        """
+        建立聚合网关的 SSE 连接
+
+        :param mcp_ids: mcp server id 列表
+        :param caller: 调用方
+        :return:
+        """
+        mcp_ids = await McpGatewayService._check_mcp_ids(mcp_ids)
+        server = McpGatewayService._build_server(mcp_ids, caller)
+
+        async def app(scope, receive, send) -> None:
+            async with _sse_transport.connect_sse(scope, receive, send) as (read_stream, write_stream):
+                await server.run(read_stream, write_stream, server.create_initialization_options())
+
+        return AsgiResponse(app)
+
+    @staticmethod
+    def handle_message() -> AsgiResponse:
+        """
+        接收客户端通过 POST 发送的消息，转交给对应的 SSE 会话
+
+        :return:
+        """
+        return AsgiResponse(_sse_transport.handle_post_message)
+
+
+mcp_gateway_service: McpGatewayService = McpGatewayService()
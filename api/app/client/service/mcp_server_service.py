@@ -1,14 +1,112 @@
+import asyncio
+import dataclasses
+import hashlib
+import json
+import shlex
+import time
+
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator
+from urllib.parse import urljoin
+
+import httpx
+
+from mcp import ClientSession, McpError
+from mcp.shared.session import ProgressFnT
+from mcp.types import CallToolResult
 from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_embedding import mcp_embedding_dao
 from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.crud.crud_mcp_tool import mcp_tool_dao
+from backend.app.client.crud.crud_mcp_usage import mcp_usage_dao
 from backend.app.client.crud.crud_user import crud_user_dao
-from backend.app.client.model import McpServer
-from backend.app.client.schema.mcp import AddMcpServerParam, MCPServersConfig
+from backend.app.client.model import McpServer, McpUser
+from backend.app.client.schema.mcp import (
+    AddMcpApiParam,
+    AddMcpServerParam,
+    BatchCallToolParam,
+    CallToolParam,
+    GetMcpDetail,
+    GetMcpRouteDetail,
+    MCPServersConfig,
+    McpToolParamFilter,
+    SearchMcpParam,
+    UpdateMcpReplicaParam,
+)
+from backend.app.client.utils.circuit_breaker import circuit_breaker
+from backend.app.client.utils.embedding import build_embedding_text, mcp_embedder
+from backend.app.client.utils.etag import build_etag, mcp_version
+from backend.app.client.utils.facet_index import mcp_facet_index
+from backend.app.client.utils.feed import mcp_feed
+from backend.app.client.utils.hedging import mcp_hedger
+from backend.app.client.utils.mcp_call import call_tool_with_deadline, format_call_error
+from backend.app.client.utils.mcp_session_pool import PooledSession, mcp_session_pool
+from backend.app.client.utils.mcp_stdio import filter_env, parse_command
+from backend.app.client.utils.mcp_transport import create_public_http_client
+from backend.app.client.utils.metrics import mcp_metrics
+from backend.app.client.utils.openapi_adapter import compile_openapi, describe_openapi, read_body
+from backend.app.client.utils.quota import mcp_quota
+from backend.app.client.utils.route_cache import mcp_route_cache
+from backend.app.client.utils.search_fusion import FusionWeights, fuse, rerank
+from backend.app.client.utils.single_flight import single_flight
+from backend.app.client.utils.suggest_index import mcp_suggest_index
+from backend.app.client.utils.tool_cache import tool_cache
+from backend.app.client.utils.tool_index import build_tool_rows
+from backend.app.client.utils.tool_stream import ProgressQueue, encode_sse_event, iter_result_events
+from backend.app.client.utils.warmup import mcp_warmer
+from backend.app.client.utils.url_guard import check_public_url
+from backend.app.task.celery import celery_app
+from backend.common.dataclasses import McpCaller
+from backend.common.enums import McpSearchMode, McpServerType, McpTransportType
+from backend.common.exception import errors
+from backend.common.log import log
+from backend.common.pagination import cursor_paging_list
+from backend.common.response.response_code import CustomErrorCode
+from backend.core.conf import settings
 from backend.database.db import async_db_session
+from backend.utils.timezone import timezone
 
 
 class McpServerService:
+    @staticmethod
+    async def get_request_user(db: AsyncSession, request: Request) -> McpUser:
+        """
+        获取当前登录用户，token 中的昵称对应的用户不存在时视为 token 无效
+
+        :param db: 数据库会话
+        :param request: FastAPI 请求对象
+        :return:
+        """
+        payload = request.user if isinstance(request.user, dict) else {}
+        nickname = payload.get('nickname')
+        user = await crud_user_dao.get_by_nickname(db, nickname) if nickname else None
+        if user is None:
+            raise errors.TokenError(msg='Token 无效')
+        return user
+
+    @staticmethod
+    def is_admin(user: McpUser) -> bool:
+        return bool(user.is_superuser and user.is_staff)
+
+    @staticmethod
+    def check_owner(user: McpUser, mcp_server: McpServer) -> None:
+        """
+        校验当前用户是 server 的创建者或管理员
+
+        :param user: 当前用户
+        :param mcp_server: mcp server
+        :return:
+        """
+        if mcp_server.user_id != user.id and not McpServerService.is_admin(user):
+            raise errors.AuthorizationError(msg='无权操作该 MCP server')
+
     @staticmethod
     def get_base_image(cmd) -> str:
         # bun deno 支持
@@ -38,21 +136,804 @@ class McpServerService:
         return base_command
 
     @staticmethod
-    async def get_select(*, keyword: str) -> Select:
-        return await mcp_server_dao.get_list(keyword)
+    async def get_select(
+        *,
+        keyword: str | None = None,
+        category_id: int | None = None,
+        tag_ids: list[int] | None = None,
+        server_type: str | None = None,
+        mode: McpSearchMode = McpSearchMode.keyword,
+        semantic_weight: float = 1,
+    ) -> Select:
+        """
+        构建搜索查询
+
+        :param keyword: 关键字
+        :param category_id: 分类 id
+        :param tag_ids: 标签 id
+        :param server_type: 运行方式
+        :param mode: 搜索方式，semantic / hybrid 按关键字向量的余弦相似度排序，hybrid 同时融合关键字相关度
+        :param semantic_weight: hybrid 方式下余弦相似度的权重
+        :return:
+        """
+        embedding = None
+        if keyword and mode != McpSearchMode.keyword:
+            if settings.DATABASE_TYPE != 'postgresql':
+                raise errors.RequestError(msg='语义搜索仅支持 postgresql')
+            embedding = (await mcp_embedder.embed([keyword]))[0]
+            if mode == McpSearchMode.semantic:
+                semantic_weight = 1
+        return await mcp_server_dao.get_list(
+            keyword, category_id, tag_ids, server_type, embedding=embedding, semantic_weight=semantic_weight
+        )
+
+    @staticmethod
+    async def get_tool_select(
+        *, name: str | None = None, keyword: str | None = None, params: list[McpToolParamFilter] | None = None
+    ) -> Select:
+        """
+        构建工具检索查询
+
+        :param name: 工具名称
+        :param keyword: 工具名称包含的关键字
+        :param params: 工具需同时包含的参数
+        :return:
+        """
+        return await mcp_tool_dao.get_list(name, keyword, params)
+
+    @staticmethod
+    def get_fusion_weights() -> FusionWeights:
+        """获取融合搜索权重"""
+        return FusionWeights(
+            rrf_k=client_settings.MCP_FUSION_RRF_K,
+            keyword=client_settings.MCP_FUSION_KEYWORD_WEIGHT,
+            semantic=client_settings.MCP_FUSION_SEMANTIC_WEIGHT,
+            popularity=client_settings.MCP_FUSION_POPULARITY_WEIGHT,
+        )
+
+    @staticmethod
+    async def search_fusion(obj: SearchMcpParam, weights: FusionWeights | None = None) -> dict[str, Any]:
+        """
+        融合搜索：并发执行关键字检索和语义检索，按 RRF 合并后按调用量重排
+
+        每路最多取 MCP_FUSION_CANDIDATES 个候选，合并后在内存中按 (得分, id) 做游标分页；
+        调用量统计不含当天，同一天内翻页时排序不变。语义检索失败时只使用关键字检索的结果
+
+        :param obj: 搜索参数，keyword 不能为空
+        :param weights: 权重，默认取自配置
+        :return: 游标分页数据，debug 时附带 explain
+        """
+        if settings.DATABASE_TYPE != 'postgresql':
+            raise errors.RequestError(msg='语义搜索仅支持 postgresql')
+        weights = weights or McpServerService.get_fusion_weights()
+        limit = client_settings.MCP_FUSION_CANDIDATES
+        filters = (obj.category_id, obj.tag_ids, obj.server_type)
+
+        async def keyword_search() -> list[tuple[int, float]]:
+            async with async_db_session() as db:
+                return await mcp_server_dao.get_keyword_candidates(db, obj.keyword, *filters, limit)
+
+        async def semantic_search() -> list[tuple[int, float]]:
+            try:
+                embedding = (await mcp_embedder.embed([obj.keyword]))[0]
+                async with async_db_session.begin() as db:
+                    await mcp_embedding_dao.set_ef_search(db, max(client_settings.MCP_EMBEDDING_EF_SEARCH, limit))
+                    return await mcp_server_dao.get_semantic_candidates(db, embedding, *filters, limit)
+            except Exception as e:
+                log.warning(f'MCP 融合搜索的语义检索失败: {e}')
+                return []
+
+        keyword_hits, semantic_hits = await asyncio.gather(keyword_search(), semantic_search())
+        hits = fuse(keyword_hits, semantic_hits, weights)
+        today = timezone.now().date()
+        async with async_db_session() as db:
+            calls = {}
+            if hits:
+                start = today - timedelta(days=client_settings.MCP_FUSION_POPULARITY_DAYS)
+                calls = await mcp_usage_dao.get_calls(db, list(hits), start, today)
+            ranked = rerank(hits, calls, weights)
+            page = cursor_paging_list(ranked, [(-hit.score, hit.id) for hit in ranked], obj)
+            page_hits = page['items']
+            servers = {}
+            if page_hits:
+                servers = {
+                    mcp_server.id: mcp_server
+                    for mcp_server in await mcp_server_dao.get_search_list(db, [hit.id for hit in page_hits])
+                }
+        # 候选查询之后取消公开的 server 不返回
+        page['items'] = [servers[hit.id] for hit in page_hits if hit.id in servers]
+        if obj.debug:
+            page['explain'] = {
+                'rrf_k': weights.rrf_k,
+                'keyword_weight': weights.keyword,
+                'semantic_weight': weights.semantic,
+                'popularity_weight': weights.popularity,
+                'keyword_candidates': len(keyword_hits),
+                'semantic_candidates': len(semantic_hits),
+                'items': [dataclasses.asdict(hit) for hit in page_hits],
+            }
+        return page
 
     @staticmethod
-    async def get_mcp_last_7_day():
+    async def prepare_search(db: AsyncSession, mode: McpSearchMode) -> None:
+        """
+        语义搜索前调大 HNSW 候选数量，避免过滤和分页后结果不足
+
+        :param db: 搜索使用的数据库会话
+        :param mode: 搜索方式
+        :return:
+        """
+        if mode == McpSearchMode.semantic and settings.DATABASE_TYPE == 'postgresql':
+            await mcp_embedding_dao.set_ef_search(db, client_settings.MCP_EMBEDDING_EF_SEARCH)
+
+    @staticmethod
+    def enqueue_embedding(pk: int) -> None:
+        """
+        提交重新生成向量的任务
+
+        :param pk: mcp server id
+        :return:
+        """
+        if settings.DATABASE_TYPE != 'postgresql':
+            return
+        try:
+            celery_app.send_task('embed_mcp_server', args=(pk,))
+        except Exception as e:
+            log.warning(f'MCP 向量任务提交失败: {pk}, {e}')
+
+    @staticmethod
+    async def embed_server(pk: int) -> bool:
+        """
+        生成 mcp server 的向量，文本和模型均未变更时跳过，未公开或已删除时移除向量
+
+        :param pk: mcp server id
+        :return: 是否重新生成
+        """
+        async with async_db_session() as db:
+            row = await mcp_server_dao.get_search_source(db, pk)
+            version = await mcp_embedding_dao.get_version(db, pk)
+        if row is None or not row.is_public:
+            if version is not None:
+                async with async_db_session.begin() as db:
+                    await mcp_embedding_dao.delete_embedding(db, pk)
+                await mcp_version.bump()
+            return False
+        content = build_embedding_text(row.title, row.description, row.summary, row.tools)
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        if version == (mcp_embedder.model, content_hash):
+            return False
+        embedding = (await mcp_embedder.embed([content]))[0]
+        async with async_db_session.begin() as db:
+            await mcp_embedding_dao.upsert(db, pk, embedding, mcp_embedder.model, content_hash)
+        # 语义检索结果随之变化
+        await mcp_version.bump()
+        return True
+
+    @staticmethod
+    async def rebuild_embeddings() -> int:
+        """
+        逐个检查全部 mcp server 的向量，用于回填及切换向量模型
+
+        :return: 重新生成的数量
+        """
+        total, after = 0, 0
+        while True:
+            async with async_db_session() as db:
+                pks = await mcp_server_dao.get_search_pks(db, after, client_settings.MCP_SEARCH_REBUILD_BATCH_SIZE)
+            if not pks:
+                return total
+            for pk in pks:
+                try:
+                    total += await McpServerService.embed_server(pk)
+                except Exception as e:
+                    log.warning(f'MCP 向量生成失败: {pk}, {e}')
+            after = pks[-1]
+
+    @staticmethod
+    async def set_public(request: Request, pk: int, is_public: bool) -> None:
+        """
+        公开或取消公开 mcp server，取消公开后立即从搜索结果中移除，仅所有者或管理员可操作
+
+        :param request: FastAPI 请求对象
+        :param pk: mcp server id
+        :param is_public: 是否公开
+        :return:
+        """
         async with async_db_session.begin() as db:
-            stmt = await mcp_server_dao.get_mcp_last_7_day()
-            result = await db.execute(stmt)
-            return result.scalars().all()
+            mcp_server = await mcp_server_dao.get_mcp(db, pk)
+            if not mcp_server:
+                raise errors.NotFoundError(msg='MCP server 不存在')
+            McpServerService.check_owner(await McpServerService.get_request_user(db, request), mcp_server)
+            await mcp_server_dao.set_public(db, pk, is_public)
+            if not is_public:
+                await mcp_embedding_dao.delete_embedding(db, pk)
+        await mcp_facet_index.refresh(pk)
+        await mcp_feed.refresh(pk)
+        await mcp_suggest_index.publish(pk)
+        await mcp_version.bump(pk)
+        if is_public:
+            McpServerService.enqueue_embedding(pk)
+
+    @staticmethod
+    async def get_facets() -> dict[str, list[dict[str, Any]]]:
+        """获取搜索分面计数"""
+        return await mcp_facet_index.get_counts()
+
+    @staticmethod
+    async def get_feed(page: int, size: int) -> list[dict[str, Any]]:
+        """
+        获取最近一周公开的 mcp server，从 Redis 读取
+
+        :param page: 页码
+        :param size: 每页数量
+        :return:
+        """
+        return await mcp_feed.get_page(page, size)
 
     @staticmethod
     async def get_mcp(pk: int) -> McpServer:
         async with async_db_session.begin() as db:
             return await mcp_server_dao.get_mcp(db, pk)
 
+    @staticmethod
+    async def get_mcp_detail(pk: int) -> dict[str, Any] | None:
+        """
+        获取 mcp server 详情，只包含持久化的字段，熔断健康状态通过 get_mcp_health 单独获取
+
+        :param pk: mcp server id
+        :return:
+        """
+        mcp_server = await McpServerService.get_mcp(pk)
+        if not mcp_server:
+            return None
+        if mcp_server.mcp_endpoint and mcp_server.transport != McpTransportType.stdio:
+            # 用户打开详情页后大概率会调用工具，提前唤醒云函数；本地进程只在调用时启动
+            mcp_warmer.warm_in_background(
+                mcp_server.id,
+                mcp_server.mcp_endpoint,
+                mcp_server.transport,
+                [mcp_server.mcp_endpoint, *(mcp_server.mcp_endpoints or [])],
+            )
+        return GetMcpDetail.model_validate(mcp_server, from_attributes=True).model_dump()
+
+    @staticmethod
+    async def get_mcp_health(pk: int) -> dict[str, Any]:
+        """
+        获取 mcp server 的熔断健康状态，随调用实时变化，不参与详情的 ETag
+
+        :param pk: mcp server id
+        :return:
+        """
+        return await circuit_breaker.get_health(pk)
+
+    @staticmethod
+    async def get_mcp_detail_etag(pk: int) -> str | None:
+        """
+        获取 mcp server 详情的 ETag，只由持久化数据的版本号决定，不查询数据库
+
+        :param pk: mcp server id
+        :return: Redis 不可用时为 None
+        """
+        version = await mcp_version.get(pk)
+        if version is None:
+            return None
+        return build_etag('detail', pk, version)
+
+    @staticmethod
+    async def warm_mcp(pk: int) -> None:
+        """
+        详情未变更时仍在后台唤醒云函数，端点只从路由缓存读取，缓存未命中时不唤醒，不查询数据库
+
+        :param pk: mcp server id
+        :return:
+        """
+        route = await mcp_route_cache.get(pk, cached_only=True)
+        if route and route.mcp_endpoint and route.transport != McpTransportType.stdio:
+            mcp_warmer.warm_in_background(pk, route.mcp_endpoint, route.transport, route.endpoints)
+
+    @staticmethod
+    async def get_catalog_etag(*parts: Any) -> str | None:
+        """
+        获取搜索、最新列表等目录类响应的 ETag，由目录版本号和请求参数决定，不查询数据库
+
+        :param parts: 请求参数
+        :return: Redis 不可用时为 None
+        """
+        version = await mcp_version.get_catalog()
+        if version is None:
+            return None
+        return build_etag('catalog', version, *parts)
+
+    @staticmethod
+    def _is_upstream_failure(exc: Exception) -> bool:
+        """
+        判断异常是否计入熔断统计，上游正常返回的 JSON-RPC 错误（如参数错误）不计入，请求超时计入
+
+        :param exc: 异常
+        :return:
+        """
+        if isinstance(exc, McpError):
+            return exc.error.code == httpx.codes.REQUEST_TIMEOUT
+        return True
+
+    @staticmethod
+    async def _invoke_tool(
+        route: GetMcpRouteDetail,
+        obj: CallToolParam,
+        session: ClientSession | None = None,
+        progress_callback: ProgressFnT | None = None,
+        timeout: float | None = None,
+    ) -> CallToolResult:
+        """
+        调用工具；声明了缓存 TTL 的工具优先读取缓存，未命中时合并进行中的相同调用；
+        部署了多个副本时发往耗时最低的副本，幂等工具超过 p95 耗时未返回时向下一个副本对冲
+
+        :param route: 工具调用路由
+        :param obj: 工具调用参数
+        :param session: 已借用的会话，为空时从会话池借用
+        :param progress_callback: 进度通知回调
+        :param timeout: 超时时间（秒），包含借用会话的时间，为空时使用 server 的默认超时时间；合并的调用只控制本调用方的等待时间
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        timeout = timeout or McpServerService._get_timeout(route)
+        ttl = tool_cache.get_ttl(route.cache_config, obj.tool_name)
+        cache_key = None
+        if ttl:
+            cache_key = tool_cache.build_key(route.id, obj.tool_name, obj.arguments)
+            cached = await tool_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        async def call_upstream(client_session: ClientSession, deadline: float) -> CallToolResult:
+            with mcp_metrics.timer('call', route.id, mcp_metrics.tool_label(obj.tool_name, route.tool_names)) as timing:
+                try:
+                    result = await call_tool_with_deadline(
+                        client_session, obj.tool_name, obj.arguments, deadline - loop.time(), progress_callback
+                    )
+                except McpError as e:
+                    if e.error.code == httpx.codes.REQUEST_TIMEOUT:
+                        timing['outcome'] = 'timeout'
+                    raise
+                except asyncio.CancelledError:
+                    if loop.time() >= deadline:
+                        timing['outcome'] = 'timeout'
+                    raise
+                if result.isError:
+                    timing['outcome'] = 'tool_error'
+                return result
+
+        async def call(deadline: float) -> CallToolResult:
+            if session is None:
+                # 熔断中快速失败，不再等待上游连接超时
+                await circuit_breaker.acquire(route.id)
+            start = time.monotonic()
+
+            async def attempt(endpoint: str) -> CallToolResult:
+                attempt_start = time.monotonic()
+                async with mcp_session_pool.session(route.id, endpoint, route.transport, route.endpoints) as pooled:
+                    await mcp_warmer.record_call(
+                        route.id, cold_start_seconds=mcp_warmer.get_cold_start_seconds(pooled, attempt_start)
+                    )
+                    # maps_geo {'address': '大望路', 'city': '北京'}
+                    return await call_upstream(pooled.session, deadline)
+
+            try:
+                if session is None:
+                    # 需要进度通知的调用不对冲，避免多个副本的进度交错
+                    hedge = progress_callback is None and obj.tool_name in (route.idempotent_tools or ())
+                    result = await mcp_hedger.run(route.id, obj.tool_name, route.endpoints, attempt, hedge)
+                else:
+                    result = await call_upstream(session, deadline)
+            except BaseException as e:
+                # 客户端断开导致的取消不计入熔断统计，超时计入
+                if not isinstance(e, asyncio.CancelledError) or loop.time() >= deadline:
+                    await circuit_breaker.record(
+                        route.id,
+                        success=not McpServerService._is_upstream_failure(e),
+                        latency=time.monotonic() - start,
+                    )
+                raise
+            await circuit_breaker.record(route.id, success=True, latency=time.monotonic() - start)
+            return result
+
+        try:
+            if progress_callback is None and session is None:
+                # 合并进行中的相同调用；需要进度通知的流式调用和使用调用方会话的调用单独执行
+                # 合并的调用按 server 的超时时间执行，不受发起方的截止时间影响，每个调用方按各自的超时时间等待
+                key = single_flight.build_key(route.id, obj.tool_name, obj.arguments)
+                result = await asyncio.wait_for(
+                    single_flight.do(key, lambda: call(loop.time() + McpServerService._get_timeout(route))), timeout
+                )
+            else:
+                result = await asyncio.wait_for(call(loop.time() + timeout), timeout)
+        except asyncio.TimeoutError:
+            raise errors.CustomError(error=CustomErrorCode.MCP_CALL_TIMEOUT)
+        except McpError as e:
+            if e.error.code == httpx.codes.REQUEST_TIMEOUT:
+                raise errors.CustomError(error=CustomErrorCode.MCP_CALL_TIMEOUT)
+            raise
+
+        if cache_key:
+            await tool_cache.set(cache_key, result, ttl)
+        return result
+
+    @staticmethod
+    def _get_timeout(route: GetMcpRouteDetail, requested: float | None = None) -> float:
+        """
+        获取工具调用超时时间，客户端指定的超时时间不能超过 server 的配置
+
+        :param route: 工具调用路由
+        :param requested: 客户端指定的超时时间（秒）
+        :return:
+        """
+        limit = route.call_timeout or client_settings.MCP_CALL_TIMEOUT
+        return min(requested, limit) if requested else limit
+
+    @staticmethod
+    async def _get_callable_mcp(pk: int) -> GetMcpRouteDetail:
+        """
+        获取可调用的 mcp server 路由，命中缓存时不查询数据库
+
+        :param pk: mcp server id
+        :return:
+        """
+        route = await mcp_route_cache.get(pk)
+        if not route:
+            raise errors.NotFoundError(msg='MCP server 不存在')
+        if not route.mcp_endpoint:
+            raise errors.RequestError(msg='MCP server 尚未部署完成')
+        return route
+
+    @staticmethod
+    async def call_tool(
+        pk: int, obj: CallToolParam, caller: McpCaller, progress_callback: ProgressFnT | None = None
+    ) -> CallToolResult:
+        """
+        调用 mcp server 工具，复用会话池中已初始化的会话
+
+        :param pk: mcp server id
+        :param obj: 工具调用参数
+        :param caller: 调用方
+        :param progress_callback: 进度通知回调
+        :return:
+        """
+        route = await McpServerService._get_callable_mcp(pk)
+        await mcp_quota.consume(pk, caller)
+        return await McpServerService._invoke_tool(
+            route,
+            obj,
+            progress_callback=progress_callback,
+            timeout=McpServerService._get_timeout(route, caller.timeout),
+        )
+
+    @staticmethod
+    @asynccontextmanager
+    async def upstream_session(pk: int) -> AsyncIterator[PooledSession]:
+        """
+        借用 mcp server 的上游会话，用于工具调用以外的请求（列出工具、读取资源等）
+
+        :param pk: mcp server id
+        :return:
+        """
+        route = await McpServerService._get_callable_mcp(pk)
+        endpoint = mcp_hedger.rank(route.id, route.endpoints)[0]
+        async with mcp_session_pool.session(route.id, endpoint, route.transport, route.endpoints) as pooled:
+            yield pooled
+
+    @staticmethod
+    async def dump_result(pk: int, tool_name: str, result: CallToolResult) -> dict[str, Any]:
+        """
+        序列化工具调用结果，记录序列化耗时
+
+        :param pk: mcp server id
+        :param tool_name: 工具名称
+        :param result: 工具调用结果
+        :return:
+        """
+        # 调用时已加载路由，读取进程内缓存即可
+        route = await mcp_route_cache.get(pk, cached_only=True)
+        tool = mcp_metrics.tool_label(tool_name, route.tool_names if route else None)
+        with mcp_metrics.timer('serialize', pk, tool):
+            return result.model_dump(mode='json', by_alias=True)
+
+    @staticmethod
+    async def get_metrics() -> str:
+        """
+        获取所有 worker 汇总后的调用耗时指标
+
+        :return: Prometheus 文本格式
+        """
+        return await mcp_metrics.render()
+
+    @staticmethod
+    async def stream_tool(pk: int, obj: CallToolParam, caller: McpCaller) -> AsyncIterator[bytes]:
+        """
+        流式调用工具：先转发上游的进度通知，结束后将结果按内容块分片输出为 SSE 事件
+
+        :param pk: mcp server id
+        :param obj: 工具调用参数
+        :param caller: 调用方
+        :return:
+        """
+        route = await McpServerService._get_callable_mcp(pk)
+        await mcp_quota.consume(pk, caller)
+
+        async def event_stream() -> AsyncIterator[bytes]:
+            progress = ProgressQueue(client_settings.MCP_STREAM_PROGRESS_QUEUE_SIZE)
+            task = asyncio.create_task(
+                McpServerService._invoke_tool(
+                    route,
+                    obj,
+                    progress_callback=progress.on_progress,
+                    timeout=McpServerService._get_timeout(route, caller.timeout),
+                )
+            )
+            task.add_done_callback(progress.done)
+            try:
+                async for item in progress:
+                    yield encode_sse_event('progress', item)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    yield encode_sse_event('error', {'msg': format_call_error(e)})
+                    return
+                # 逐个事件序列化后立即发送，不在内存中保留全部分片；只统计序列化耗时，不含等待客户端读取的时间
+                events = iter_result_events(result, client_settings.MCP_STREAM_CHUNK_SIZE)
+                elapsed, outcome = 0.0, 'cancelled'
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            event = next(events)
+                        except StopIteration:
+                            outcome = 'ok'
+                            break
+                        except Exception:
+                            outcome = 'error'
+                            raise
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield event
+                finally:
+                    mcp_metrics.observe(
+                        'serialize', pk, mcp_metrics.tool_label(obj.tool_name, route.tool_names), outcome, elapsed
+                    )
+            finally:
+                # 客户端断开时取消上游调用
+                if not task.done():
+                    task.cancel()
+
+        return event_stream()
+
+    @staticmethod
+    async def call_tool_batch(obj: BatchCallToolParam, caller: McpCaller) -> list[dict[str, Any]]:
+        """
+        批量调用工具：同一 mcp server 的调用共用一个会话，整体并发受限，结果按请求顺序返回，失败和超时按条返回
+
+        :param obj: 批量调用参数
+        :param caller: 调用方
+        :return:
+        """
+        if len(obj.calls) > client_settings.MCP_BATCH_MAX_SIZE:
+            raise errors.RequestError(msg=f'单次批量调用不能超过 {client_settings.MCP_BATCH_MAX_SIZE} 个')
+        timeout = obj.timeout or caller.timeout or client_settings.MCP_BATCH_ITEM_TIMEOUT
+        semaphore = asyncio.Semaphore(client_settings.MCP_BATCH_MAX_CONCURRENCY)
+        results: list[dict[str, Any]] = [
+            {'index': index, 'mcp_id': item.mcp_id, 'tool_name': item.tool_name, 'success': False}
+            for index, item in enumerate(obj.calls)
+        ]
+
+        groups: dict[int, list[int]] = defaultdict(list)
+        for index, item in enumerate(obj.calls):
+            groups[item.mcp_id].append(index)
+        routes = await mcp_route_cache.get_many(list(groups.keys()))
+
+        async def run_item(route: GetMcpRouteDetail, index: int, session: ClientSession) -> None:
+            async with semaphore:
+                try:
+                    result = await McpServerService._invoke_tool(
+                        route, obj.calls[index], session, timeout=McpServerService._get_timeout(route, timeout)
+                    )
+                except Exception as e:
+                    results[index]['error'] = format_call_error(e)
+                else:
+                    results[index].update(success=not result.isError, result=result)
+
+        async def run_group(mcp_id: int, indexes: list[int]) -> None:
+            route = routes.get(mcp_id)
+            try:
+                if not route:
+                    raise errors.NotFoundError(msg='MCP server 不存在')
+                if not route.mcp_endpoint:
+                    raise errors.RequestError(msg='MCP server 尚未部署完成')
+                await mcp_quota.consume(mcp_id, caller, len(indexes))
+                await circuit_breaker.acquire(mcp_id)
+                start = time.monotonic()
+                try:
+                    endpoint = mcp_hedger.rank(mcp_id, route.endpoints)[0]
+                    async with mcp_session_pool.session(mcp_id, endpoint, route.transport, route.endpoints) as pooled:
+                        await mcp_warmer.record_call(
+                            mcp_id,
+                            calls=len(indexes),
+                            cold_start_seconds=mcp_warmer.get_cold_start_seconds(pooled, start),
+                        )
+                        await asyncio.gather(*[run_item(route, index, pooled.session) for index in indexes])
+                except Exception:
+                    # run_item 不会抛出异常，这里只有建立会话失败
+                    await circuit_breaker.record(mcp_id, success=False, latency=time.monotonic() - start)
+                    raise
+            except Exception as e:
+                error = format_call_error(e)
+                for index in indexes:
+                    if 'result' not in results[index] and not results[index].get('error'):
+                        results[index]['error'] = error
+
+        await asyncio.gather(*[run_group(mcp_id, indexes) for mcp_id, indexes in groups.items()])
+        return results
+
+    @staticmethod
+    async def invalidate_tool_cache(request: Request, pk: int, tool_name: str | None = None) -> None:
+        """
+        失效工具结果缓存，仅所有者或管理员可操作
+
+        :param request: FastAPI 请求对象
+        :param pk: mcp server id
+        :param tool_name: 工具名称，为空时失效全部工具
+        :return:
+        """
+        async with async_db_session() as db:
+            mcp_server = await mcp_server_dao.get_mcp(db, pk)
+            if not mcp_server:
+                raise errors.NotFoundError(msg='MCP server 不存在')
+            McpServerService.check_owner(await McpServerService.get_request_user(db, request), mcp_server)
+        await tool_cache.invalidate(pk, tool_name)
+
+    @staticmethod
+    async def get_warmup_stats(limit: int) -> list[dict[str, Any]]:
+        """
+        获取近期调用量最高的 server 的冷启动统计
+
+        :param limit: 数量
+        :return:
+        """
+        return await mcp_warmer.get_stats(limit)
+
+    @staticmethod
+    async def rebuild_facets() -> int:
+        """全量重建搜索分面计数"""
+        return await mcp_facet_index.rebuild()
+
+    @staticmethod
+    async def rebuild_feed() -> int:
+        """全量重建最新列表"""
+        return await mcp_feed.rebuild()
+
+    @staticmethod
+    async def rebuild_search_index() -> int:
+        """
+        分批重建全部 mcp server 的全文检索列，用于新增该列后回填及分词规则变更
+
+        :return: 处理的 server 数量
+        """
+        total, after = 0, 0
+        while True:
+            async with async_db_session.begin() as db:
+                pks = await mcp_server_dao.get_search_pks(db, after, client_settings.MCP_SEARCH_REBUILD_BATCH_SIZE)
+                for pk in pks:
+                    await mcp_server_dao.refresh_search_vector(db, pk)
+            if not pks:
+                await mcp_version.bump()
+                return total
+            total += len(pks)
+            after = pks[-1]
+
+    @staticmethod
+    async def rebuild_tools() -> int:
+        """
+        分批将全部 mcp server 的工具列表同步到 mcp_tool 表，用于新增该表后回填
+
+        :return: 变更的工具数量
+        """
+        total, after = 0, 0
+        while True:
+            async with async_db_session.begin() as db:
+                pks = await mcp_server_dao.get_search_pks(db, after, client_settings.MCP_SEARCH_REBUILD_BATCH_SIZE)
+                for pk in pks:
+                    row = await mcp_server_dao.get_search_source(db, pk)
+                    total += await mcp_tool_dao.sync_tools(db, pk, build_tool_rows(row.tools))
+            if not pks:
+                await mcp_version.bump()
+                await mcp_suggest_index.publish()
+                return total
+            after = pks[-1]
+
+    @staticmethod
+    async def flush_usage() -> int:
+        """将调用量批量落库"""
+        return await mcp_quota.flush()
+
+    @staticmethod
+    async def set_user_key(pk: int, caller: McpCaller, user_key: str | None) -> None:
+        """
+        保存或删除登录用户自己的 key，之后携带该 key 调用不计免费次数
+
+        :param pk: mcp server id
+        :param caller: 调用方
+        :param user_key: 用户 key，为空时删除
+        :return:
+        """
+        async with async_db_session() as db:
+            if not await mcp_server_dao.get_mcp(db, pk):
+                raise errors.NotFoundError(msg='MCP server 不存在')
+        await mcp_quota.set_user_key(caller.user, pk, user_key)
+
+    @staticmethod
+    def get_suggestions(keyword: str, size: int) -> list[dict[str, Any]]:
+        """
+        获取输入联想，只查询进程内索引
+
+        :param keyword: 关键字
+        :param size: 数量
+        :return:
+        """
+        return mcp_suggest_index.search(keyword, size)
+
+    @staticmethod
+    def get_tool_cache_stats() -> dict[str, int]:
+        """获取当前进程的工具结果缓存命中统计"""
+        return dict(tool_cache.stats)
+
+    @staticmethod
+    def get_hedge_stats() -> dict[str, Any]:
+        """获取当前进程的对冲请求统计和各副本耗时"""
+        return mcp_hedger.get_stats()
+
+    @staticmethod
+    def _get_idempotent_tools(tools: dict[str, Any] | None) -> list[str]:
+        """
+        从内省的工具列表中获取声明为幂等或只读的工具
+
+        :param tools: McpServer.tools
+        :return:
+        """
+        result = []
+        for tool in (tools or {}).get('tools') or []:
+            annotations = tool.get('annotations') or {}
+            if annotations.get('idempotentHint') or annotations.get('readOnlyHint'):
+                result.append(tool['name'])
+        return result
+
+    @staticmethod
+    async def update_replicas(request: Request, pk: int, obj: UpdateMcpReplicaParam) -> dict[str, Any]:
+        """
+        更新 mcp server 的副本端点和幂等工具，仅所有者或管理员可操作
+
+        :param request: FastAPI 请求对象
+        :param pk: mcp server id
+        :param obj: 副本参数
+        :return:
+        """
+        async with async_db_session.begin() as db:
+            mcp_server = await mcp_server_dao.get_mcp(db, pk)
+            if not mcp_server:
+                raise errors.NotFoundError(msg='MCP server 不存在')
+            McpServerService.check_owner(await McpServerService.get_request_user(db, request), mcp_server)
+            if mcp_server.transport in (McpTransportType.api, McpTransportType.stdio):
+                raise errors.RequestError(msg='进程内转发或本地运行的 MCP server 不支持副本')
+            # 副本端点由用户填写，会话池会直接连接，只允许公网地址
+            for endpoint in obj.mcp_endpoints:
+                await check_public_url(endpoint)
+            idempotent_tools = obj.idempotent_tools
+            if idempotent_tools is None:
+                idempotent_tools = McpServerService._get_idempotent_tools(mcp_server.tools)
+            mcp_server.mcp_endpoints = obj.mcp_endpoints or None
+            mcp_server.idempotent_tools = idempotent_tools
+        # 移除的副本的会话在下次借用时回收
+        await mcp_route_cache.invalidate(pk)
+        await mcp_version.bump(pk)
+        return {'mcp_endpoints': obj.mcp_endpoints, 'idempotent_tools': idempotent_tools}
+
     @staticmethod
     async def add_mcp(request: Request, mcp_title: str, obj: AddMcpServerParam, base_command, image) -> (bool, int):
         username = 'gage'
@@ -65,23 +946,152 @@ class McpServerService:
                 # 如果已存在，执行更新操作
                 mcp_server_exist.description = obj.description
                 mcp_server_exist.git = obj.git
+                mcp_server_exist.cache_config = obj.cache_config
+                mcp_server_exist.call_timeout = obj.call_timeout
                 mcp_server_exist.run_cmd = ' '.join(base_command)
                 mcp_server_exist.base_image = image
                 # 更新其他字段，如果需要的话
                 await db.flush()  # 确保更新被提交
-                return True, mcp_server_exist.id
+                exist, pk = True, mcp_server_exist.id
             else:
                 mcp_server = McpServer(
                     title=mcp_title,
                     description=obj.description,
                     git=obj.git,
+                    cache_config=obj.cache_config,
+                    call_timeout=obj.call_timeout,
                     run_cmd=' '.join(base_command),
                     image=image,
                 )
                 # 关联mcp_server
                 mcp_server.user = user
                 # 如果不存在，新增 mcp_server
-                return False, await mcp_server_dao.add_mcp(db, mcp_server)
+                exist, pk = False, await mcp_server_dao.add_mcp(db, mcp_server)
+            await mcp_server_dao.refresh_search_vector(db, pk)
+        if exist:
+            # 缓存配置、超时配置可能变更，提交后再失效，避免并发请求在提交前重新加载旧配置
+            await tool_cache.invalidate(pk)
+            await mcp_route_cache.invalidate(pk)
+        await mcp_facet_index.refresh(pk)
+        await mcp_feed.refresh(pk)
+        await mcp_suggest_index.publish(pk)
+        await mcp_version.bump(pk)
+        McpServerService.enqueue_embedding(pk)
+        return exist, pk
+
+    @staticmethod
+    async def add_api_mcp(request: Request, obj: AddMcpApiParam) -> int:
+        """
+        注册 OpenAPI 转发的 mcp server，工具调用在进程内转发到接口，不需要构建和部署函数
+
+        :param request: FastAPI 请求对象
+        :param obj: 注册参数
+        :return:
+        """
+        document = obj.openapi
+        base_url = obj.base_url
+        if document is None:
+            await check_public_url(obj.openapi_url)
+            try:
+                async with create_public_http_client() as client:
+                    async with client.stream('GET', obj.openapi_url) as response:
+                        response.raise_for_status()
+                        content, truncated = await read_body(response, client_settings.MCP_API_DOCUMENT_MAX_SIZE)
+                if truncated:
+                    raise errors.RequestError(msg='OpenAPI 文档过大')
+                document = json.loads(content)
+            except (httpx.HTTPError, ValueError) as e:
+                raise errors.RequestError(msg=f'OpenAPI 文档下载失败: {e}')
+            if not base_url and document.get('servers'):
+                # servers 可能是相对于文档地址的路径
+                base_url = urljoin(obj.openapi_url, document['servers'][0].get('url', ''))
+        config = await run_in_threadpool(compile_openapi, document, base_url)
+        # 转发时每次请求还会重新校验，防止注册后解析结果变化
+        await check_public_url(config['base_url'])
+        config['headers'] = obj.headers
+        introspection = describe_openapi(config)
+
+        async with async_db_session.begin() as db:
+            user = await McpServerService.get_request_user(db, request)
+            mcp_server = await mcp_server_dao.get_mcp_by_title(db, user, obj.title)
+            if mcp_server is None:
+                mcp_server = McpServer(title=obj.title)
+                mcp_server.user = user
+                db.add(mcp_server)
+            mcp_server.description = obj.description
+            mcp_server.transport = McpTransportType.api
+            mcp_server.server_type = McpServerType.remote
+            mcp_server.mcp_endpoint = config['base_url']
+            mcp_server.api_config = config
+            mcp_server.capabilities = introspection['capabilities']
+            mcp_server.tools = introspection['tools']
+            mcp_server.cache_config = obj.cache_config
+            mcp_server.call_timeout = obj.call_timeout
+            mcp_server.is_public = True
+            await db.flush()
+            pk = mcp_server.id
+            await mcp_server_dao.refresh_search_vector(db, pk)
+            await mcp_tool_dao.sync_tools(db, pk, build_tool_rows(mcp_server.tools))
+        # 转发配置变更后重新建立进程内会话
+        await mcp_session_pool.evict(pk)
+        await mcp_route_cache.invalidate(pk)
+        await tool_cache.invalidate(pk)
+        await mcp_facet_index.refresh(pk)
+        await mcp_feed.refresh(pk)
+        await mcp_suggest_index.publish(pk)
+        await mcp_version.bump(pk)
+        McpServerService.enqueue_embedding(pk)
+        return pk
+
+    @staticmethod
+    async def add_local_mcp(
+        request: Request, mcp_title: str, obj: AddMcpServerParam, mcp_conf: MCPServersConfig
+    ) -> tuple[int, str]:
+        """
+        注册本地运行的 mcp server，调用时由会话池在本机启动 stdio 子进程，不需要部署函数，仅管理员可注册
+
+        启动命令同时写入 mcp_endpoint，命令变更后会话池中的旧进程随之回收
+
+        :param request: FastAPI 请求对象
+        :param mcp_title: mcp server 标题
+        :param obj: 注册参数
+        :param mcp_conf: 启动配置
+        :return: (mcp server id, 启动命令)
+        """
+        command = shlex.join([mcp_conf.command, *mcp_conf.args])
+        parse_command(command)
+
+        async with async_db_session.begin() as db:
+            # 启动命令在本机运行，仅管理员可注册
+            user = await McpServerService.get_request_user(db, request)
+            if not McpServerService.is_admin(user):
+                raise errors.AuthorizationError(msg='仅管理员可注册本地运行的 MCP server')
+            mcp_server = await mcp_server_dao.get_mcp_by_title(db, user, mcp_title)
+            if mcp_server is None:
+                mcp_server = McpServer(title=mcp_title)
+                mcp_server.user = user
+                db.add(mcp_server)
+            mcp_server.description = obj.description
+            mcp_server.git = obj.git
+            mcp_server.server_type = McpServerType.local
+            mcp_server.transport = McpTransportType.stdio
+            mcp_server.mcp_endpoint = command
+            mcp_server.run_cmd = command
+            mcp_server.envs = filter_env(mcp_conf.env)
+            mcp_server.cache_config = obj.cache_config
+            mcp_server.call_timeout = obj.call_timeout
+            await db.flush()
+            pk = mcp_server.id
+            await mcp_server_dao.refresh_search_vector(db, pk)
+        # 环境变量可能变更，重新启动进程
+        await mcp_session_pool.evict(pk)
+        await mcp_route_cache.invalidate(pk)
+        await tool_cache.invalidate(pk)
+        await mcp_facet_index.refresh(pk)
+        await mcp_feed.refresh(pk)
+        await mcp_suggest_index.publish(pk)
+        await mcp_version.bump(pk)
+        return pk, command
 
 
 mcp_server_service: McpServerService = McpServerService()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+
+from typing import Any
+
+from backend.app.client.conf import client_settings
+from backend.common.enums import McpCircuitState
+from backend.common.exception import errors
+from backend.common.log import log
+from backend.database.redis import redis_client
+from backend.utils.lru_cache import LRUCache
+
+# 记录一次调用结果并重新计算窗口内的健康度、判定状态迁移
+# KEYS: 状态 hash，窗口分桶前缀，半开探测锁
+# ARGV: 当前毫秒时间，分桶毫秒数，分桶数，是否失败，是否慢调用，最小调用数，错误率阈值，慢调用率阈值
+_RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local bucket_ms = tonumber(ARGV[2])
+local buckets = tonumber(ARGV[3])
+local is_error = tonumber(ARGV[4])
+local is_slow = tonumber(ARGV[5])
+local bucket = math.floor(now / bucket_ms)
+local bucket_key = KEYS[2] .. ':' .. bucket
+
+redis.call('HINCRBY', bucket_key, 'total', 1)
+if is_error == 1 then redis.call('HINCRBY', bucket_key, 'errors', 1) end
+if is_slow == 1 then redis.call('HINCRBY', bucket_key, 'slow', 1) end
+redis.call('PEXPIRE', bucket_key, bucket_ms * (buckets + 1))
+
+local total, errs, slow = 0, 0, 0
+for i = 0, buckets - 1 do
+    local v = redis.call('HMGET', KEYS[2] .. ':' .. (bucket - i), 'total', 'errors', 'slow')
+    total = total + (tonumber(v[1]) or 0)
+    errs = errs + (tonumber(v[2]) or 0)
+    slow = slow + (tonumber(v[3]) or 0)
+end
+local error_rate = total > 0 and errs / total or 0
+local slow_rate = total > 0 and slow / total or 0
+
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'half_open' then
+    redis.call('DEL', KEYS[3])
+    if is_error == 1 then
+        state = 'open'
+        redis.call('HSET', KEYS[1], 'opened_at', now)
+    else
+        -- 探测成功，清空窗口重新统计
+        state = 'closed'
+        for i = 0, buckets - 1 do
+            redis.call('DEL', KEYS[2] .. ':' .. (bucket - i))
+        end
+        total, error_rate, slow_rate = 0, 0, 0
+    end
+elseif state == 'closed' and total >= tonumber(ARGV[6])
+    and (error_rate >= tonumber(ARGV[7]) or slow_rate >= tonumber(ARGV[8])) then
+    state = 'open'
+    redis.call('HSET', KEYS[1], 'opened_at', now)
+end
+
+local score = math.max(0, 1 - error_rate - 0.5 * slow_rate)
+if state == 'open' then score = 0 end
+redis.call('HSET', KEYS[1], 'state', state, 'score', tostring(score),
+    'error_rate', tostring(error_rate), 'slow_rate', tostring(slow_rate), 'total', total, 'updated_at', now)
+return state
+"""
+
+# 判断是否放行调用，熔断到期后切换为半开状态，并通过探测锁只放行一个请求
+# KEYS: 状态 hash，半开探测锁
+# ARGV: 当前毫秒时间，熔断毫秒数，探测锁毫秒数
+_ALLOW_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then return {1, state} end
+if state == 'open' then
+    local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at')) or 0
+    if tonumber(ARGV[1]) - opened_at < tonumber(ARGV[2]) then return {0, state} end
+    state = 'half_open'
+    redis.call('HSET', KEYS[1], 'state', state)
+end
+if redis.call('SET', KEYS[2], 1, 'NX', 'PX', ARGV[3]) then return {1, state} end
+return {0, state}
+"""
+
+
+class CircuitBreaker:
+    """
+    按 mcp server 维度的熔断器，状态和滑动窗口统计保存在 Redis 中，所有 worker 共享
+
+    - closed: 正常放行，窗口内错误率或慢调用率超过阈值后熔断
+    - open: 快速失败，持续 MCP_CIRCUIT_OPEN_SECONDS 后进入半开
+    - half_open: 只放行一个探测请求，成功则恢复，失败则重新熔断
+
+    closed / open 状态在进程内缓存 MCP_CIRCUIT_LOCAL_TTL 秒，正常调用无需额外的 Redis 往返
+    """
+
+    def __init__(self, prefix: str, local_ttl: float) -> None:
+        self.prefix = prefix
+        self.local_ttl = local_ttl
+        self._local: LRUCache[str] = LRUCache(4096)
+        self._record = redis_client.register_script(_RECORD_SCRIPT)
+        self._allow = redis_client.register_script(_ALLOW_SCRIPT)
+
+    def _keys(self, mcp_id: int) -> tuple[str, str, str]:
+        # 使用 hash tag 保证同一 server 的键落在同一 slot
+        base = f'{self.prefix}:{{{mcp_id}}}'
+        return f'{base}:state', f'{base}:bucket', f'{base}:probe'
+
+    async def acquire(self, mcp_id: int) -> None:
+        """
+        调用前检查熔断状态，熔断中直接抛出异常
+
+        :param mcp_id: mcp server id
+        :return:
+        """
+        state = self._local.get(mcp_id)
+        if state is None:
+            state_key, _, probe_key = self._keys(mcp_id)
+            try:
+                allowed, state = await self._allow(
+                    keys=[state_key, probe_key],
+                    args=[
+                        int(time.time() * 1000),
+                        client_settings.MCP_CIRCUIT_OPEN_SECONDS * 1000,
+                        client_settings.MCP_CIRCUIT_PROBE_TIMEOUT * 1000,
+                    ],
+                )
+            except Exception as e:
+                # Redis 不可用时不影响调用
+                log.warning(f'熔断状态读取失败: {e}')
+                return
+            if state != McpCircuitState.half_open:
+                self._local.set(mcp_id, state, self.local_ttl)
+            if allowed:
+                return
+        if state == McpCircuitState.closed:
+            return
+        raise errors.ServiceUnavailableError(msg='MCP server 暂时不可用，请稍后重试')
+
+    async def record(self, mcp_id: int, *, success: bool, latency: float) -> None:
+        """
+        记录调用结果
+
+        :param mcp_id: mcp server id
+        :param success: 是否成功
+        :param latency: 耗时（秒）
+        :return:
+        """
+        bucket_seconds = client_settings.MCP_CIRCUIT_BUCKET_SECONDS
+        try:
+            state = await self._record(
+                keys=list(self._keys(mcp_id)),
+                args=[
+                    int(time.time() * 1000),
+                    bucket_seconds * 1000,
+                    max(client_settings.MCP_CIRCUIT_WINDOW_SECONDS // bucket_seconds, 1),
+                    0 if success else 1,
+                    1 if latency >= client_settings.MCP_CIRCUIT_SLOW_CALL_SECONDS else 0,
+                    client_settings.MCP_CIRCUIT_MIN_CALLS,
+                    client_settings.MCP_CIRCUIT_ERROR_RATE,
+                    client_settings.MCP_CIRCUIT_SLOW_RATE,
+                ],
+            )
+        except Exception as e:
+            log.warning(f'熔断状态写入失败: {e}')
+            return
+        if state == McpCircuitState.open:
+            log.warning(f'MCP server {mcp_id} 已熔断')
+        if state != McpCircuitState.half_open:
+            self._local.set(mcp_id, state, self.local_ttl)
+
+    async def get_health(self, mcp_id: int) -> dict[str, Any]:
+        """
+        获取健康状态
+
+        :param mcp_id: mcp server id
+        :return:
+        """
+        state_key, _, _ = self._keys(mcp_id)
+        try:
+            data = await redis_client.hgetall(state_key)
+        except Exception as e:
+            log.warning(f'熔断状态读取失败: {e}')
+            data = {}
+        return {
+            'state': data.get('state', McpCircuitState.closed),
+            'score': float(data.get('score', 1)),
+            'error_rate': float(data.get('error_rate', 0)),
+            'slow_rate': float(data.get('slow_rate', 0)),
+            'total': int(data.get('total', 0)),
+        }
+
+    async def reset(self, mcp_id: int) -> None:
+        """
+        重置熔断状态，重新部署后调用
+
+        :param mcp_id: mcp server id
+        :return:
+        """
+        self._local.delete(mcp_id)
+        await redis_client.delete_prefix(f'{self.prefix}:{{{mcp_id}}}:')
+
+
+# 创建熔断器单例
+circuit_breaker: CircuitBreaker = CircuitBreaker(
+    prefix=client_settings.MCP_CIRCUIT_REDIS_PREFIX,
+    local_ttl=client_settings.MCP_CIRCUIT_LOCAL_TTL,
+)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import math
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+import httpx
+
+from backend.app.client.conf import client_settings
+from backend.app.client.utils.mcp_transport import create_shared_http_client
+from backend.app.client.utils.search_index import segment
+from backend.common.exception import errors
+
+
+class McpEmbedder(ABC):
+    """文本向量生成器，新增实现后在 _EMBEDDERS 中注册"""
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+
+    @property
+    @abstractmethod
+    def model(self) -> str:
+        """模型标识，写入 McpEmbedding.model，变更后已有向量需要重新生成"""
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        生成文本向量
+
+        :param texts: 文本列表
+        :return: 与文本一一对应的向量
+        """
+
+
+class HashEmbedder(McpEmbedder):
+    """
+    本地哈希向量：对分词结果做带符号的特征哈希后归一化
+
+    结果确定、不依赖外部服务，适用于测试和离线环境，只能衡量字面重合程度
+    """
+
+    @property
+    def model(self) -> str:
+        return f'local-hash-{self.dimension}'
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimension
+        for term in segment(text):
+            for token in term:
+                value = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'little')
+                vector[value % self.dimension] += 1 if value >> 63 else -1
+        norm = math.sqrt(sum(item * item for item in vector))
+        return [item / norm for item in vector] if norm else vector
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class HttpEmbedder(McpEmbedder):
+    """OpenAI 兼容的 embeddings 接口，如 OpenAI、阿里云百炼兼容模式"""
+
+    def __init__(self, dimension: int, url: str, api_key: str, model: str, timeout: float) -> None:
+        super().__init__(dimension)
+        self.url = url
+        self.api_key = api_key
+        self.model_name = model
+        self.timeout = timeout
+
+    @property
+    def model(self) -> str:
+        return f'{self.model_name}-{self.dimension}'
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        body = {'model': self.model_name, 'input': texts, 'dimensions': self.dimension, 'encoding_format': 'float'}
+        try:
+            async with create_shared_http_client(
+                headers={'Authorization': f'Bearer {self.api_key}'}, timeout=httpx.Timeout(self.timeout)
+            ) as client:
+                response = await client.post(self.url, json=body)
+                response.raise_for_status()
+                data = response.json()['data']
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            raise errors.ServerError(msg=f'向量生成失败: {e}')
+        return [item['embedding'] for item in sorted(data, key=lambda item: item['index'])]
+
+
+_EMBEDDERS: dict[str, Callable[[], McpEmbedder]] = {
+    'local': lambda: HashEmbedder(client_settings.MCP_EMBEDDING_DIMENSION),
+    'openai': lambda: HttpEmbedder(
+        client_settings.MCP_EMBEDDING_DIMENSION,
+        client_settings.MCP_EMBEDDING_API_URL,
+        client_settings.MCP_EMBEDDING_API_KEY,
+        client_settings.MCP_EMBEDDING_MODEL,
+        client_settings.MCP_EMBEDDING_TIMEOUT,
+    ),
+}
+
+
+def create_embedder(provider: str) -> McpEmbedder:
+    """
+    创建向量生成器
+
+    :param provider: 名称，见 MCP_EMBEDDING_PROVIDER
+    :return:
+    """
+    if provider not in _EMBEDDERS:
+        raise ValueError(f'未知的向量生成器: {provider}')
+    return _EMBEDDERS[provider]()
+
+
+def build_embedding_text(title: str | None, description: str | None, summary: str | None, tools: Any) -> str:
+    """
+    拼接生成向量的文本：标题、描述、总结，以及每个工具的名称和描述
+
+    :param title: 标题
+    :param description: 描述
+    :param summary: 总结
+    :param tools: 工具列表
+    :return:
+    """
+    lines = [value for value in (title, description, summary) if value]
+    for tool in (tools or {}).get('tools') or []:
+        if isinstance(tool, dict) and tool.get('name'):
+            lines.append(f'{tool["name"]}: {tool.get("description") or ""}'.strip())
+    return '\n'.join(lines)[: client_settings.MCP_EMBEDDING_MAX_CHARS]
+
+
+# 创建向量生成器单例
+mcp_embedder: McpEmbedder = create_embedder(client_settings.MCP_EMBEDDING_PROVIDER)
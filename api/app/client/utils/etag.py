@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import uuid
+
+from typing import Any
+
+from fastapi import Request, Response
+
+from backend.app.client.conf import client_settings
+from backend.common.log import log
+from backend.database.redis import redis_client
+
+# 读取版本号，纪元不存在时生成，使 Redis 数据丢失后计数从头开始也不会与旧的 ETag 相同
+_GET_SCRIPT = """
+redis.call('HSETNX', KEYS[1], 'epoch', ARGV[1])
+return redis.call('HMGET', KEYS[1], 'epoch', ARGV[2])
+"""
+
+
+class McpVersion:
+    """
+    mcp server 版本号，用于生成 ETag
+
+    保存在 Redis hash 中：每个 server 一个计数（server id -> 版本号），server 行变更后加一；
+    catalog 为目录版本号，任一 server 变更或语义检索向量变更后加一，用于搜索、最新列表等整体校验
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._get = redis_client.register_script(_GET_SCRIPT)
+
+    async def bump(self, pk: int | None = None) -> None:
+        """
+        增加版本号，mcp server 变更后调用
+
+        :param pk: mcp server id，为空时只增加目录版本号
+        :return:
+        """
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                if pk is not None:
+                    pipe.hincrby(self.key, str(pk), 1)
+                pipe.hincrby(self.key, 'catalog', 1)
+                await pipe.execute()
+        except Exception as e:
+            log.warning(f'MCP 版本号更新失败: {pk}, {e}')
+
+    async def _read(self, field: str) -> str | None:
+        try:
+            epoch, version = await self._get(keys=[self.key], args=[uuid.uuid4().hex, field])
+        except Exception as e:
+            log.warning(f'MCP 版本号读取失败: {field}, {e}')
+            return None
+        return f'{epoch}.{version or 0}'
+
+    async def get(self, pk: int) -> str | None:
+        """
+        获取 mcp server 版本号
+
+        :param pk: mcp server id
+        :return: Redis 不可用时为 None
+        """
+        return await self._read(str(pk))
+
+    async def get_catalog(self) -> str | None:
+        """
+        获取目录版本号
+
+        :return: Redis 不可用时为 None
+        """
+        return await self._read('catalog')
+
+
+def build_etag(*parts: Any) -> str:
+    """
+    生成弱 ETag
+
+    :param parts: 决定响应内容的值，如版本号、请求参数
+    :return:
+    """
+    content = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return f'W/"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    判断请求头 If-None-Match 是否包含 ETag，按弱比较忽略 W/ 前缀
+
+    :param request: FastAPI 请求对象
+    :param etag: 当前 ETag
+    :return:
+    """
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in {value.strip().removeprefix('W/') for value in header.split(',')}
+
+
+def set_etag(response: Response, etag: str | None) -> None:
+    """
+    设置 ETag，并要求客户端每次使用缓存前重新校验
+
+    :param response: FastAPI 响应对象
+    :param etag: ETag，为空时不设置
+    :return:
+    """
+    if etag:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+
+
+def not_modified(etag: str) -> Response:
+    """
+    304 响应
+
+    :param etag: ETag
+    :return:
+    """
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+
+# 创建版本号单例
+mcp_version: McpVersion = McpVersion(key=client_settings.MCP_VERSION_REDIS_KEY)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from collections import defaultdict
+from typing import Any
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.common.log import log
+from backend.database.db import async_db_session
+from backend.database.redis import redis_client
+
+# 对比 server 当前与上次记录的分面取值，只对差异部分增减计数
+_APPLY_SCRIPT = """
+local new = {}
+for i = 1, #ARGV do new[ARGV[i]] = true end
+local old = {}
+for _, member in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+  old[member] = true
+  if not new[member] then redis.call('HINCRBY', KEYS[1], member, -1) end
+end
+for i = 1, #ARGV do
+  if not old[ARGV[i]] then redis.call('HINCRBY', KEYS[1], ARGV[i], 1) end
+end
+redis.call('DEL', KEYS[2])
+if #ARGV > 0 then redis.call('SADD', KEYS[2], unpack(ARGV)) end
+return 1
+"""
+
+# 分面：分类、标签、运行方式
+_FACETS = ('category', 'tag', 'server_type')
+
+
+class McpFacetIndex:
+    """
+    mcp server 搜索分面计数
+
+    计数保存在 Redis hash 中（category:{id} / tag:{id} / server_type:{value} -> 公开的 server 数量），
+    同时为每个 server 记录其计入的分面取值；server 变更后只对比该 server 前后的取值增减计数，
+    不在搜索请求中 GROUP BY。计数丢失时全量重建，定时任务定期全量重建以修正偏差
+    """
+
+    def __init__(self, prefix: str, local_ttl: float) -> None:
+        self.prefix = prefix
+        self.local_ttl = local_ttl
+        self._apply = redis_client.register_script(_APPLY_SCRIPT)
+        self._local: tuple[float, dict[str, list[dict[str, Any]]]] | None = None
+        self._rebuild_lock = asyncio.Lock()
+
+    @property
+    def _counts_key(self) -> str:
+        return f'{self.prefix}:counts'
+
+    @property
+    def _names_key(self) -> str:
+        return f'{self.prefix}:names'
+
+    def _server_key(self, pk: int) -> str:
+        return f'{self.prefix}:server:{pk}'
+
+    @staticmethod
+    def _collect(rows: Any, tag_rows: Any) -> tuple[dict[int, list[str]], dict[str, str]]:
+        """
+        整理 server 的分面取值
+
+        :param rows: get_facet_rows 的结果
+        :param tag_rows: get_facet_tag_rows 的结果
+        :return: (server id -> 分面取值, 分面取值 -> 名称)
+        """
+        members: dict[int, list[str]] = {}
+        names: dict[str, str] = {}
+        public = set()
+        for row in rows:
+            items = members[row.id] = []
+            # 未公开的 server 不计入
+            if not row.is_public:
+                continue
+            public.add(row.id)
+            if row.category_id is not None:
+                items.append(f'category:{row.category_id}')
+                names[f'category:{row.category_id}'] = row.category_name
+            if row.server_type:
+                items.append(f'server_type:{row.server_type}')
+        for server_id, tag_id, tag_name in tag_rows:
+            if server_id in public:
+                members[server_id].append(f'tag:{tag_id}')
+                names[f'tag:{tag_id}'] = tag_name
+        return members, names
+
+    async def refresh(self, pk: int) -> None:
+        """
+        更新单个 server 的分面计数，server 新增、公开、分类或标签变更后调用
+
+        :param pk: mcp server id
+        :return:
+        """
+        try:
+            async with async_db_session() as db:
+                rows = await mcp_server_dao.get_facet_rows(db, [pk])
+                tag_rows = await mcp_server_dao.get_facet_tag_rows(db, [pk])
+            members, names = self._collect(rows, tag_rows)
+            if names:
+                await redis_client.hset(self._names_key, mapping=names)
+            await self._apply(keys=[self._counts_key, self._server_key(pk)], args=members.get(pk, []))
+            self._local = None
+        except Exception as e:
+            log.warning(f'MCP 搜索分面计数更新失败: {pk}, {e}')
+
+    async def rebuild(self) -> int:
+        """
+        全量重建分面计数
+
+        :return: 公开的 server 数量
+        """
+        async with self._rebuild_lock:
+            async with async_db_session() as db:
+                rows = await mcp_server_dao.get_facet_rows(db)
+                tag_rows = await mcp_server_dao.get_facet_tag_rows(db)
+            members, names = self._collect(rows, tag_rows)
+            counts: dict[str, int] = defaultdict(int)
+            for items in members.values():
+                for member in items:
+                    counts[member] += 1
+
+            await redis_client.delete_prefix(f'{self.prefix}:server:')
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(self._counts_key, self._names_key)
+                # 保留一个占位字段，区分“没有公开的 server”与“计数丢失”
+                pipe.hset(self._counts_key, mapping={'_': 0, **counts})
+                if names:
+                    pipe.hset(self._names_key, mapping=names)
+                for pk, items in members.items():
+                    if items:
+                        pipe.sadd(self._server_key(pk), *items)
+                await pipe.execute()
+            self._local = None
+            return len(members)
+
+    async def get_counts(self) -> dict[str, list[dict[str, Any]]]:
+        """
+        获取各分面取值的 server 数量，按数量降序
+
+        :return: {"category": [{"value", "name", "count"}], "tag": [...], "server_type": [...]}
+        """
+        now = time.monotonic()
+        if self._local is not None and self._local[0] > now:
+            return self._local[1]
+        try:
+            counts, names = await asyncio.gather(
+                redis_client.hgetall(self._counts_key), redis_client.hgetall(self._names_key)
+            )
+            if not counts:
+                await self.rebuild()
+                counts, names = await asyncio.gather(
+                    redis_client.hgetall(self._counts_key), redis_client.hgetall(self._names_key)
+                )
+        except Exception as e:
+            log.warning(f'MCP 搜索分面计数读取失败: {e}')
+            return {facet: [] for facet in _FACETS}
+
+        result: dict[str, list[dict[str, Any]]] = {facet: [] for facet in _FACETS}
+        for member, count in counts.items():
+            facet, _, value = member.partition(':')
+            if facet not in result or int(count) <= 0:
+                continue
+            result[facet].append({'value': value, 'name': names.get(member, value), 'count': int(count)})
+        for items in result.values():
+            items.sort(key=lambda item: (-item['count'], item['value']))
+        self._local = (now + self.local_ttl, result)
+        return result
+
+
+# 创建搜索分面计数单例
+mcp_facet_index: McpFacetIndex = McpFacetIndex(
+    prefix=client_settings.MCP_FACET_REDIS_PREFIX,
+    local_ttl=client_settings.MCP_FACET_LOCAL_TTL,
+)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+from datetime import datetime, timedelta
+from typing import Any
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.schema.mcp import GetMcpFeedDetail
+from backend.common.log import log
+from backend.database.db import async_db_session
+from backend.database.redis import redis_client
+from backend.utils.timezone import timezone
+
+# 移除超出时间窗口的 server 后按分数倒序分页读取，索引未构建时返回 false
+_PAGE_SCRIPT = """
+if redis.call('EXISTS', KEYS[4]) == 0 then return false end
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+if #expired > 0 then
+  redis.call('ZREM', KEYS[1], unpack(expired))
+  redis.call('ZREM', KEYS[2], unpack(expired))
+  redis.call('HDEL', KEYS[3], unpack(expired))
+end
+local ids = redis.call('ZREVRANGE', KEYS[1], ARGV[2], ARGV[3])
+if #ids == 0 then return {} end
+return redis.call('HMGET', KEYS[3], unpack(ids))
+"""
+
+
+class McpFeed:
+    """
+    最近公开的 mcp server 列表
+
+    - {prefix}:index：有序集合，分数为更新时间，按更新时间倒序分页
+    - {prefix}:created：有序集合，分数为创建时间，用于移除超出时间窗口的 server
+    - {prefix}:items：hash，server id -> 列表项 JSON
+
+    server 公开、信息变更或取消公开时增量更新，读取时不查询数据库；索引丢失时全量重建
+    """
+
+    def __init__(self, prefix: str, days: int) -> None:
+        self.prefix = prefix
+        self.days = days
+        self._page = redis_client.register_script(_PAGE_SCRIPT)
+        self._rebuild_lock = asyncio.Lock()
+
+    @property
+    def _keys(self) -> list[str]:
+        return [f'{self.prefix}:index', f'{self.prefix}:created', f'{self.prefix}:items', f'{self.prefix}:built']
+
+    @property
+    def _cutoff(self) -> float:
+        return (timezone.now() - timedelta(days=self.days)).timestamp()
+
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        # mysql 读取的时间不带时区，按写入时的时区处理
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.tz_info)
+        return value.timestamp()
+
+    def _dump(self, mcp_server: Any) -> tuple[str, float, float]:
+        """
+        :param mcp_server: McpServer
+        :return: (列表项 JSON, 更新时间, 创建时间)
+        """
+        item = GetMcpFeedDetail.model_validate(mcp_server, from_attributes=True).model_dump(mode='json')
+        created = self._timestamp(mcp_server.created_time)
+        updated = self._timestamp(mcp_server.updated_time) if mcp_server.updated_time else created
+        return json.dumps(item, ensure_ascii=False), updated, created
+
+    async def refresh(self, pk: int) -> None:
+        """
+        更新单个 server，server 公开、信息变更或取消公开后调用
+
+        :param pk: mcp server id
+        :return:
+        """
+        index_key, created_key, items_key, _ = self._keys
+        try:
+            async with async_db_session() as db:
+                stmt = await mcp_server_dao.get_mcp_last_7_day(self.days, pk)
+                mcp_server = (await db.execute(stmt)).scalars().first()
+            async with redis_client.pipeline(transaction=True) as pipe:
+                if mcp_server is None:
+                    pipe.zrem(index_key, pk)
+                    pipe.zrem(created_key, pk)
+                    pipe.hdel(items_key, pk)
+                else:
+                    item, updated, created = self._dump(mcp_server)
+                    pipe.hset(items_key, pk, item)
+                    pipe.zadd(index_key, {pk: updated})
+                    pipe.zadd(created_key, {pk: created})
+                await pipe.execute()
+        except Exception as e:
+            log.warning(f'MCP 最新列表更新失败: {pk}, {e}')
+
+    async def rebuild(self) -> int:
+        """
+        全量重建
+
+        :return: 列表中的 server 数量
+        """
+        index_key, created_key, items_key, built_key = self._keys
+        async with self._rebuild_lock:
+            async with async_db_session() as db:
+                stmt = await mcp_server_dao.get_mcp_last_7_day(self.days)
+                mcp_servers = (await db.execute(stmt)).scalars().all()
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(index_key, created_key, items_key)
+                for mcp_server in mcp_servers:
+                    item, updated, created = self._dump(mcp_server)
+                    pipe.hset(items_key, mcp_server.id, item)
+                    pipe.zadd(index_key, {mcp_server.id: updated})
+                    pipe.zadd(created_key, {mcp_server.id: created})
+                pipe.set(built_key, 1)
+                await pipe.execute()
+            return len(mcp_servers)
+
+    async def get_page(self, page: int, size: int) -> list[dict[str, Any]]:
+        """
+        按更新时间倒序分页获取
+
+        :param page: 页码
+        :param size: 每页数量
+        :return:
+        """
+        start = (page - 1) * size
+        args = [self._cutoff, start, start + size - 1]
+        items = await self._page(keys=self._keys, args=args)
+        if items is None:
+            await self.rebuild()
+            items = await self._page(keys=self._keys, args=args)
+        return [json.loads(item) for item in items or [] if item]
+
+
+# 创建最新列表单例
+mcp_feed: McpFeed = McpFeed(prefix=client_settings.MCP_FEED_REDIS_PREFIX, days=client_settings.MCP_FEED_DAYS)
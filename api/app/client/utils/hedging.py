@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Sequence, TypeVar
+
+from mcp import McpError
+
+from backend.app.client.conf import client_settings
+
+T = TypeVar('T')
+
+
+class McpHedger:
+    """
+    多副本对冲请求
+
+    - 副本选择：按各副本调用耗时的指数移动平均从低到高排序，没有样本的副本优先，以便尽快获得样本
+    - 对冲：请求超过该工具的 p95 耗时仍未返回时，向下一个副本再发送一次，采用最先返回的结果并取消其余请求；
+      副本连接失败等异常时立即改发下一个副本，上游正常返回的 JSON-RPC 错误直接作为结果
+    - 只有标记为幂等的工具才会重复发送，其他工具只发往耗时最低的副本
+
+    耗时样本保存在进程内，各 worker 独立统计
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int,
+        quantile: float,
+        window: int,
+        min_samples: int,
+        default_delay: float,
+        min_delay: float,
+        ewma_alpha: float,
+        failure_penalty: float,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.ewma_alpha = ewma_alpha
+        self.failure_penalty = failure_penalty
+        # (mcp_id, 工具) -> 最近的调用耗时；工具名称由调用方传入，只记录允许对冲的幂等工具
+        self._samples: dict[tuple[int, str], deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        # (mcp_id, endpoint) -> 耗时指数移动平均
+        self._latency: dict[tuple[int, str], float] = {}
+        self._stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+
+    def _observe_replica(self, mcp_id: int, endpoint: str, seconds: float) -> None:
+        key = (mcp_id, endpoint)
+        current = self._latency.get(key)
+        self._latency[key] = seconds if current is None else current + self.ewma_alpha * (seconds - current)
+
+    def rank(self, mcp_id: int, endpoints: Sequence[str]) -> list[str]:
+        """
+        按耗时从低到高排序副本
+
+        :param mcp_id: mcp server id
+        :param endpoints: 副本端点
+        :return:
+        """
+        return sorted(endpoints, key=lambda endpoint: self._latency.get((mcp_id, endpoint), 0))
+
+    def get_delay(self, mcp_id: int, tool_name: str) -> float:
+        """
+        获取对冲延迟，即工具调用耗时的 p95
+
+        :param mcp_id: mcp server id
+        :param tool_name: 工具名称
+        :return: 延迟（秒）
+        """
+        samples = self._samples.get((mcp_id, tool_name))
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        return max(ordered[int(self.quantile * (len(ordered) - 1))], self.min_delay)
+
+    async def run(
+        self,
+        mcp_id: int,
+        tool_name: str,
+        endpoints: Sequence[str],
+        attempt: Callable[[str], Awaitable[T]],
+        hedge: bool = True,
+    ) -> T:
+        """
+        向副本发送调用
+
+        :param mcp_id: mcp server id
+        :param tool_name: 工具名称
+        :param endpoints: 副本端点
+        :param attempt: 向指定端点发送一次调用
+        :param hedge: 是否允许重复发送，仅幂等的工具可以开启
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        ranked = self.rank(mcp_id, endpoints)[: self.max_attempts if hedge else 1]
+        delay = self.get_delay(mcp_id, tool_name)
+        # 进行中的请求 -> (副本序号, 开始时间)
+        tasks: dict[asyncio.Task, tuple[int, float]] = {}
+        launched = 0
+        error: BaseException | None = None
+        self._stats['calls'] += 1
+
+        def launch() -> None:
+            nonlocal launched
+            tasks[asyncio.create_task(attempt(ranked[launched]))] = (launched, loop.time())
+            launched += 1
+
+        launch()
+        try:
+            while tasks:
+                can_hedge = launched < len(ranked)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._stats['hedged'] += 1
+                    launch()
+                    continue
+                for task in done:
+                    index, start = tasks.pop(task)
+                    elapsed = loop.time() - start
+                    exc = asyncio.CancelledError() if task.cancelled() else task.exception()
+                    if exc is None or isinstance(exc, McpError):
+                        self._observe_replica(mcp_id, ranked[index], elapsed)
+                        if hedge:
+                            self._samples[(mcp_id, tool_name)].append(elapsed)
+                        if index > 0:
+                            self._stats['hedge_wins'] += 1
+                        return task.result()
+                    self._observe_replica(mcp_id, ranked[index], self.failure_penalty)
+                    error = exc
+                if not tasks and launched < len(ranked):
+                    self._stats['failovers'] += 1
+                    launch()
+            raise error
+        finally:
+            for task, (index, start) in tasks.items():
+                if task.done():
+                    if not task.cancelled():
+                        task.exception()
+                    continue
+                # 未采用的请求至少耗时这么久，计入副本耗时；取消时会通知上游
+                self._observe_replica(mcp_id, ranked[index], loop.time() - start)
+                task.cancel()
+
+    def get_stats(self) -> dict[str, object]:
+        """
+        获取当前 worker 的对冲统计
+
+        :return:
+        """
+        return {
+            **self._stats,
+            'replicas': [
+                {'mcp_id': mcp_id, 'endpoint': endpoint, 'latency': round(latency, 4)}
+                for (mcp_id, endpoint), latency in self._latency.items()
+            ],
+        }
+
+
+# 创建对冲请求单例
+mcp_hedger: McpHedger = McpHedger(
+    max_attempts=client_settings.MCP_HEDGE_MAX_ATTEMPTS,
+    quantile=client_settings.MCP_HEDGE_QUANTILE,
+    window=client_settings.MCP_HEDGE_WINDOW,
+    min_samples=client_settings.MCP_HEDGE_MIN_SAMPLES,
+    default_delay=client_settings.MCP_HEDGE_DEFAULT_DELAY,
+    min_delay=client_settings.MCP_HEDGE_MIN_DELAY,
+    ewma_alpha=client_settings.MCP_HEDGE_EWMA_ALPHA,
+    failure_penalty=client_settings.MCP_HEDGE_FAILURE_PENALTY,
+)
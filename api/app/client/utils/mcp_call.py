@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Awaitable, TypeVar
+
+import httpx
+
+from fastapi import Request
+from mcp import ClientSession, McpError
+from mcp.shared.message import SessionMessage
+from mcp.shared.session import ProgressFnT
+from mcp.types import (
+    CallToolResult,
+    CancelledNotification,
+    CancelledNotificationParams,
+    ClientNotification,
+    JSONRPCRequest,
+    RequestId,
+)
+
+from backend.common.exception import errors
+from backend.common.log import log
+
+T = TypeVar('T')
+
+# 当前任务通过会话发出的工具调用请求 id，由 RequestIdRecorder 记录
+_sent_request_ids: ContextVar[list[RequestId] | None] = ContextVar('mcp_sent_request_ids', default=None)
+
+
+class RequestIdRecorder:
+    """
+    包装会话的写入流，记录当前任务发出的 tools/call 请求 id，超时或取消时据此通知上游
+
+    请求由调用方所在的任务直接写入流中，因此通过 ContextVar 即可区分同一会话上的并发调用
+    """
+
+    def __init__(self, stream: Any) -> None:
+        self.stream = stream
+
+    async def send(self, message: SessionMessage) -> None:
+        ids = _sent_request_ids.get()
+        root = message.message.root
+        if ids is not None and isinstance(root, JSONRPCRequest) and root.method == 'tools/call':
+            ids.append(root.id)
+        await self.stream.send(message)
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+
+    async def __aenter__(self) -> 'RequestIdRecorder':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+def format_call_error(exc: Exception) -> str:
+    """
+    格式化工具调用异常
+
+    :param exc: 异常
+    :return:
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return '调用超时'
+    if isinstance(exc, McpError):
+        return exc.error.message
+    if isinstance(exc, errors.BaseExceptionMixin):
+        return exc.msg
+    if isinstance(exc, errors.HTTPError):
+        return exc.detail
+    return str(exc) or exc.__class__.__name__
+
+
+async def _notify_cancelled(session: ClientSession, request_ids: list[RequestId], reason: str) -> None:
+    """通知上游取消请求，请求尚未发出或失败时忽略"""
+    if not request_ids:
+        return
+    request_id = request_ids[0]
+    try:
+        await asyncio.wait_for(
+            session.send_notification(
+                ClientNotification(
+                    CancelledNotification(
+                        method='notifications/cancelled',
+                        params=CancelledNotificationParams(requestId=request_id, reason=reason),
+                    )
+                )
+            ),
+            1,
+        )
+    except Exception as e:
+        log.debug(f'MCP 取消通知发送失败: {e}')
+
+
+async def call_tool_with_deadline(
+    session: ClientSession,
+    name: str,
+    arguments: dict[str, Any] | None,
+    timeout: float,
+    progress_callback: ProgressFnT | None = None,
+) -> CallToolResult:
+    """
+    带超时的工具调用，超时或被取消时通知上游取消该请求；会话的写入流需由 RequestIdRecorder 包装
+
+    :param session: mcp 会话
+    :param name: 工具名称
+    :param arguments: 工具参数
+    :param timeout: 超时时间（秒）
+    :param progress_callback: 进度通知回调
+    :return:
+    """
+    request_ids: list[RequestId] = []
+    token = _sent_request_ids.set(request_ids)
+    try:
+        return await session.call_tool(
+            name, arguments, read_timeout_seconds=timedelta(seconds=timeout), progress_callback=progress_callback
+        )
+    except McpError as e:
+        if e.error.code == httpx.codes.REQUEST_TIMEOUT:
+            await _notify_cancelled(session, request_ids, 'timeout')
+        raise
+    except asyncio.CancelledError:
+        await _notify_cancelled(session, request_ids, 'cancelled')
+        raise
+    finally:
+        _sent_request_ids.reset(token)
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    客户端断开连接时取消调用
+
+    :param request: FastAPI 请求对象，请求体需已读取
+    :param awaitable: 调用
+    :return:
+    """
+    task = asyncio.ensure_future(awaitable)
+    disconnected = False
+
+    async def watch() -> None:
+        nonlocal disconnected
+        while True:
+            message = await request.receive()
+            if message['type'] == 'http.disconnect':
+                disconnected = True
+                task.cancel()
+                return
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if disconnected:
+            raise errors.HTTPError(code=499, msg='客户端已断开连接')
+        raise
+    finally:
+        watcher.cancel()
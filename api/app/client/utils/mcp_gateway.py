@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from urllib.parse import quote, unquote, urlsplit
+
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.app.client.conf import client_settings
+
+# 聚合资源的 URI 格式：wemcp://mcp{mcp_id}/{原始 URI 编码}
+_RESOURCE_SCHEME = 'wemcp'
+
+
+def namespace_name(mcp_id: int, name: str) -> str:
+    """
+    为工具、提示词名称加上 mcp server 命名空间
+
+    :param mcp_id: mcp server id
+    :param name: 上游名称
+    :return:
+    """
+    return f'mcp{mcp_id}{client_settings.MCP_GATEWAY_SEPARATOR}{name}'
+
+
+def split_name(name: str) -> tuple[int, str] | None:
+    """
+    解析带命名空间的名称
+
+    :param name: 带命名空间的名称
+    :return: (mcp_id, 上游名称)，格式不正确时为空
+    """
+    prefix, sep, upstream = name.partition(client_settings.MCP_GATEWAY_SEPARATOR)
+    if not sep or not upstream or not prefix.startswith('mcp') or not prefix[3:].isdigit():
+        return None
+    return int(prefix[3:]), upstream
+
+
+def namespace_uri(mcp_id: int, uri: str) -> str:
+    """
+    为资源 URI 加上 mcp server 命名空间
+
+    :param mcp_id: mcp server id
+    :param uri: 上游资源 URI
+    :return:
+    """
+    return f'{_RESOURCE_SCHEME}://mcp{mcp_id}/{quote(uri, safe="")}'
+
+
+def split_uri(uri: str) -> tuple[int, str] | None:
+    """
+    解析带命名空间的资源 URI
+
+    :param uri: 带命名空间的资源 URI
+    :return: (mcp_id, 上游资源 URI)，格式不正确时为空
+    """
+    parts = urlsplit(uri)
+    host = parts.netloc
+    if parts.scheme != _RESOURCE_SCHEME or not host.startswith('mcp') or not host[3:].isdigit():
+        return None
+    upstream = unquote(parts.path[1:])
+    if not upstream:
+        return None
+    return int(host[3:]), upstream
+
+
+class AsgiResponse(Response):
+    """由 ASGI 应用自行发送的响应，用于在路由中接入 mcp 的 SSE 传输"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        super().__init__()
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
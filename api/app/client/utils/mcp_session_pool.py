@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Collection, Sequence
+
+from mcp import ClientSession, McpError
+
+from backend.app.client.conf import client_settings
+from backend.app.client.utils.mcp_call import RequestIdRecorder
+from backend.app.client.utils.mcp_stdio import get_process_memory_mb
+from backend.app.client.utils.mcp_transport import negotiate_candidates, open_transport
+from backend.app.client.utils.metrics import mcp_metrics
+from backend.common.enums import McpTransportType
+from backend.common.exception import errors
+from backend.common.log import log
+
+if TYPE_CHECKING:
+    from mcp.types import InitializeResult
+
+
+class PooledSession:
+    """
+    池化的 MCP 会话
+
+    传输层 / ClientSession 内部基于 anyio 任务组，进入和退出必须在同一个任务中完成，
+    因此每个会话由一个独立的后台任务持有，请求方只借用已初始化的 ClientSession
+    """
+
+    def __init__(self, mcp_id: int, endpoint: str, transport: str | None = None) -> None:
+        self.mcp_id = mcp_id
+        self.endpoint = endpoint
+        self.transport = transport
+        self.session: ClientSession | None = None
+        self.initialize_result: InitializeResult | None = None
+        self.in_flight = 0
+        self.broken = False
+        # stdio 子进程号、已处理的调用次数；退役的会话不再分配新的请求，进行中的请求完成后关闭
+        self.pid: int | None = None
+        self.calls = 0
+        self.retiring = False
+        self.memory_checked_time = 0.0
+        self.created_time = time.monotonic()
+        self.last_used_time = self.created_time
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Exception | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def idle_seconds(self) -> float:
+        """空闲时长"""
+        return time.monotonic() - self.last_used_time
+
+    async def start(self, timeout: float) -> None:
+        """
+        启动会话并等待 initialize 完成
+
+        :param timeout: 超时时间（秒）
+        :return:
+        """
+        self._task = asyncio.create_task(self._run(), name=f'mcp-session-{self.mcp_id}')
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            raise errors.GatewayError(msg=f'MCP server 连接超时: {self.mcp_id}')
+        if self.session is None:
+            raise errors.GatewayError(msg=f'MCP server 连接失败: {self.mcp_id}, {self._error}')
+
+    async def _run(self) -> None:
+        """按协商顺序建立传输层并持有会话上下文，直到被关闭或连接断开"""
+        try:
+            for transport in negotiate_candidates(self.transport):
+                start = time.perf_counter()
+                connected = False
+                try:
+                    async with open_transport(self.endpoint, transport, self.mcp_id, self._on_process) as (
+                        read_stream,
+                        write_stream,
+                    ):
+                        connected = True
+                        mcp_metrics.observe('connect', self.mcp_id, None, 'ok', time.perf_counter() - start)
+                        async with ClientSession(read_stream, RequestIdRecorder(write_stream)) as session:
+                            with mcp_metrics.timer('initialize', self.mcp_id):
+                                self.initialize_result = await session.initialize()
+                            self.transport = transport
+                            self.session = session
+                            self._ready.set()
+                            await self._closing.wait()
+                    return
+                except Exception as e:
+                    self._error = e
+                    if not connected:
+                        mcp_metrics.observe('connect', self.mcp_id, None, 'error', time.perf_counter() - start)
+                    if self._ready.is_set():
+                        raise
+                    log.info(f'MCP 传输协商失败: {self.mcp_id}, {transport}, {e}')
+        except Exception as e:
+            log.warning(f'MCP 会话异常退出: {self.mcp_id}, {e}')
+        finally:
+            self.broken = True
+            self.session = None
+            self._ready.set()
+
+    def _on_process(self, pid: int) -> None:
+        self.pid = pid
+
+    async def ping(self, timeout: float) -> bool:
+        """
+        健康检查
+
+        :param timeout: 超时时间（秒）
+        :return:
+        """
+        if self.broken or self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+        except Exception:
+            self.broken = True
+            return False
+        return True
+
+    async def close(self, timeout: float = 5) -> None:
+        """
+        关闭会话
+
+        :param timeout: 等待后台任务退出的超时时间（秒）
+        :return:
+        """
+        self.broken = True
+        self._closing.set()
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+
+
+class McpSessionPool:
+    """
+    MCP 会话池
+
+    以 mcp_id 为键复用已初始化的会话，跳过每次调用的 SSE 建连与 initialize 握手；
+    单个会话支持多路并发请求，每个 mcp server 端点的会话数量受上限控制，空闲或异常的会话由后台任务回收；
+    部署了多个副本的 server，各副本端点的会话分别计数
+
+    stdio 类型的会话对应一个本地子进程，使用单独的进程数、并发上限，
+    处理 stdio_max_calls 次调用或内存超过 stdio_max_memory_mb 后退役，由新进程接替
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        max_concurrency: int,
+        idle_timeout: float,
+        ping_interval: float,
+        connect_timeout: float,
+        acquire_timeout: float,
+        stdio_max_size: int,
+        stdio_max_concurrency: int,
+        stdio_max_calls: int,
+        stdio_max_memory_mb: int,
+        memory_check_interval: float,
+    ) -> None:
+        self.max_size = max_size
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.connect_timeout = connect_timeout
+        self.acquire_timeout = acquire_timeout
+        self.stdio_max_size = stdio_max_size
+        self.stdio_max_concurrency = stdio_max_concurrency
+        self.stdio_max_calls = stdio_max_calls
+        self.stdio_max_memory_mb = stdio_max_memory_mb
+        self.memory_check_interval = memory_check_interval
+        self._sessions: dict[int, list[PooledSession]] = defaultdict(list)
+        # 正在建立的会话数量：(mcp_id, endpoint) -> 数量
+        self._pending: dict[tuple[int, str], int] = defaultdict(int)
+        self._conditions: dict[int, asyncio.Condition] = {}
+        # 已协商的传输类型：(mcp_id, endpoint) -> transport
+        self._transports: dict[tuple[int, str], str] = {}
+        self._reaper: asyncio.Task | None = None
+
+    def _condition(self, mcp_id: int) -> asyncio.Condition:
+        condition = self._conditions.get(mcp_id)
+        if condition is None:
+            condition = self._conditions[mcp_id] = asyncio.Condition()
+        return condition
+
+    def _limits(self, transport: str | None) -> tuple[int, int]:
+        """
+        获取会话数量和单个会话的并发上限
+
+        :param transport: 传输类型
+        :return: (最大会话数, 单个会话最大并发数)
+        """
+        if transport == McpTransportType.stdio:
+            return self.stdio_max_size, self.stdio_max_concurrency
+        return self.max_size, self.max_concurrency
+
+    def _check_memory(self, pooled: PooledSession) -> None:
+        """
+        检查 stdio 子进程的内存，超出上限时标记为退役
+
+        :param pooled: 池化的会话
+        :return:
+        """
+        if pooled.pid is None or pooled.retiring or not self.stdio_max_memory_mb:
+            return
+        now = time.monotonic()
+        if now - pooled.memory_checked_time < self.memory_check_interval:
+            return
+        pooled.memory_checked_time = now
+        memory = get_process_memory_mb(pooled.pid)
+        if memory > self.stdio_max_memory_mb:
+            pooled.retiring = True
+            log.info(f'MCP stdio 进程内存超出上限，等待回收: {pooled.mcp_id}, pid {pooled.pid}, {memory:.0f}MB')
+
+    def _discard(self, mcp_id: int, endpoints: Collection[str] | None = None) -> list[PooledSession]:
+        """
+        移除已损坏、端点已变更或已退役且没有进行中请求的会话
+
+        :param mcp_id: mcp server id
+        :param endpoints: 当前的全部端点，为空时不校验
+        :return:
+        """
+        sessions = self._sessions[mcp_id]
+        alive, dead = [], []
+        for pooled in sessions:
+            if (
+                pooled.broken
+                or (endpoints is not None and pooled.endpoint not in endpoints)
+                or (pooled.retiring and pooled.in_flight == 0)
+            ):
+                dead.append(pooled)
+            else:
+                alive.append(pooled)
+        self._sessions[mcp_id] = alive
+        return dead
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop(), name='mcp-session-reaper')
+
+    async def _acquire(
+        self, mcp_id: int, endpoint: str, transport: str | None, replicas: Sequence[str] | None
+    ) -> PooledSession:
+        self._ensure_reaper()
+        key = (mcp_id, endpoint)
+        endpoints = {endpoint, *(replicas or ())}
+        transport = self._transports.get(key, transport)
+        max_size, max_concurrency = self._limits(transport)
+        condition = self._condition(mcp_id)
+        deadline = time.monotonic() + self.acquire_timeout
+        stale: list[PooledSession] = []
+        pooled: PooledSession | None = None
+        async with condition:
+            while True:
+                stale.extend(self._discard(mcp_id, endpoints))
+                # 退役中的会话不再分配请求，也不占用会话数量
+                sessions = [s for s in self._sessions[mcp_id] if s.endpoint == endpoint and not s.retiring]
+                available = [s for s in sessions if s.session is not None and s.in_flight < max_concurrency]
+                if available:
+                    pooled = min(available, key=lambda s: s.in_flight)
+                    self._borrow(pooled)
+                    break
+                if len(sessions) + self._pending[key] < max_size:
+                    self._pending[key] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise errors.GatewayError(msg=f'MCP server 会话池繁忙: {mcp_id}')
+                try:
+                    await asyncio.wait_for(condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        for item in stale:
+            await item.close()
+        if pooled is not None:
+            return pooled
+
+        pooled = PooledSession(mcp_id, endpoint, transport)
+        try:
+            await pooled.start(self.connect_timeout)
+        except BaseException:
+            async with condition:
+                self._pending[key] -= 1
+                condition.notify()
+            await pooled.close()
+            raise
+        async with condition:
+            self._pending[key] -= 1
+            self._borrow(pooled)
+            self._sessions[mcp_id].append(pooled)
+            self._transports[key] = pooled.transport
+        return pooled
+
+    def _borrow(self, pooled: PooledSession) -> None:
+        pooled.in_flight += 1
+        pooled.calls += 1
+        if pooled.pid is not None and self.stdio_max_calls and pooled.calls >= self.stdio_max_calls:
+            # 本次为该进程的最后一次调用
+            pooled.retiring = True
+            log.info(f'MCP stdio 进程达到调用次数上限，等待回收: {pooled.mcp_id}, pid {pooled.pid}')
+
+    async def _release(self, pooled: PooledSession) -> None:
+        condition = self._condition(pooled.mcp_id)
+        async with condition:
+            pooled.in_flight -= 1
+            pooled.last_used_time = time.monotonic()
+            self._check_memory(pooled)
+            dead = self._discard(pooled.mcp_id)
+            condition.notify()
+        for item in dead:
+            await item.close()
+
+    @asynccontextmanager
+    async def session(
+        self, mcp_id: int, endpoint: str, transport: str | None = None, replicas: Sequence[str] | None = None
+    ) -> AsyncIterator[PooledSession]:
+        """
+        借用一个已初始化的会话
+
+        :param mcp_id: mcp server id
+        :param endpoint: mcp server 端点
+        :param transport: 传输类型，为空时自动协商
+        :param replicas: 同一 server 的全部副本端点，不在其中的会话被回收，为空时只保留 endpoint 的会话
+        :return:
+        """
+        pooled = await self._acquire(mcp_id, endpoint, transport, replicas)
+        try:
+            yield pooled
+        except McpError:
+            # 协议层错误由上游正常返回，会话仍然可用
+            raise
+        except Exception:
+            pooled.broken = True
+            raise
+        finally:
+            await self._release(pooled)
+
+    async def evict(self, mcp_id: int) -> None:
+        """
+        关闭指定 mcp server 的全部会话
+
+        :param mcp_id: mcp server id
+        :return:
+        """
+        condition = self._condition(mcp_id)
+        async with condition:
+            sessions = self._sessions.pop(mcp_id, [])
+            for key in [key for key in self._transports if key[0] == mcp_id]:
+                del self._transports[key]
+            condition.notify_all()
+        for pooled in sessions:
+            await pooled.close()
+
+    async def _reap_loop(self) -> None:
+        """定期回收空闲会话并对空闲会话做健康检查"""
+        while True:
+            await asyncio.sleep(min(self.ping_interval, self.idle_timeout))
+            try:
+                await self.reap()
+            except Exception as e:
+                log.error(f'MCP 会话回收异常: {e}')
+
+    async def reap(self) -> None:
+        """回收空闲、异常或已退役的会话"""
+        for mcp_id in list(self._sessions.keys()):
+            condition = self._condition(mcp_id)
+            probes = []
+            async with condition:
+                dead = self._discard(mcp_id)
+                alive = []
+                for pooled in self._sessions[mcp_id]:
+                    self._check_memory(pooled)
+                    if pooled.in_flight == 0 and (pooled.retiring or pooled.idle_seconds >= self.idle_timeout):
+                        dead.append(pooled)
+                        continue
+                    if pooled.in_flight == 0 and pooled.idle_seconds >= self.ping_interval:
+                        probes.append(pooled)
+                    alive.append(pooled)
+                self._sessions[mcp_id] = alive
+                if not alive:
+                    self._sessions.pop(mcp_id, None)
+                condition.notify_all()
+            for pooled in dead:
+                await pooled.close()
+            for pooled in probes:
+                if not await pooled.ping(self.connect_timeout):
+                    log.warning(f'MCP 会话健康检查失败: {mcp_id}')
+                    await pooled.close()
+
+    async def close(self) -> None:
+        """关闭会话池"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for mcp_id in list(self._sessions.keys()):
+            await self.evict(mcp_id)
+
+
+# 创建 MCP 会话池单例
+mcp_session_pool: McpSessionPool = McpSessionPool(
+    max_size=client_settings.MCP_SESSION_POOL_MAX_SIZE,
+    max_concurrency=client_settings.MCP_SESSION_MAX_CONCURRENCY,
+    idle_timeout=client_settings.MCP_SESSION_IDLE_TIMEOUT,
+    ping_interval=client_settings.MCP_SESSION_PING_INTERVAL,
+    connect_timeout=client_settings.MCP_SESSION_CONNECT_TIMEOUT,
+    acquire_timeout=client_settings.MCP_SESSION_ACQUIRE_TIMEOUT,
+    stdio_max_size=client_settings.MCP_STDIO_POOL_MAX_SIZE,
+    stdio_max_concurrency=client_settings.MCP_STDIO_MAX_CONCURRENCY,
+    stdio_max_calls=client_settings.MCP_STDIO_MAX_CALLS,
+    stdio_max_memory_mb=client_settings.MCP_STDIO_MAX_MEMORY_MB,
+    memory_check_interval=client_settings.MCP_STDIO_MEMORY_CHECK_INTERVAL,
+)
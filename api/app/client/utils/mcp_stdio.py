@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import re
+import shlex
+import shutil
+import signal
+
+from contextlib import asynccontextmanager
+from subprocess import PIPE
+from typing import Any, AsyncIterator, Callable
+
+import anyio
+import psutil
+
+from anyio.abc import Process
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from anyio.streams.text import TextReceiveStream
+from mcp.client.stdio import get_default_environment
+from mcp.shared.message import SessionMessage
+from mcp.types import JSONRPCMessage
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.common.exception import errors
+from backend.common.log import log
+from backend.database.db import async_db_session
+
+# stderr 单行日志的最大长度
+_MAX_LOG_LINE = 1000
+# 允许的包运行器及其在包名之前允许的参数，只能运行 MCP_STDIO_ALLOWED_PACKAGES 中的包
+_RUNNERS = {'npx': {'-y', '--yes'}, 'uvx': set()}
+# 执行内联代码、加载额外模块或替换包来源的参数
+_BLOCKED_ARGS = {
+    '-c',
+    '-e',
+    '--eval',
+    '-p',
+    '--print',
+    '-r',
+    '--require',
+    '--import',
+    '--loader',
+    '--experimental-loader',
+    '--call',
+    '--package',
+    '--with',
+    '--from',
+    '--index-url',
+    '--python',
+}
+# 影响动态链接器、解释器或包管理器行为的环境变量，用户配置的同名变量不传给子进程
+_BLOCKED_ENV_KEYS = {
+    'PATH',
+    'HOME',
+    'SHELL',
+    'BASH_ENV',
+    'ENV',
+    'IFS',
+    'PERL5OPT',
+    'PERL5LIB',
+    'RUBYOPT',
+    'RUBYLIB',
+    'JAVA_TOOL_OPTIONS',
+    '_JAVA_OPTIONS',
+    'GCONV_PATH',
+    'HTTP_PROXY',
+    'HTTPS_PROXY',
+    'ALL_PROXY',
+    'SSL_CERT_FILE',
+    'SSL_CERT_DIR',
+}
+_BLOCKED_ENV_PREFIXES = ('LD_', 'DYLD_', 'NODE_', 'NPM_CONFIG_', 'COREPACK_', 'PYTHON', 'PIP_', 'UV_', 'GIT_', 'XDG_')
+
+
+def _package_name(runner: str, spec: str) -> str:
+    """
+    去掉包名中的版本号，如 @playwright/mcp@0.0.30、mcp-server-fetch==2025.1.1
+
+    :param runner: 包运行器
+    :param spec: 包名
+    :return:
+    """
+    if runner == 'npx':
+        index = spec.rfind('@')
+        return spec[:index] if index > 0 else spec
+    return re.split(r'[=@<>~!\[]', spec, maxsplit=1)[0]
+
+
+def parse_command(command: str) -> list[str]:
+    """
+    解析 stdio 启动命令并校验是否允许在本机运行
+
+    只允许通过 npx / uvx 运行 MCP_STDIO_ALLOWED_PACKAGES 中的包，不允许直接运行解释器或执行内联代码
+
+    :param command: 启动命令，如 npx -y @playwright/mcp
+    :return:
+    """
+    try:
+        args = shlex.split(command)
+    except ValueError as e:
+        raise errors.RequestError(msg=f'MCP server 启动命令格式错误: {e}')
+    if not args:
+        raise errors.RequestError(msg='MCP server 启动命令为空')
+    runner_flags = _RUNNERS.get(args[0])
+    if runner_flags is None:
+        raise errors.RequestError(msg=f'不允许在本机运行的命令: {args[0]}，只支持 {" / ".join(_RUNNERS)}')
+    index = 1
+    while index < len(args) and args[index] in runner_flags:
+        index += 1
+    if index >= len(args) or args[index].startswith('-'):
+        raise errors.RequestError(msg='MCP server 启动命令缺少包名或包含不支持的参数')
+    name = _package_name(args[0], args[index])
+    if name not in client_settings.MCP_STDIO_ALLOWED_PACKAGES:
+        raise errors.RequestError(msg=f'不允许在本机运行的包: {name}')
+    for arg in args[index + 1 :]:
+        if arg.split('=', 1)[0] in _BLOCKED_ARGS:
+            raise errors.RequestError(msg=f'MCP server 启动命令包含不允许的参数: {arg}')
+    return args
+
+
+def filter_env(envs: dict[str, Any] | None) -> dict[str, str]:
+    """
+    移除用户配置中影响动态链接器、解释器或包管理器的环境变量
+
+    :param envs: 用户配置的环境变量
+    :return:
+    """
+    result = {}
+    for key, value in (envs or {}).items():
+        name = str(key).upper()
+        if not key or '=' in key or name in _BLOCKED_ENV_KEYS or name.startswith(_BLOCKED_ENV_PREFIXES):
+            log.warning(f'MCP stdio 忽略环境变量: {key}')
+            continue
+        result[key] = str(value)
+    return result
+
+
+def build_env(envs: dict[str, Any] | None) -> dict[str, str]:
+    """
+    构建子进程的环境变量：只继承 PATH，HOME 指向独立目录，不继承 API 进程的数据库、Redis、云服务密钥等配置
+
+    :param envs: 用户配置的环境变量
+    :return:
+    """
+    env = {'PATH': get_default_environment().get('PATH', os.defpath), 'HOME': client_settings.MCP_STDIO_HOME}
+    return {**filter_env(envs), **env}
+
+
+def get_process_memory_mb(pid: int) -> float:
+    """
+    获取进程及其全部子进程的常驻内存，npx / uvx 启动的 server 实际运行在子进程中
+
+    :param pid: 进程号
+    :return: 内存（MB），进程已退出时为 0
+    """
+    try:
+        process = psutil.Process(pid)
+        processes = [process, *process.children(recursive=True)]
+    except psutil.Error:
+        return 0
+    rss = 0
+    for item in processes:
+        try:
+            rss += item.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss / 1024 / 1024
+
+
+def _kill_group(process: Process, sig: signal.Signals) -> None:
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _terminate(process: Process) -> None:
+    """
+    结束进程：先关闭 stdin 等待其自行退出，超时后依次发送 SIGTERM / SIGKILL 到整个进程组
+
+    :param process: 子进程
+    :return:
+    """
+    timeout = client_settings.MCP_STDIO_TERMINATE_TIMEOUT
+    try:
+        await process.stdin.aclose()
+    except Exception:
+        pass
+    for sig in (None, signal.SIGTERM, signal.SIGKILL):
+        if sig is not None:
+            _kill_group(process, sig)
+        with anyio.move_on_after(timeout):
+            await process.wait()
+        if process.returncode is not None:
+            # 主进程退出后，进程组中可能仍有残留的子进程
+            _kill_group(process, signal.SIGKILL)
+            return
+
+
+@asynccontextmanager
+async def open_stdio_transport(
+    mcp_id: int, command: str, on_process: Callable[[int], None] | None = None
+) -> AsyncIterator[tuple[MemoryObjectReceiveStream[Any], MemoryObjectSendStream[Any]]]:
+    """
+    启动本地 stdio mcp server 子进程，按行收发 JSON-RPC 消息
+
+    子进程在独立的进程组中运行，退出时连同 npx / uvx 派生的子进程一起结束；
+    环境变量在启动时从数据库加载，不写入路由缓存；配置 MCP_STDIO_USER 时以该系统用户运行
+
+    :param mcp_id: mcp server id
+    :param command: 启动命令
+    :param on_process: 子进程启动后的回调，参数为进程号
+    :return:
+    """
+    args = parse_command(command)
+    executable = shutil.which(args[0])
+    if executable is None:
+        raise errors.ServerError(msg=f'本机未安装命令: {args[0]}')
+    async with async_db_session() as db:
+        envs = await mcp_server_dao.get_envs(db, mcp_id)
+    os.makedirs(client_settings.MCP_STDIO_HOME, exist_ok=True)
+
+    process = await anyio.open_process(
+        [executable, *args[1:]],
+        stderr=PIPE,
+        cwd=client_settings.MCP_STDIO_HOME,
+        env=build_env(envs),
+        user=client_settings.MCP_STDIO_USER,
+        start_new_session=True,
+    )
+    if on_process is not None:
+        on_process(process.pid)
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def stdout_reader() -> None:
+        buffer = ''
+        async with read_stream_writer:
+            async for chunk in TextReceiveStream(process.stdout, errors='replace'):
+                lines = (buffer + chunk).split('\n')
+                buffer = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        message = JSONRPCMessage.model_validate_json(line)
+                    except ValueError:
+                        # 部分 server 会把日志输出到 stdout，忽略非协议内容
+                        log.debug(f'MCP stdio 非协议输出: {mcp_id}, {line[:_MAX_LOG_LINE]}')
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+
+    async def stdin_writer() -> None:
+        async with write_stream_reader:
+            async for session_message in write_stream_reader:
+                data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                await process.stdin.send(f'{data}\n'.encode())
+
+    async def stderr_reader() -> None:
+        # 持续读取 stderr，避免管道写满阻塞子进程
+        async for chunk in TextReceiveStream(process.stderr, errors='replace'):
+            for line in chunk.splitlines():
+                if line.strip():
+                    log.debug(f'MCP stdio 日志: {mcp_id}, {line[:_MAX_LOG_LINE]}')
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(stdout_reader)
+            tg.start_soon(stdin_writer)
+            tg.start_soon(stderr_reader)
+            try:
+                yield read_stream, write_stream
+            finally:
+                tg.cancel_scope.cancel()
+    finally:
+        with anyio.CancelScope(shield=True):
+            await _terminate(process)
+            await read_stream.aclose()
+            await write_stream.aclose()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from backend.app.client.conf import client_settings
+from backend.app.client.utils.mcp_stdio import open_stdio_transport
+from backend.app.client.utils.openapi_adapter import open_openapi_transport
+from backend.app.client.utils.url_guard import PublicNetworkTransport
+from backend.common.enums import McpTransportType
+
+
+class _SharedTransport(httpx.AsyncHTTPTransport):
+    """进程内共享的 HTTP 连接池，客户端关闭时不释放底层连接"""
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    async def close_pool(self) -> None:
+        await super().aclose()
+
+
+_shared_transport = _SharedTransport(
+    limits=httpx.Limits(
+        max_connections=client_settings.MCP_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=client_settings.MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=client_settings.MCP_HTTP_KEEPALIVE_EXPIRY,
+    ),
+)
+
+# SSE 的 GET 长连接在会话存续期间一直占用连接，单独限制连接数
+_sse_transport = _SharedTransport(
+    limits=httpx.Limits(
+        max_connections=client_settings.MCP_SSE_MAX_CONNECTIONS,
+        max_keepalive_connections=client_settings.MCP_SSE_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=client_settings.MCP_HTTP_KEEPALIVE_EXPIRY,
+    ),
+)
+
+
+def create_shared_http_client(
+    headers: dict[str, str] | None = None,
+    timeout: httpx.Timeout | None = None,
+    auth: httpx.Auth | None = None,
+) -> httpx.AsyncClient:
+    """
+    基于共享连接池创建 httpx 客户端，用作 mcp 传输层的 httpx_client_factory
+
+    :param headers: 请求头
+    :param timeout: 超时配置
+    :param auth: 认证
+    :return:
+    """
+    return httpx.AsyncClient(
+        transport=_shared_transport,
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30, read=300),
+        auth=auth,
+        follow_redirects=True,
+    )
+
+
+def create_sse_http_client(
+    headers: dict[str, str] | None = None,
+    timeout: httpx.Timeout | None = None,
+    auth: httpx.Auth | None = None,
+) -> httpx.AsyncClient:
+    """
+    基于 SSE 专用连接池创建 httpx 客户端，用作 sse_client 的 httpx_client_factory
+
+    :param headers: 请求头
+    :param timeout: 超时配置
+    :param auth: 认证
+    :return:
+    """
+    return httpx.AsyncClient(
+        transport=_sse_transport,
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30, read=300),
+        auth=auth,
+        follow_redirects=True,
+    )
+
+
+def create_public_http_client(
+    headers: dict[str, str] | None = None,
+    timeout: httpx.Timeout | None = None,
+) -> httpx.AsyncClient:
+    """
+    基于共享连接池创建只能访问公网的 httpx 客户端，用于请求用户填写的地址，每次请求和每一跳重定向都校验目标地址
+
+    :param headers: 请求头
+    :param timeout: 超时配置
+    :return:
+    """
+    return httpx.AsyncClient(
+        transport=PublicNetworkTransport(_shared_transport),
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30, read=300),
+        follow_redirects=True,
+        max_redirects=5,
+    )
+
+
+async def close_shared_http_pool() -> None:
+    """关闭共享连接池"""
+    await _shared_transport.close_pool()
+    await _sse_transport.close_pool()
+
+
+def negotiate_candidates(transport: str | None) -> list[McpTransportType]:
+    """
+    获取协商顺序，未指定或未知的传输类型优先尝试 Streamable HTTP，失败后回退到 SSE
+
+    :param transport: McpServer.transport
+    :return:
+    """
+    if transport in (McpTransportType.sse, McpTransportType.api, McpTransportType.stdio):
+        return [McpTransportType(transport)]
+    return [McpTransportType.streamable_http, McpTransportType.sse]
+
+
+@asynccontextmanager
+async def open_transport(
+    endpoint: str,
+    transport: McpTransportType,
+    mcp_id: int | None = None,
+    on_process: Callable[[int], None] | None = None,
+) -> AsyncIterator[tuple[MemoryObjectReceiveStream[Any], MemoryObjectSendStream[Any]]]:
+    """
+    打开 mcp 传输层
+
+    :param endpoint: mcp server 端点（不含 /sse、/mcp 路径），stdio 类型为启动命令
+    :param transport: 传输类型
+    :param mcp_id: mcp server id，api / stdio 类型需要据此加载转发配置、环境变量
+    :param on_process: stdio 类型子进程启动后的回调，参数为进程号
+    :return:
+    """
+    if transport == McpTransportType.streamable_http:
+        async with streamablehttp_client(
+            f'{endpoint}/mcp',
+            timeout=client_settings.MCP_SESSION_CONNECT_TIMEOUT,
+            httpx_client_factory=create_shared_http_client,
+        ) as (read_stream, write_stream, _):
+            yield read_stream, write_stream
+    elif transport == McpTransportType.sse:
+        async with sse_client(
+            f'{endpoint}/sse',
+            timeout=client_settings.MCP_SESSION_CONNECT_TIMEOUT,
+            httpx_client_factory=create_sse_http_client,
+        ) as (read_stream, write_stream):
+            yield read_stream, write_stream
+    elif transport == McpTransportType.api and mcp_id is not None:
+        async with open_openapi_transport(mcp_id, create_public_http_client) as (read_stream, write_stream):
+            yield read_stream, write_stream
+    elif transport == McpTransportType.stdio and mcp_id is not None:
+        async with open_stdio_transport(mcp_id, endpoint, on_process) as (read_stream, write_stream):
+            yield read_stream, write_stream
+    else:
+        raise ValueError(f'不支持的 MCP 传输类型: {transport}')
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Collection, Iterator
+
+from backend.app.client.conf import client_settings
+from backend.common.log import log
+from backend.database.redis import redis_client
+
+# 标签：(阶段, mcp_id, 工具, 结果)
+_Labels = tuple[str, str, str, str]
+
+# 不是 server 已知工具时的工具标签
+OTHER_TOOL = 'other'
+
+
+class McpMetrics:
+    """
+    mcp 调用各阶段的耗时直方图
+
+    - connect / initialize：会话池建立传输层和 initialize 握手
+    - call：工具调用，包含上游执行时间
+    - serialize：调用结果序列化为响应
+
+    记录只在进程内累加，每隔 MCP_METRICS_FLUSH_INTERVAL 秒批量累加到 Redis hash，
+    所有 worker 的数据汇总在同一个 hash 中，指标接口读取后输出为 Prometheus 文本格式
+    """
+
+    def __init__(self, key: str, buckets: list[float], flush_interval: float) -> None:
+        self.key = key
+        self.buckets = sorted(buckets)
+        self.flush_interval = flush_interval
+        # 每个标签组合：各个桶的计数（最后一个为 +Inf），以及耗时总和
+        self._counts: dict[_Labels, list[int]] = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums: dict[_Labels, float] = defaultdict(float)
+        self._last_flush = time.monotonic()
+        self._flush_task: asyncio.Task | None = None
+
+    def observe(self, phase: str, mcp_id: int, tool: str | None, outcome: str, seconds: float) -> None:
+        """
+        记录一次耗时
+
+        :param phase: 阶段
+        :param mcp_id: mcp server id
+        :param tool: 工具名称，连接阶段为空
+        :param outcome: 结果
+        :param seconds: 耗时（秒）
+        :return:
+        """
+        labels = (phase, str(mcp_id), tool or '', outcome)
+        self._counts[labels][bisect_left(self.buckets, seconds)] += 1
+        self._sums[labels] += seconds
+        if time.monotonic() - self._last_flush >= self.flush_interval and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                # 不在事件循环中（如 celery 同步上下文），等待下次记录时再落地
+                pass
+
+    @staticmethod
+    def tool_label(tool: str, known: Collection[str] | None) -> str:
+        """
+        获取工具标签，工具名称由调用方传入，只有 server 已知的工具才作为标签，避免标签数量无限增长
+
+        :param tool: 工具名称
+        :param known: server 的工具名称
+        :return:
+        """
+        return tool if known and tool in known else OTHER_TOOL
+
+    @contextmanager
+    def timer(self, phase: str, mcp_id: int, tool: str | None = None) -> Iterator[dict[str, str]]:
+        """
+        计时上下文，默认结果为 ok，异常时为 error / cancelled，可在上下文中修改 outcome
+
+        :param phase: 阶段
+        :param mcp_id: mcp server id
+        :param tool: 工具名称
+        :return:
+        """
+        state = {'outcome': 'ok'}
+        start = time.perf_counter()
+        try:
+            yield state
+        except asyncio.CancelledError:
+            if state['outcome'] == 'ok':
+                state['outcome'] = 'cancelled'
+            raise
+        except Exception:
+            if state['outcome'] == 'ok':
+                state['outcome'] = 'error'
+            raise
+        finally:
+            self.observe(phase, mcp_id, tool, state['outcome'], time.perf_counter() - start)
+
+    async def flush(self) -> None:
+        """将进程内累加的数据累加到 Redis"""
+        self._last_flush = time.monotonic()
+        if not self._counts:
+            return
+        counts, sums = self._counts, self._sums
+        self._counts = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums = defaultdict(float)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for labels, buckets in counts.items():
+                    field = '|'.join(labels)
+                    for index, count in enumerate(buckets):
+                        if count:
+                            pipe.hincrby(self.key, f'{field}|{index}', count)
+                    pipe.hincrbyfloat(self.key, f'{field}|sum', sums[labels])
+                await pipe.execute()
+        except Exception as e:
+            log.warning(f'MCP 调用指标写入失败: {e}')
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    async def render(self) -> str:
+        """
+        输出所有 worker 汇总后的 Prometheus 文本格式
+
+        :return:
+        """
+        await self.flush()
+        data = await redis_client.hgetall(self.key)
+        series: dict[str, list[float]] = defaultdict(lambda: [0.0] * (len(self.buckets) + 2))
+        for field, value in data.items():
+            labels, _, index = field.rpartition('|')
+            slot = len(self.buckets) + 1 if index == 'sum' else int(index)
+            series[labels][slot] = float(value)
+
+        name = 'wemcp_mcp_phase_seconds'
+        lines = [
+            f'# HELP {name} MCP tool call latency by phase',
+            f'# TYPE {name} histogram',
+        ]
+        bounds = [*(f'{bound:g}' for bound in self.buckets), '+Inf']
+        for labels in sorted(series):
+            # 工具名称中可能含有分隔符
+            phase, mcp_id, rest = labels.split('|', 2)
+            tool, outcome = rest.rsplit('|', 1)
+            label_text = (
+                f'phase="{phase}",mcp_id="{mcp_id}",tool="{self._escape(tool)}",outcome="{self._escape(outcome)}"'
+            )
+            values = series[labels]
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += int(count)
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_text}}} {values[-1]}')
+            lines.append(f'{name}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+# 创建调用指标单例
+mcp_metrics: McpMetrics = McpMetrics(
+    key=client_settings.MCP_METRICS_REDIS_KEY,
+    buckets=client_settings.MCP_METRICS_BUCKETS,
+    flush_interval=client_settings.MCP_METRICS_FLUSH_INTERVAL,
+)
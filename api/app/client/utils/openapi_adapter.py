@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import re
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+from urllib.parse import quote
+
+import anyio
+import httpx
+
+from mcp.server.lowlevel import Server
+from mcp.shared.memory import create_client_server_memory_streams
+from mcp.types import (
+    LATEST_PROTOCOL_VERSION,
+    CallToolRequest,
+    CallToolResult,
+    Implementation,
+    InitializeResult,
+    ListToolsRequest,
+    ListToolsResult,
+    ServerCapabilities,
+    ServerResult,
+    TextContent,
+    Tool,
+    ToolsCapability,
+)
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.common.exception import errors
+from backend.database.db import async_db_session
+
+_HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+# 展开 $ref 的最大深度，超出时（通常是循环引用）以空 schema 代替
+_MAX_REF_DEPTH = 8
+
+
+class _RefResolver:
+    """
+    展开文档内的 $ref 引用
+
+    多个引用指向同一 schema 时会重复展开，嵌套引用的展开结果随深度成倍增长，
+    因此限制展开产生的节点总数，超出时拒绝该文档
+    """
+
+    def __init__(self, document: dict[str, Any], max_nodes: int) -> None:
+        self.document = document
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def resolve(self, node: Any, depth: int = 0) -> Any:
+        if not isinstance(node, (dict, list)):
+            return node
+        if depth:
+            self.nodes += 1
+            if self.nodes > self.max_nodes:
+                raise errors.RequestError(msg='OpenAPI 文档 $ref 展开后过大')
+        if isinstance(node, list):
+            return [self.resolve(item, depth) for item in node]
+        ref = node.get('$ref')
+        if isinstance(ref, str):
+            if depth >= _MAX_REF_DEPTH or not ref.startswith('#/'):
+                return {}
+            target: Any = self.document
+            for part in ref[2:].split('/'):
+                target = target.get(part.replace('~1', '/').replace('~0', '~'), {}) if isinstance(target, dict) else {}
+            return self.resolve(target, depth + 1)
+        return {key: self.resolve(value, depth) for key, value in node.items()}
+
+
+def _tool_name(operation: dict[str, Any], method: str, path: str, used: set[str]) -> str:
+    """生成工具名称，优先使用 operationId"""
+    name = operation.get('operationId') or f'{method}_{path}'
+    name = re.sub(r'[^a-zA-Z0-9_-]+', '_', name).strip('_')[:64] or method
+    candidate, index = name, 1
+    while candidate in used:
+        index += 1
+        candidate = f'{name[:60]}_{index}'
+    used.add(candidate)
+    return candidate
+
+
+def compile_openapi(document: dict[str, Any], base_url: str | None = None) -> dict[str, Any]:
+    """
+    将 OpenAPI 文档编译为转发配置，每个接口对应一个工具
+
+    工具参数为接口的 path / query / header 参数，请求体通过 body 参数传入；
+    计算量与文档大小相关，在异步代码中应放到线程中执行
+
+    :param document: OpenAPI 文档
+    :param base_url: 接口地址，为空时使用文档中的第一个 servers
+    :return:
+    """
+    if not base_url:
+        servers = document.get('servers') or []
+        base_url = servers[0].get('url') if servers else None
+    if not base_url or not base_url.startswith(('http://', 'https://')):
+        raise errors.RequestError(msg='无法确定接口地址，请填写 base_url')
+
+    resolver = _RefResolver(document, client_settings.MCP_API_REF_MAX_NODES)
+    used: set[str] = set()
+    operations: dict[str, Any] = {}
+    for path, path_item in (document.get('paths') or {}).items():
+        path_item = resolver.resolve(path_item)
+        for method in _HTTP_METHODS:
+            operation = path_item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            properties: dict[str, Any] = {}
+            required: list[str] = []
+            parameters = []
+            for param in [*path_item.get('parameters', []), *operation.get('parameters', [])]:
+                location = param.get('in')
+                if location not in ('path', 'query', 'header') or not param.get('name'):
+                    continue
+                schema = dict(param.get('schema') or {'type': 'string'})
+                if param.get('description'):
+                    schema['description'] = param['description']
+                properties[param['name']] = schema
+                if param.get('required') or location == 'path':
+                    required.append(param['name'])
+                parameters.append({'name': param['name'], 'in': location})
+
+            body = False
+            request_body = operation.get('requestBody') or {}
+            content = request_body.get('content') or {}
+            media = content.get('application/json') or next(iter(content.values()), None)
+            if media is not None:
+                body = True
+                properties['body'] = media.get('schema') or {'type': 'object'}
+                if request_body.get('required'):
+                    required.append('body')
+
+            name = _tool_name(operation, method, path, used)
+            description = (
+                '\n\n'.join(text for text in (operation.get('summary'), operation.get('description')) if text)
+                or f'{method.upper()} {path}'
+            )
+            operations[name] = {
+                'method': method.upper(),
+                'path': path,
+                'parameters': parameters,
+                'body': body,
+                'description': description,
+                'input_schema': {'type': 'object', 'properties': properties, 'required': list(dict.fromkeys(required))},
+            }
+
+    if not operations:
+        raise errors.RequestError(msg='OpenAPI 文档中没有可用的接口')
+    info = document.get('info') or {}
+    return {
+        'title': info.get('title') or 'openapi',
+        'version': str(info.get('version') or ''),
+        'base_url': base_url.rstrip('/'),
+        'operations': operations,
+    }
+
+
+async def read_body(response: httpx.Response, limit: int) -> tuple[bytes, bool]:
+    """
+    流式读取响应体，超过上限后停止读取
+
+    :param response: 以 stream 方式发起的响应
+    :param limit: 最大字节数
+    :return: 响应体和是否被截断
+    """
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return b''.join(chunks)[:limit], True
+    return b''.join(chunks), False
+
+
+def build_tools(config: dict[str, Any]) -> list[Tool]:
+    """
+    根据转发配置生成工具列表
+
+    :param config: 转发配置
+    :return:
+    """
+    return [
+        Tool(name=name, description=operation['description'], inputSchema=operation['input_schema'])
+        for name, operation in config['operations'].items()
+    ]
+
+
+def describe_openapi(config: dict[str, Any]) -> dict[str, Any]:
+    """
+    生成与 mcp 内省结果一致的能力和工具信息，注册时直接写入 McpServer，不需要建立会话
+
+    :param config: 转发配置
+    :return:
+    """
+    initialize_result = InitializeResult(
+        protocolVersion=LATEST_PROTOCOL_VERSION,
+        capabilities=ServerCapabilities(tools=ToolsCapability(listChanged=False)),
+        serverInfo=Implementation(name=config['title'], version=config['version'] or '0'),
+    )
+    return {
+        'capabilities': initialize_result.model_dump(),
+        'tools': ListToolsResult(tools=build_tools(config)).model_dump(),
+    }
+
+
+class OpenApiAdapter:
+    """
+    进程内的 OpenAPI 转发 mcp server
+
+    通过共享连接池直接请求接口，没有冷启动，也不需要为每个 server 部署函数
+    """
+
+    def __init__(self, config: dict[str, Any], client: httpx.AsyncClient) -> None:
+        self.config = config
+        self.base_url = config['base_url']
+        self.operations: dict[str, Any] = config['operations']
+        self.client = client
+        self.server = Server(config.get('title') or 'openapi', version=config.get('version') or None)
+        self.server.request_handlers.update({
+            ListToolsRequest: self._list_tools,
+            CallToolRequest: self._call_tool,
+        })
+
+    async def _list_tools(self, _: ListToolsRequest) -> ServerResult:
+        return ServerResult(ListToolsResult(tools=build_tools(self.config)))
+
+    async def _call_tool(self, req: CallToolRequest) -> ServerResult:
+        return ServerResult(await self.call(req.params.name, req.params.arguments or {}))
+
+    async def call(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        """
+        转发工具调用
+
+        :param name: 工具名称
+        :param arguments: 工具参数
+        :return:
+        """
+        operation = self.operations.get(name)
+        if operation is None:
+            return CallToolResult(content=[TextContent(type='text', text=f'未知的工具: {name}')], isError=True)
+
+        path = operation['path']
+        params: dict[str, Any] = {}
+        headers: dict[str, str] = {}
+        for param in operation['parameters']:
+            value = arguments.get(param['name'])
+            if value is None:
+                continue
+            if param['in'] == 'path':
+                path = path.replace(f'{{{param["name"]}}}', quote(str(value), safe=''))
+            elif param['in'] == 'query':
+                params[param['name']] = value
+            else:
+                headers[param['name']] = str(value)
+        body = arguments.get('body') if operation['body'] else None
+
+        try:
+            async with self.client.stream(
+                operation['method'],
+                f'{self.base_url}{path}',
+                params=params,
+                headers=headers,
+                json=body,
+            ) as response:
+                content, truncated = await read_body(response, client_settings.MCP_API_RESPONSE_MAX_SIZE)
+        except httpx.HTTPError as e:
+            return CallToolResult(content=[TextContent(type='text', text=f'接口请求失败: {e!r}')], isError=True)
+
+        text = content.decode(response.encoding or 'utf-8', errors='replace')
+        if not truncated:
+            try:
+                # 压缩 JSON 响应，减少返回给模型的字符数
+                text = json.dumps(json.loads(text), ensure_ascii=False, separators=(',', ':'))
+            except ValueError:
+                pass
+        if response.is_error:
+            text = f'HTTP {response.status_code}: {text}'
+        return CallToolResult(content=[TextContent(type='text', text=text)], isError=response.is_error)
+
+
+@asynccontextmanager
+async def open_openapi_transport(
+    mcp_id: int, http_client_factory: Callable[..., httpx.AsyncClient]
+) -> AsyncIterator[tuple[Any, Any]]:
+    """
+    启动进程内的 OpenAPI 转发 server，通过内存流与客户端会话连接
+
+    :param mcp_id: mcp server id
+    :param http_client_factory: httpx 客户端工厂，使用共享连接池
+    :return:
+    """
+    async with async_db_session() as db:
+        config = await mcp_server_dao.get_api_config(db, mcp_id)
+    if not config:
+        raise errors.RequestError(msg=f'MCP server 未配置 OpenAPI 转发: {mcp_id}')
+
+    async with http_client_factory(headers=config.get('headers')) as client:
+        adapter = OpenApiAdapter(config, client)
+        async with create_client_server_memory_streams() as (client_streams, server_streams):
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(
+                    adapter.server.run,
+                    server_streams[0],
+                    server_streams[1],
+                    adapter.server.create_initialization_options(),
+                )
+                try:
+                    yield client_streams
+                finally:
+                    tg.cancel_scope.cancel()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+
+from datetime import date, datetime, timedelta
+
+from redis.exceptions import ResponseError
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_usage import mcp_usage_dao
+from backend.common.dataclasses import McpCaller
+from backend.common.exception import errors
+from backend.common.log import log
+from backend.database.db import async_db_session, uuid4_str
+from backend.database.redis import redis_client
+from backend.utils.timezone import timezone
+
+# 原子地检查并扣减全部计数器，任一计数器超限时不扣减，同时累加待落库的调用量
+# 携带的用户 key 与保存的摘要一致时，只检查前 ARGV[6] 个计数器（mcp server），调用量记在 ARGV[7] 字段
+# KEYS: 待落库调用量 hash，用户 key 摘要 hash，计数器 ...
+# ARGV: 计数器过期时间，本次调用次数，调用量字段，用户 key 字段，用户 key 摘要，不受 key 豁免的计数器数，
+#       豁免时的调用量字段，各计数器上限 ...
+_CONSUME_SCRIPT = """
+local ttl = ARGV[1]
+local calls = tonumber(ARGV[2])
+local field = ARGV[3]
+local n = #KEYS - 2
+if ARGV[4] ~= '' and redis.call('HGET', KEYS[2], ARGV[4]) == ARGV[5] then
+    n = tonumber(ARGV[6])
+    field = ARGV[7]
+end
+for i = 1, n do
+    local used = tonumber(redis.call('GET', KEYS[i + 2]) or '0')
+    if used + calls > tonumber(ARGV[i + 7]) then return {i, used} end
+end
+for i = 1, n do
+    if redis.call('INCRBY', KEYS[i + 2], calls) == calls then redis.call('EXPIRE', KEYS[i + 2], ttl) end
+end
+redis.call('HINCRBY', KEYS[1], field, calls)
+return {0, 0}
+"""
+
+
+class McpQuota:
+    """
+    mcp 调用配额
+
+    - 所有调用都受 mcp server 每日上限限制
+    - 直接调用：另受用户每日免费次数限制
+    - agent 调用：另受 agent 每日免费次数限制，agent 归属于登录用户，内部调用 mcp server 不再计用户次数
+    - 使用登录用户保存过的自己的 key 调用：不计免费次数，调用量单独记为 key 类型，不计费
+
+    检查和扣减通过一次 Lua 脚本调用完成；调用量先累加在 Redis 中，由定时任务批量落库
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self.usage_key = f'{prefix}:usage'
+        self.user_key_key = f'{prefix}:keys'
+        self._consume = redis_client.register_script(_CONSUME_SCRIPT)
+
+    @staticmethod
+    def _seconds_until_tomorrow(now: datetime) -> int:
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        return max(int((tomorrow - now).total_seconds()), 1)
+
+    @staticmethod
+    def _digest(user_key: str) -> str:
+        return hashlib.sha256(user_key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _counters(mcp_id: int, caller: McpCaller) -> list[tuple[str, str, int]]:
+        """获取需要检查的计数器：(类型, 主体, 上限)，mcp server 计数器在最前"""
+        counters = [('server', str(mcp_id), client_settings.MCP_QUOTA_SERVER_DAILY)]
+        if caller.agent:
+            counters.append(('agent', caller.agent, client_settings.MCP_QUOTA_AGENT_DAILY))
+        else:
+            counters.append(('user', caller.user, client_settings.MCP_QUOTA_USER_DAILY))
+        return [counter for counter in counters if counter[2] > 0]
+
+    async def set_user_key(self, user: str, mcp_id: int, user_key: str | None) -> None:
+        """
+        保存或删除用户自己的 key，只保存摘要，调用时携带的 key 与摘要一致才免计配额
+
+        :param user: 调用方标识
+        :param mcp_id: mcp server id
+        :param user_key: 用户 key，为空时删除
+        :return:
+        """
+        field = f'{user}|{mcp_id}'
+        if user_key:
+            await redis_client.hset(self.user_key_key, field, self._digest(user_key))
+        else:
+            await redis_client.hdel(self.user_key_key, field)
+
+    async def consume(self, mcp_id: int, caller: McpCaller, calls: int = 1) -> None:
+        """
+        检查并扣减配额，超限时抛出 429
+
+        :param mcp_id: mcp server id
+        :param caller: 调用方
+        :param calls: 调用次数
+        :return:
+        """
+        now = timezone.now()
+        day = f'{now:%Y%m%d}'
+        counters = self._counters(mcp_id, caller)
+        subject_type, subject = ('agent', caller.agent) if caller.agent else ('user', caller.user)
+        # 只有登录用户可以使用保存过的 key
+        key_field = f'{caller.user}|{mcp_id}' if caller.user_key and caller.user.startswith('user:') else ''
+        ttl = self._seconds_until_tomorrow(now)
+        try:
+            exceeded, _ = await self._consume(
+                keys=[self.usage_key, self.user_key_key]
+                + [f'{self.prefix}:{day}:{kind}:{name}' for kind, name, _ in counters],
+                args=[
+                    ttl + 3600,
+                    calls,
+                    f'{day}|{mcp_id}|{subject_type}|{subject}',
+                    key_field,
+                    self._digest(caller.user_key) if key_field else '',
+                    sum(kind == 'server' for kind, _, _ in counters),
+                    f'{day}|{mcp_id}|key|{caller.user}',
+                ]
+                + [limit for _, _, limit in counters],
+            )
+        except Exception as e:
+            # Redis 不可用时不影响调用
+            log.warning(f'MCP 调用配额检查失败: {e}')
+            return
+        if exceeded:
+            kind, _, limit = counters[exceeded - 1]
+            msg = {
+                'server': f'该 MCP server 今日调用次数已达上限 {limit} 次',
+                'user': f'今日免费调用次数已达上限 {limit} 次，可使用自己的 key 继续调用',
+                'agent': f'该 agent 今日免费调用次数已达上限 {limit} 次',
+            }[kind]
+            raise errors.HTTPError(code=429, msg=msg, headers={'Retry-After': str(ttl)})
+
+    async def flush(self) -> int:
+        """
+        将 Redis 中累加的调用量批量落库，先改名再读取，避免与正在进行的累加冲突
+
+        :return: 落库的调用次数
+        """
+        lock_key = f'{self.prefix}:flush:lock'
+        if not await redis_client.set(lock_key, 1, nx=True, ex=300):
+            return 0
+        try:
+            # 上次落库失败遗留的数据
+            keys = [key async for key in redis_client.scan_iter(match=f'{self.usage_key}:flushing:*')]
+            flushing = f'{self.usage_key}:flushing:{uuid4_str()}'
+            try:
+                await redis_client.rename(self.usage_key, flushing)
+                keys.append(flushing)
+            except ResponseError:
+                # 没有新的调用量
+                pass
+            total = 0
+            for key in keys:
+                rows = []
+                for field, calls in (await redis_client.hgetall(key)).items():
+                    day, mcp_id, subject_type, subject = field.split('|', 3)
+                    rows.append({
+                        'usage_date': date(int(day[:4]), int(day[4:6]), int(day[6:])),
+                        'mcp_id': int(mcp_id),
+                        'subject_type': subject_type,
+                        'subject': subject,
+                        'calls': int(calls),
+                    })
+                batch_size = client_settings.MCP_QUOTA_FLUSH_BATCH_SIZE
+                if rows:
+                    async with async_db_session.begin() as db:
+                        for offset in range(0, len(rows), batch_size):
+                            await mcp_usage_dao.add_calls(db, rows[offset : offset + batch_size])
+                await redis_client.delete(key)
+                total += sum(row['calls'] for row in rows)
+            return total
+        finally:
+            await redis_client.delete(lock_key)
+
+
+# 创建调用配额单例
+mcp_quota: McpQuota = McpQuota(prefix=client_settings.MCP_QUOTA_REDIS_PREFIX)
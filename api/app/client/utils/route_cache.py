@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.crud.crud_mcp_tool import mcp_tool_dao
+from backend.app.client.schema.mcp import GetMcpRouteDetail
+from backend.common.log import log
+from backend.database.db import async_db_session
+from backend.database.redis import redis_client
+from backend.utils.lru_cache import LRUCache
+
+
+class McpRouteCache:
+    """
+    工具调用路由缓存：进程内 LRU + Redis 两级
+
+    Redis 中每个 mcp_id 一个键，保存 endpoint、transport 等调用所需的信息并设置过期时间，
+    只有两级缓存都未命中时才查询数据库，且只查询路由所需的列
+    """
+
+    def __init__(self, prefix: str, ttl: int, local_max_size: int, local_ttl: int) -> None:
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local: LRUCache[GetMcpRouteDetail] = LRUCache(local_max_size)
+
+    def _key(self, pk: int) -> str:
+        return f'{self.prefix}:{pk}'
+
+    async def get_many(self, pks: list[int], cached_only: bool = False) -> dict[int, GetMcpRouteDetail]:
+        """
+        批量获取路由，不存在的 mcp server 不在结果中
+
+        :param pks: mcp server id 列表
+        :param cached_only: 只读取缓存，未命中时不查询数据库
+        :return:
+        """
+        result: dict[int, GetMcpRouteDetail] = {}
+        missing = []
+        for pk in pks:
+            route = self._local.get(pk)
+            if route is None:
+                missing.append(pk)
+            else:
+                result[pk] = route
+        if not missing:
+            return result
+
+        try:
+            values = await redis_client.mget([self._key(pk) for pk in missing])
+        except Exception as e:
+            log.warning(f'MCP 路由缓存读取失败: {e}')
+            values = [None] * len(missing)
+        db_missing = []
+        for pk, value in zip(missing, values):
+            if value is None:
+                db_missing.append(pk)
+                continue
+            route = GetMcpRouteDetail.model_validate_json(value)
+            self._local.set(pk, route, self.local_ttl)
+            result[pk] = route
+        if not db_missing or cached_only:
+            return result
+
+        async with async_db_session() as db:
+            rows = await mcp_server_dao.get_mcp_routes(db, db_missing)
+            tool_names: dict[int, list[str]] = defaultdict(list)
+            for mcp_id, name in await mcp_tool_dao.get_name_rows(db, db_missing):
+                tool_names[mcp_id].append(name)
+        routes = [
+            GetMcpRouteDetail.model_validate({**row._mapping, 'tool_names': tool_names.get(row.id)}) for row in rows
+        ]
+        if routes:
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for route in routes:
+                        pipe.set(self._key(route.id), route.model_dump_json(), ex=self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                log.warning(f'MCP 路由缓存写入失败: {e}')
+        for route in routes:
+            self._local.set(route.id, route, self.local_ttl)
+            result[route.id] = route
+        return result
+
+    async def get(self, pk: int, cached_only: bool = False) -> GetMcpRouteDetail | None:
+        """
+        获取路由
+
+        :param pk: mcp server id
+        :param cached_only: 只读取缓存，未命中时不查询数据库
+        :return:
+        """
+        return (await self.get_many([pk], cached_only)).get(pk)
+
+    async def invalidate(self, pk: int) -> None:
+        """
+        失效路由；其他进程的本地缓存在 MCP_ROUTE_CACHE_LOCAL_TTL 内自然过期
+
+        :param pk: mcp server id
+        :return:
+        """
+        self._local.delete(pk)
+        await redis_client.delete(self._key(pk))
+
+
+# 创建路由缓存单例
+mcp_route_cache: McpRouteCache = McpRouteCache(
+    prefix=client_settings.MCP_ROUTE_CACHE_REDIS_PREFIX,
+    ttl=client_settings.MCP_ROUTE_CACHE_TTL,
+    local_max_size=client_settings.MCP_ROUTE_CACHE_LOCAL_MAX_SIZE,
+    local_ttl=client_settings.MCP_ROUTE_CACHE_LOCAL_TTL,
+)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import dataclasses
+import math
+
+
+@dataclasses.dataclass
+class FusionHit:
+    """融合搜索的单个结果及各路得分"""
+
+    id: int
+    score: float = 0
+    rrf: float = 0
+    keyword_rank: int | None = None
+    keyword_score: float | None = None
+    semantic_rank: int | None = None
+    distance: float | None = None
+    calls: int = 0
+    popularity: float = 0
+
+
+@dataclasses.dataclass
+class FusionWeights:
+    """融合搜索权重，默认取自 MCP_FUSION_* 配置"""
+
+    rrf_k: int
+    keyword: float
+    semantic: float
+    popularity: float
+
+
+def fuse(
+    keyword_hits: list[tuple[int, float]], semantic_hits: list[tuple[int, float]], weights: FusionWeights
+) -> dict[int, FusionHit]:
+    """
+    按 RRF（Reciprocal Rank Fusion）合并两路检索结果：score = Σ weight / (k + rank)
+
+    只使用名次，不需要对 ts_rank_cd 与余弦距离这两种量纲不同的得分做归一化
+
+    :param keyword_hits: 关键字检索结果 [(id, 相关度)]，按相关度降序
+    :param semantic_hits: 语义检索结果 [(id, 余弦距离)]，按距离升序
+    :param weights: 权重
+    :return: {id: 结果}
+    """
+    hits: dict[int, FusionHit] = {}
+    for rank, (pk, score) in enumerate(keyword_hits, 1):
+        hit = hits.setdefault(pk, FusionHit(id=pk))
+        hit.keyword_rank, hit.keyword_score = rank, score
+        hit.rrf += weights.keyword / (weights.rrf_k + rank)
+    for rank, (pk, distance) in enumerate(semantic_hits, 1):
+        hit = hits.setdefault(pk, FusionHit(id=pk))
+        hit.semantic_rank, hit.distance = rank, distance
+        hit.rrf += weights.semantic / (weights.rrf_k + rank)
+    return hits
+
+
+def rerank(hits: dict[int, FusionHit], calls: dict[int, int], weights: FusionWeights) -> list[FusionHit]:
+    """
+    按调用量重排：调用量取对数后按候选中的最大值归一化到 [0, 1]，乘以权重后换算为单路排名第一的 RRF 得分
+
+    :param hits: fuse 的结果
+    :param calls: {id: 调用量}
+    :param weights: 权重
+    :return: 按得分降序、id 升序排列的结果，顺序唯一
+    """
+    max_calls = max((calls.get(pk, 0) for pk in hits), default=0)
+    scale = math.log1p(max_calls)
+    for pk, hit in hits.items():
+        hit.calls = calls.get(pk, 0)
+        hit.popularity = math.log1p(hit.calls) / scale if scale else 0
+        hit.score = hit.rrf + weights.popularity * hit.popularity / (weights.rrf_k + 1)
+    return sorted(hits.values(), key=lambda hit: (-hit.score, hit.id))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+
+from collections import defaultdict
+from typing import Any
+
+from backend.core.conf import settings
+
+# 连续的中日韩文字，或连续的英文字母、数字
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+# tsvector 中词位位置的上限，超出的位置会被 postgresql 截断为该值
+_MAX_POSITION = 16383
+
+
+def _is_cjk(token: str) -> bool:
+    return token[0] >= '\u3400'
+
+
+def segment(text: str | None) -> list[list[str]]:
+    """
+    分词：英文、数字按单词切分并转为小写，中文按相邻两字切分（与 mysql ngram 解析器 ngram_token_size=2 一致），
+    不依赖分词词典，postgresql 使用 simple 配置即可检索中文
+
+    :param text: 文本
+    :return: 每个单词或中文片段切分后的词位
+    """
+    if not text:
+        return []
+    terms = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if _is_cjk(token) and len(token) > 1:
+            terms.append([token[i : i + 2] for i in range(len(token) - 1)])
+        else:
+            terms.append([token])
+    return terms
+
+
+def _iter_tool_fields(tools: Any) -> tuple[list[str], list[str]]:
+    """
+    提取工具名称和描述
+
+    :param tools: McpServer.tools，即 ListToolsResult
+    :return: (工具名称, 工具描述)
+    """
+    names, descriptions = [], []
+    for tool in (tools or {}).get('tools') or []:
+        if not isinstance(tool, dict):
+            continue
+        if tool.get('name'):
+            names.append(tool['name'])
+        if tool.get('description'):
+            descriptions.append(tool['description'])
+    return names, descriptions
+
+
+def build_search_document(title: str | None, description: str | None, summary: str | None, tools: Any) -> str | None:
+    """
+    生成 McpServer.search_vector 的值
+
+    - postgresql：tsvector 文本，权重依次为标题 A、工具名称 B、描述与总结 C、工具描述 D，ts_rank_cd 据此排序
+    - mysql：拼接后的原始文本，由 ngram 全文索引自行分词
+
+    :param title: 标题
+    :param description: 描述
+    :param summary: 总结
+    :param tools: 工具列表
+    :return:
+    """
+    tool_names, tool_descriptions = _iter_tool_fields(tools)
+    fields = [
+        ('A', [title]),
+        ('B', tool_names),
+        ('C', [description, summary]),
+        ('D', tool_descriptions),
+    ]
+    if settings.DATABASE_TYPE != 'postgresql':
+        text = '\n'.join(value for _, values in fields for value in values if value)
+        return text or None
+
+    lexemes: dict[str, list[str]] = defaultdict(list)
+    position = 0
+    for weight, values in fields:
+        for value in values:
+            for term in segment(value):
+                for token in term:
+                    position = min(position + 1, _MAX_POSITION)
+                    lexemes[token].append(f'{position}{weight}')
+    if not lexemes:
+        return None
+    # 词位只包含字母、数字和中文，无需转义
+    return ' '.join(f"'{token}':{','.join(positions)}" for token, positions in lexemes.items())
+
+
+def build_search_query(keyword: str) -> str | None:
+    """
+    生成检索条件
+
+    - postgresql：to_tsquery 文本，各单词同时匹配，同一中文片段的词位匹配任一即可，由排序区分匹配程度；
+      最后一个英文单词按前缀匹配，输入未完成时也能命中
+    - mysql：原始关键字，由 ngram 全文索引自行分词
+
+    :param keyword: 关键字
+    :return: 关键字中没有可检索的内容时为 None
+    """
+    terms = segment(keyword)
+    if not terms:
+        return None
+    if settings.DATABASE_TYPE != 'postgresql':
+        # ngram 解析器不会索引单个字符
+        return keyword if any(len(token) > 1 for term in terms for token in term) else None
+
+    parts = []
+    for index, term in enumerate(terms):
+        if len(term) > 1:
+            parts.append(f'({" | ".join(term)})')
+        elif _is_cjk(term[0]) or index == len(terms) - 1:
+            # 单个中文字符只能匹配以其开头的词位
+            parts.append(f'{term[0]}:*')
+        else:
+            parts.append(term[0])
+    return ' & '.join(parts)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+from typing import Any, Awaitable, Callable
+
+from mcp.types import CallToolResult
+
+from backend.app.client.conf import client_settings
+from backend.app.client.utils.tool_cache import hash_arguments
+from backend.common.log import log
+from backend.database.db import uuid4_str
+from backend.database.redis import redis_client
+
+# 仅在锁仍由自己持有时释放
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    相同工具调用合并：同一 mcp server、工具和参数的调用在进行中时，后续的相同调用等待同一个结果
+
+    - 进程内：共享同一个上游调用任务，所有等待方都断开后才取消上游调用
+    - 跨进程（MCP_SINGLE_FLIGHT_REDIS 开启时）：通过 Redis 锁选出一个 worker 调用上游，
+      其他 worker 轮询该次调用的结果；结果只在调用进行中到达的请求之间共享，因此对不可缓存的工具同样适用
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self._flights: dict[str, _Flight] = {}
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def build_key(mcp_id: int, tool_name: str, arguments: dict[str, Any] | None) -> str:
+        """
+        构建合并键
+
+        :param mcp_id: mcp server id
+        :param tool_name: 工具名称
+        :param arguments: 工具参数
+        :return:
+        """
+        return f'{mcp_id}:{tool_name}:{hash_arguments(arguments)}'
+
+    async def do(self, key: str, func: Callable[[], Awaitable[CallToolResult]]) -> CallToolResult:
+        """
+        执行调用，相同键的调用进行中时直接等待其结果
+
+        :param key: 合并键
+        :param func: 实际调用
+        :return:
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            if client_settings.MCP_SINGLE_FLIGHT_REDIS:
+                task = asyncio.create_task(self._do_shared(key, func))
+            else:
+                task = asyncio.create_task(func())
+            flight = self._flights[key] = _Flight(task)
+            task.add_done_callback(lambda _: self._forget(key, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有等待方都已断开或超时，取消中的调用不再被新的请求复用
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _wait_or_lock(self, key: str, token: str) -> CallToolResult | bool:
+        """
+        获取跨进程锁，锁被其他 worker 持有时等待其结果
+
+        :param key: 合并键
+        :param token: 本次调用的锁标识
+        :return: 其他 worker 的调用结果；True 表示获取到锁；False 表示等待超时
+        """
+        lock_key = f'{self.prefix}:lock:{key}'
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + client_settings.MCP_SINGLE_FLIGHT_LOCK_TTL
+        while loop.time() < deadline:
+            if await redis_client.set(
+                lock_key, token, nx=True, px=int(client_settings.MCP_SINGLE_FLIGHT_LOCK_TTL * 1000)
+            ):
+                return True
+            leader = await redis_client.get(lock_key)
+            # 结果键带上持锁方的标识，不会读到上一轮调用的结果
+            while leader is not None and loop.time() < deadline:
+                await asyncio.sleep(client_settings.MCP_SINGLE_FLIGHT_POLL_INTERVAL)
+                value, current = await redis_client.mget(f'{self.prefix}:result:{key}:{leader}', lock_key)
+                if value is not None:
+                    return CallToolResult.model_validate_json(value)
+                if current != leader:
+                    # 持锁方调用失败，重新竞争
+                    break
+        return False
+
+    async def _do_shared(self, key: str, func: Callable[[], Awaitable[CallToolResult]]) -> CallToolResult:
+        """
+        跨进程合并，Redis 不可用或等待超时时直接调用
+
+        :param key: 合并键
+        :param func: 实际调用
+        :return:
+        """
+        token = uuid4_str()
+        try:
+            shared = await self._wait_or_lock(key, token)
+        except Exception as e:
+            log.warning(f'MCP 调用合并锁获取失败: {e}')
+            shared = False
+        if isinstance(shared, CallToolResult):
+            return shared
+        if not shared:
+            return await func()
+
+        try:
+            result = await func()
+            try:
+                await redis_client.set(
+                    f'{self.prefix}:result:{key}:{token}',
+                    result.model_dump_json(),
+                    px=int(client_settings.MCP_SINGLE_FLIGHT_RESULT_TTL * 1000),
+                )
+            except Exception as e:
+                log.warning(f'MCP 调用合并结果写入失败: {e}')
+            return result
+        finally:
+            try:
+                await self._release(keys=[f'{self.prefix}:lock:{key}'], args=[token])
+            except Exception as e:
+                log.warning(f'MCP 调用合并锁释放失败: {e}')
+
+
+# 创建调用合并单例
+single_flight: SingleFlight = SingleFlight(prefix=client_settings.MCP_SINGLE_FLIGHT_REDIS_PREFIX)
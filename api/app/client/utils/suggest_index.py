@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import dataclasses
+import heapq
+import re
+import unicodedata
+
+from bisect import bisect_left, insort
+from contextlib import suppress
+from itertools import islice
+from operator import itemgetter
+from typing import Any
+
+from redis.asyncio.client import PubSub
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.crud.crud_mcp_tool import mcp_tool_dao
+from backend.common.enums import McpSuggestType
+from backend.common.log import log
+from backend.database.db import async_db_session
+from backend.database.redis import redis_client
+
+# 拆分词的分隔符，如 web_search、fast-weather、github.com
+_SEPARATOR = re.compile(r'[\s\-_./:@,，、]+')
+# 包含匹配的 n-gram 长度，关键字短于该长度时只做前缀匹配
+_GRAM = 3
+# 全量重建的消息
+_REBUILD = '*'
+
+# 索引项的键：(类型, server id 或标准化的名称)
+_Key = tuple[McpSuggestType, Any]
+
+
+def _normalize(text: str) -> str:
+    """全角转半角并忽略大小写"""
+    return unicodedata.normalize('NFKC', text).casefold().strip()
+
+
+def _terms(normalized: str) -> set[str]:
+    """完整文本及拆分出的词，均可被前缀匹配"""
+    return {normalized, *(token for token in _SEPARATOR.split(normalized) if token)}
+
+
+def _grams(normalized: str) -> set[str]:
+    return {normalized[i : i + _GRAM] for i in range(len(normalized) - _GRAM + 1)}
+
+
+@dataclasses.dataclass(slots=True)
+class _SuggestEntry:
+    """联想项，标签和工具按名称合并，pks 为包含它的公开 server"""
+
+    type: McpSuggestType
+    text: str
+    normalized: str
+    mcp_id: int | None = None
+    pks: set[int] = dataclasses.field(default_factory=set)
+    # 写入索引时的排序依据，包含的 server 数量变化后重新写入
+    priority: tuple = ()
+
+
+class _SuggestData:
+    """
+    联想索引数据
+
+    - terms：有序的词列表，二分查找前缀
+    - full / words：词 -> 完整文本为该词 / 拆分出该词的联想项，按包含的 server 数量降序、文本长度升序排列，
+      查询时每个词只取前 size 个，热门的词不会拖慢查询
+    - grams：三元组 -> 联想项，取交集后校验是否包含关键字
+    """
+
+    def __init__(self) -> None:
+        self.servers: dict[int, list[_Key]] = {}
+        self.entries: dict[_Key, _SuggestEntry] = {}
+        self.terms: list[str] = []
+        self.full: dict[str, list[tuple[tuple, _Key]]] = {}
+        self.words: dict[str, list[tuple[tuple, _Key]]] = {}
+        self.grams: dict[str, set[_Key]] = {}
+
+    def _postings(self, entry: _SuggestEntry) -> list[tuple[dict[str, list[tuple[tuple, _Key]]], str]]:
+        return [(self.full, entry.normalized)] + [
+            (self.words, term) for term in _terms(entry.normalized) if term != entry.normalized
+        ]
+
+    def _index(self, key: _Key, entry: _SuggestEntry, grams: bool = True) -> None:
+        entry.priority = (-len(entry.pks), len(entry.text), entry.text, entry.type, entry.mcp_id or 0)
+        for postings, term in self._postings(entry):
+            if term not in self.full and term not in self.words:
+                insort(self.terms, term)
+            insort(postings.setdefault(term, []), (entry.priority, key))
+        if grams:
+            for gram in _grams(entry.normalized):
+                self.grams.setdefault(gram, set()).add(key)
+
+    def _unindex(self, key: _Key, entry: _SuggestEntry, grams: bool = True) -> None:
+        for postings, term in self._postings(entry):
+            items = postings[term]
+            del items[bisect_left(items, (entry.priority, key))]
+            if not items:
+                del postings[term]
+                if term not in self.full and term not in self.words:
+                    del self.terms[bisect_left(self.terms, term)]
+        if grams:
+            for gram in _grams(entry.normalized):
+                keys = self.grams[gram]
+                keys.discard(key)
+                if not keys:
+                    del self.grams[gram]
+
+    def _merge(self, pk: int, title: str | None, tags: list[str], tools: list[str]) -> list[tuple[_Key, bool]]:
+        """
+        将 server 计入联想项，不写入索引
+
+        :return: [(联想项的键, 是否新建)]
+        """
+        items = [(McpSuggestType.server, title)]
+        items += [(McpSuggestType.tag, name) for name in tags]
+        items += [(McpSuggestType.tool, name) for name in tools]
+        merged = []
+        for kind, text in items:
+            normalized = _normalize(text or '')
+            if not normalized:
+                continue
+            key = (kind, pk if kind == McpSuggestType.server else normalized)
+            entry = self.entries.get(key)
+            created = entry is None
+            if created:
+                mcp_id = pk if kind == McpSuggestType.server else None
+                entry = self.entries[key] = _SuggestEntry(kind, text, normalized, mcp_id)
+            elif pk in entry.pks:
+                continue
+            entry.pks.add(pk)
+            merged.append((key, created))
+        self.servers[pk] = [key for key, _ in merged]
+        return merged
+
+    @classmethod
+    def build(cls, servers: dict[int, tuple[str, list[str], list[str]]]) -> '_SuggestData':
+        """
+        全量构建，先合并全部联想项再一次性排序
+
+        :param servers: {mcp server id: (标题, 标签名称, 工具名称)}
+        :return:
+        """
+        data = cls()
+        for pk, values in servers.items():
+            data._merge(pk, *values)
+        for key, entry in data.entries.items():
+            entry.priority = (-len(entry.pks), len(entry.text), entry.text, entry.type, entry.mcp_id or 0)
+            for postings, term in data._postings(entry):
+                postings.setdefault(term, []).append((entry.priority, key))
+            for gram in _grams(entry.normalized):
+                data.grams.setdefault(gram, set()).add(key)
+        for postings in (data.full, data.words):
+            for items in postings.values():
+                items.sort()
+        data.terms = sorted(data.full.keys() | data.words.keys())
+        return data
+
+    def add(self, pk: int, title: str | None, tags: list[str], tools: list[str]) -> None:
+        """
+        写入 server，已存在时先移除
+
+        :param pk: mcp server id
+        :param title: 标题
+        :param tags: 标签名称
+        :param tools: 工具名称
+        :return:
+        """
+        self.remove(pk)
+        for key, created in self._merge(pk, title, tags, tools):
+            entry = self.entries[key]
+            if not created:
+                # 包含的 server 数量变化，按写入时的排序依据移除后重新写入
+                self._unindex(key, entry, grams=False)
+            self._index(key, entry, grams=created)
+
+    def remove(self, pk: int) -> None:
+        """
+        移除 server，标签和工具不再被任何 server 包含时一并移除
+
+        :param pk: mcp server id
+        :return:
+        """
+        for key in self.servers.pop(pk, []):
+            entry = self.entries[key]
+            removed = len(entry.pks) == 1
+            self._unindex(key, entry, grams=removed)
+            entry.pks.discard(pk)
+            if removed:
+                del self.entries[key]
+            else:
+                self._index(key, entry, grams=False)
+
+    def search(self, query: str, size: int, max_scan: int) -> list[_SuggestEntry]:
+        """
+        依次按完整文本前缀、词前缀、包含关键字排序，同级按包含的 server 数量降序、文本长度升序
+
+        :param query: 标准化的关键字
+        :param size: 数量
+        :param max_scan: 前缀匹配最多检查的词数量，以及包含匹配最多校验的联想项数量
+        :return:
+        """
+        ranks: dict[_Key, tuple[int, tuple]] = {}
+        start = bisect_left(self.terms, query)
+        for index in range(start, min(start + max_scan, len(self.terms))):
+            term = self.terms[index]
+            if not term.startswith(query):
+                break
+            for rank, postings in enumerate((self.full, self.words)):
+                for priority, key in postings.get(term, ())[:size]:
+                    if key not in ranks or (rank, priority) < ranks[key]:
+                        ranks[key] = (rank, priority)
+        if len(query) >= _GRAM and len(ranks) < size:
+            groups = sorted((self.grams.get(gram, set()) for gram in _grams(query)), key=len)
+            for key in islice(groups[0].intersection(*groups[1:]), max_scan):
+                entry = self.entries[key]
+                if key not in ranks and query in entry.normalized:
+                    ranks[key] = (2, entry.priority)
+        return [self.entries[key] for key, _ in heapq.nsmallest(size, ranks.items(), key=itemgetter(1))]
+
+
+class McpSuggestIndex:
+    """
+    mcp server 输入联想：公开 server 的标题、标签和工具名称的进程内前缀与三元组索引
+
+    启动时全量构建并订阅 Redis 频道，server 变更后发布其 id，各进程收到后只重新加载该 server；
+    订阅断开或同步失败时重新订阅并全量重建，补上期间遗漏的消息。索引只在订阅任务中修改，查询不访问数据库和 Redis
+    """
+
+    def __init__(self, channel: str, max_scan: int, retry_interval: float) -> None:
+        self.channel = channel
+        self.max_scan = max_scan
+        self.retry_interval = retry_interval
+        self._data = _SuggestData()
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    async def _load(pks: list[int] | None = None) -> dict[int, tuple[str, list[str], list[str]]]:
+        """
+        查询公开 server 的标题、标签和工具名称
+
+        :param pks: mcp server id 列表，为空时查询全部公开的 server
+        :return: {mcp server id: (标题, 标签名称, 工具名称)}
+        """
+        async with async_db_session() as db:
+            rows = await mcp_server_dao.get_suggest_rows(db, pks)
+            tag_rows = await mcp_server_dao.get_facet_tag_rows(db, pks)
+            tool_rows = await mcp_tool_dao.get_name_rows(db, pks)
+        servers = {row.id: (row.title, [], []) for row in rows if row.is_public}
+        for server_id, _, tag_name in tag_rows:
+            if server_id in servers:
+                servers[server_id][1].append(tag_name)
+        for server_id, tool_name in tool_rows:
+            if server_id in servers:
+                servers[server_id][2].append(tool_name)
+        return servers
+
+    async def refresh(self, pk: int) -> None:
+        """
+        重新加载单个 server
+
+        :param pk: mcp server id
+        :return:
+        """
+        servers = await self._load([pk])
+        if pk in servers:
+            self._data.add(pk, *servers[pk])
+        else:
+            self._data.remove(pk)
+
+    async def rebuild(self) -> int:
+        """
+        全量重建，构建完成后替换当前索引
+
+        :return: 公开的 server 数量
+        """
+        servers = await self._load()
+        self._data = _SuggestData.build(servers)
+        return len(servers)
+
+    async def publish(self, pk: int | None = None) -> None:
+        """
+        通知各进程更新索引，server 新增、公开、标题、标签或工具变更后调用
+
+        :param pk: mcp server id，为空时全量重建
+        :return:
+        """
+        try:
+            await redis_client.publish(self.channel, _REBUILD if pk is None else pk)
+        except Exception as e:
+            log.warning(f'MCP 输入联想变更发布失败: {pk}, {e}')
+
+    async def _subscribe(self) -> PubSub:
+        """订阅后再全量重建，重建期间的变更消息在之后处理，不会遗漏"""
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            await self.rebuild()
+        except BaseException:
+            await pubsub.aclose()
+            raise
+        return pubsub
+
+    async def _listen(self, pubsub: PubSub | None) -> None:
+        try:
+            while True:
+                try:
+                    if pubsub is None:
+                        pubsub = await self._subscribe()
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+                    if message is None:
+                        continue
+                    if message['data'] == _REBUILD:
+                        await self.rebuild()
+                    else:
+                        await self.refresh(int(message['data']))
+                except Exception as e:
+                    log.warning(f'MCP 输入联想索引同步异常: {e}')
+                    if pubsub is not None:
+                        with suppress(Exception):
+                            await pubsub.aclose()
+                        pubsub = None
+                    await asyncio.sleep(self.retry_interval)
+        finally:
+            if pubsub is not None:
+                with suppress(Exception):
+                    await pubsub.aclose()
+
+    async def start(self) -> None:
+        """构建索引并启动订阅任务，构建失败时由订阅任务重试"""
+        if self._task is not None and not self._task.done():
+            return
+        pubsub = None
+        try:
+            pubsub = await self._subscribe()
+        except Exception as e:
+            log.warning(f'MCP 输入联想索引构建失败: {e}')
+        self._task = asyncio.create_task(self._listen(pubsub), name='mcp-suggest-listener')
+
+    async def close(self) -> None:
+        """停止订阅任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def search(self, keyword: str, size: int) -> list[dict[str, Any]]:
+        """
+        查询联想结果
+
+        :param keyword: 关键字
+        :param size: 数量
+        :return: [{"type", "text", "mcp_id", "count"}]
+        """
+        query = _normalize(keyword)
+        if not query:
+            return []
+        return [
+            {'type': entry.type, 'text': entry.text, 'mcp_id': entry.mcp_id, 'count': len(entry.pks)}
+            for entry in self._data.search(query, size, self.max_scan)
+        ]
+
+
+# 创建输入联想索引单例
+mcp_suggest_index: McpSuggestIndex = McpSuggestIndex(
+    channel=client_settings.MCP_SUGGEST_REDIS_CHANNEL,
+    max_scan=client_settings.MCP_SUGGEST_MAX_SCAN,
+    retry_interval=client_settings.MCP_SUGGEST_RETRY_INTERVAL,
+)
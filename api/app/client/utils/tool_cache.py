@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+from collections import Counter
+from typing import Any
+
+from mcp.types import CallToolResult
+
+from backend.app.client.conf import client_settings
+from backend.common.log import log
+from backend.database.redis import redis_client
+from backend.utils.lru_cache import LRUCache
+
+
+def hash_arguments(arguments: dict[str, Any] | None) -> str:
+    """
+    计算工具参数摘要，参数按键排序后序列化，保证相同参数得到相同的摘要
+
+    :param arguments: 工具参数
+    :return:
+    """
+    canonical = json.dumps(arguments or {}, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ToolResultCache:
+    """
+    工具调用结果缓存：进程内 LRU + Redis 两级
+
+    仅缓存在 McpServer.cache_config 中声明了 TTL 的工具，配置格式::
+
+        {'ttl': 60, 'tools': {'maps_geo': 3600, 'maps_weather': 0}}
+
+    ttl 为 server 级默认值，tools 为工具级覆盖，最终 TTL 为 0 表示不缓存
+    """
+
+    def __init__(self, prefix: str, local_max_size: int, local_ttl: int) -> None:
+        self.prefix = prefix
+        self.local_ttl = local_ttl
+        self._local: LRUCache[str] = LRUCache(local_max_size)
+        self.stats: Counter[str] = Counter()
+
+    @staticmethod
+    def get_ttl(cache_config: dict[str, Any] | None, tool_name: str) -> int:
+        """
+        获取工具的缓存 TTL
+
+        :param cache_config: McpServer.cache_config
+        :param tool_name: 工具名称
+        :return:
+        """
+        if not cache_config:
+            return 0
+        tools = cache_config.get('tools') or {}
+        ttl = tools.get(tool_name, cache_config.get('ttl', 0))
+        return max(int(ttl or 0), 0)
+
+    def build_key(self, mcp_id: int, tool_name: str, arguments: dict[str, Any] | None) -> str:
+        """
+        构建缓存键
+
+        :param mcp_id: mcp server id
+        :param tool_name: 工具名称
+        :param arguments: 工具参数
+        :return:
+        """
+        return f'{self.prefix}:{mcp_id}:{tool_name}:{hash_arguments(arguments)}'
+
+    async def get(self, key: str) -> CallToolResult | None:
+        """
+        获取缓存结果
+
+        :param key: 缓存键
+        :return:
+        """
+        value = self._local.get(key)
+        if value is not None:
+            self.stats['local_hit'] += 1
+            return CallToolResult.model_validate_json(value)
+        try:
+            value = await redis_client.get(key)
+        except Exception as e:
+            log.warning(f'工具结果缓存读取失败: {e}')
+            value = None
+        if value is None:
+            self.stats['miss'] += 1
+            return None
+        self.stats['redis_hit'] += 1
+        self._local.set(key, value, self.local_ttl)
+        return CallToolResult.model_validate_json(value)
+
+    async def set(self, key: str, result: CallToolResult, ttl: int) -> None:
+        """
+        写入缓存，失败的调用结果不缓存
+
+        :param key: 缓存键
+        :param result: 工具调用结果
+        :param ttl: 过期时间（秒）
+        :return:
+        """
+        if ttl <= 0 or result.isError:
+            return
+        value = result.model_dump_json()
+        self._local.set(key, value, min(ttl, self.local_ttl))
+        try:
+            await redis_client.setex(key, ttl, value)
+        except Exception as e:
+            log.warning(f'工具结果缓存写入失败: {e}')
+
+    async def invalidate(self, mcp_id: int, tool_name: str | None = None) -> None:
+        """
+        失效缓存；其他进程的本地缓存在 MCP_TOOL_CACHE_LOCAL_TTL 内自然过期
+
+        :param mcp_id: mcp server id
+        :param tool_name: 工具名称，为空时失效该 server 的全部工具
+        :return:
+        """
+        prefix = f'{self.prefix}:{mcp_id}:{tool_name}:' if tool_name else f'{self.prefix}:{mcp_id}:'
+        self._local.delete_prefix(prefix)
+        await redis_client.delete_prefix(prefix)
+
+
+# 创建工具结果缓存单例
+tool_cache: ToolResultCache = ToolResultCache(
+    prefix=client_settings.MCP_TOOL_CACHE_REDIS_PREFIX,
+    local_max_size=client_settings.MCP_TOOL_CACHE_LOCAL_MAX_SIZE,
+    local_ttl=client_settings.MCP_TOOL_CACHE_LOCAL_TTL,
+)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Any
+
+# 展开嵌套参数的最大深度
+_MAX_DEPTH = 3
+# 单个工具保留的最大参数数量
+_MAX_PARAMS = 64
+# 工具名称最大长度，与 McpTool.name 一致
+_MAX_NAME_LENGTH = 128
+
+
+def _schema_type(schema: dict[str, Any]) -> str | None:
+    """
+    获取 JSON Schema 的类型，联合类型取第一个非 null 的类型
+
+    :param schema: JSON Schema
+    :return:
+    """
+    value = schema.get('type')
+    if isinstance(value, list):
+        value = next((item for item in value if item != 'null'), None)
+    if value is not None:
+        return value
+    for key in ('anyOf', 'oneOf', 'allOf'):
+        for item in schema.get(key) or []:
+            if isinstance(item, dict) and (value := _schema_type(item)) and value != 'null':
+                return value
+    return 'object' if isinstance(schema.get('properties'), dict) else None
+
+
+def flatten_params(schema: Any) -> list[dict[str, Any]]:
+    """
+    展开工具 inputSchema 的参数，嵌套对象的属性以 . 连接，数组元素的属性以 [] 标记，如 options.limit、items[].id
+
+    只保留名称、类型和是否必填，参数描述仍在 McpServer.tools 中
+
+    :param schema: 工具的 inputSchema
+    :return: [{"name", "type", "required"}]
+    """
+    params: list[dict[str, Any]] = []
+
+    def walk(node: dict[str, Any], prefix: str, required: bool, depth: int) -> None:
+        properties = node.get('properties')
+        if not isinstance(properties, dict):
+            return
+        required_names = set(node.get('required') or [])
+        for name, prop in properties.items():
+            if len(params) >= _MAX_PARAMS:
+                return
+            prop = prop if isinstance(prop, dict) else {}
+            path = f'{prefix}{name}'
+            value = _schema_type(prop)
+            # 父级参数可选时，子级参数也不是必填的
+            is_required = required and name in required_names
+            params.append({'name': path, 'type': value or 'any', 'required': is_required})
+            if depth >= _MAX_DEPTH:
+                continue
+            if value == 'object':
+                walk(prop, f'{path}.', is_required, depth + 1)
+            elif value == 'array' and isinstance(prop.get('items'), dict):
+                walk(prop['items'], f'{path}[].', is_required, depth + 1)
+
+    if isinstance(schema, dict):
+        walk(schema, '', True, 1)
+    return params
+
+
+def build_tool_rows(tools: Any) -> list[dict[str, Any]]:
+    """
+    将 McpServer.tools 展开为 mcp_tool 表的行，重名的工具只保留第一个
+
+    :param tools: McpServer.tools，即 ListToolsResult
+    :return: [{"name", "description", "params"}]
+    """
+    rows: dict[str, dict[str, Any]] = {}
+    for tool in (tools or {}).get('tools') or []:
+        if not isinstance(tool, dict) or not tool.get('name'):
+            continue
+        name = tool['name'][:_MAX_NAME_LENGTH]
+        if name not in rows:
+            rows[name] = {
+                'name': name,
+                'description': tool.get('description'),
+                'params': flatten_params(tool.get('inputSchema')),
+            }
+    return list(rows.values())
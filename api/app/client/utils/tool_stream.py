@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+from typing import Any, Iterator
+
+from mcp.types import CallToolResult
+from msgspec import json
+
+
+def encode_sse_event(event: str, data: Any) -> bytes:
+    """
+    编码 SSE 事件
+
+    :param event: 事件名称
+    :param data: 事件数据
+    :return:
+    """
+    return b'event: ' + event.encode() + b'\ndata: ' + json.encode(data) + b'\n\n'
+
+
+def iter_result_events(result: CallToolResult, chunk_size: int) -> Iterator[bytes]:
+    """
+    将工具调用结果拆分为 SSE 事件，超长的 text / data 字段按 chunk_size 分片输出，逐块序列化后即可释放
+
+    :param result: 工具调用结果
+    :param chunk_size: 分片大小（字符）
+    :return:
+    """
+    for index, content in enumerate(result.content):
+        block = content.model_dump(mode='json', by_alias=True, exclude_none=True)
+        field = 'text' if 'text' in block else 'data' if 'data' in block else None
+        value = block.pop(field) if field else None
+        if not value or len(value) <= chunk_size:
+            if field:
+                block[field] = value
+            yield encode_sse_event('content', {'index': index, **block, 'last': True})
+            continue
+        for offset in range(0, len(value), chunk_size):
+            yield encode_sse_event(
+                'content',
+                {
+                    'index': index,
+                    **block,
+                    field: value[offset : offset + chunk_size],
+                    'last': offset + chunk_size >= len(value),
+                },
+            )
+    yield encode_sse_event(
+        'result',
+        {'isError': result.isError, 'structuredContent': result.structuredContent},
+    )
+
+
+class ProgressQueue:
+    """
+    有界进度队列，队列满时丢弃最旧的进度通知，避免慢客户端反压到共享的 MCP 会话
+    """
+
+    _DONE = object()
+
+    def __init__(self, maxsize: int) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, item: Any) -> None:
+        if self._queue.full():
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self._queue.put_nowait(item)
+
+    async def on_progress(self, progress: float, total: float | None, message: str | None = None) -> None:
+        """MCP progress_callback"""
+        self._put({'progress': progress, 'total': total, 'message': message})
+
+    def done(self, *args: Any) -> None:
+        """标记结束，可作为 Task 的 done callback"""
+        self._put(self._DONE)
+
+    async def __aiter__(self):
+        while True:
+            item = await self._queue.get()
+            if item is self._DONE:
+                return
+            yield item
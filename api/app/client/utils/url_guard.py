@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import ipaddress
+import socket
+
+from typing import Any
+from urllib.parse import urlsplit
+
+import anyio
+import httpx
+
+from backend.app.client.conf import client_settings
+from backend.common.exception import errors
+
+
+def _is_blocked_address(address: str) -> bool:
+    """回环、内网、链路本地（含云厂商元数据地址）、保留地址等非公网地址"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not ip.is_global or ip.is_multicast
+
+
+async def get_blocked_reason(url: str) -> str | None:
+    """
+    解析地址中的主机名，任一解析结果不是公网地址时返回原因
+
+    :param url: 请求地址
+    :return:
+    """
+    if client_settings.MCP_API_ALLOW_PRIVATE_NETWORK:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return f'不支持的地址: {url}'
+    try:
+        infos = await anyio.getaddrinfo(parts.hostname, parts.port or 0, type=socket.SOCK_STREAM)
+    except OSError as e:
+        return f'无法解析主机 {parts.hostname}: {e}'
+    for *_, sockaddr in infos:
+        if _is_blocked_address(sockaddr[0]):
+            return f'不允许访问内网地址: {parts.hostname}'
+    return None
+
+
+async def check_public_url(url: str) -> None:
+    """
+    校验地址只指向公网，用于注册时检查用户填写的地址
+
+    :param url: 请求地址
+    :return:
+    """
+    reason = await get_blocked_reason(url)
+    if reason:
+        raise errors.RequestError(msg=reason)
+
+
+class PublicNetworkTransport(httpx.AsyncBaseTransport):
+    """
+    发送前校验目标地址的传输层，包装共享连接池
+
+    重定向的每一跳都会重新经过传输层，因此同样会被校验
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        reason = await get_blocked_reason(str(request.url))
+        if reason:
+            raise httpx.ConnectError(reason, request=request)
+        return await self.transport.handle_async_request(request)
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
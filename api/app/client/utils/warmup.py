@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from datetime import datetime, timedelta
+from typing import Any, Sequence
+
+from mcp import ClientSession
+
+from backend.app.client.conf import client_settings
+from backend.app.client.utils.mcp_session_pool import PooledSession, mcp_session_pool
+from backend.app.client.utils.mcp_transport import negotiate_candidates, open_transport
+from backend.common.log import log
+from backend.database.redis import redis_client
+
+
+class McpWarmer:
+    """
+    serverless 函数预热
+
+    - 详情页打开时在后台通过会话池建立会话并 ping，用户随后的调用可直接复用该会话
+    - 定时任务对近期调用量最高的 server 做一次性连接 ping，保持函数实例常驻
+    - 记录每次调用是否命中冷启动，用于调整预热策略
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self._tasks: set[asyncio.Task] = set()
+
+    def _calls_key(self, hour: datetime) -> str:
+        return f'{self.prefix}:calls:{hour:%Y%m%d%H}'
+
+    def _stats_key(self, mcp_id: int) -> str:
+        return f'{self.prefix}:stats:{mcp_id}'
+
+    async def warm(
+        self, mcp_id: int, endpoint: str, transport: str | None = None, replicas: Sequence[str] | None = None
+    ) -> bool:
+        """
+        通过会话池预热，同一 server 在 MCP_WARMUP_DEBOUNCE_SECONDS 内只预热一次
+
+        :param mcp_id: mcp server id
+        :param endpoint: mcp server 端点
+        :param transport: 传输类型
+        :param replicas: 全部副本端点
+        :return:
+        """
+        lock_key = f'{self.prefix}:lock:{mcp_id}'
+        if not await redis_client.set(lock_key, 1, nx=True, ex=client_settings.MCP_WARMUP_DEBOUNCE_SECONDS):
+            return False
+        async with mcp_session_pool.session(mcp_id, endpoint, transport, replicas) as pooled:
+            await pooled.session.send_ping()
+        return True
+
+    def warm_in_background(
+        self, mcp_id: int, endpoint: str, transport: str | None = None, replicas: Sequence[str] | None = None
+    ) -> None:
+        """
+        后台预热，不阻塞当前请求
+
+        :param mcp_id: mcp server id
+        :param endpoint: mcp server 端点
+        :param transport: 传输类型
+        :param replicas: 全部副本端点
+        :return:
+        """
+
+        async def _warm() -> None:
+            try:
+                await self.warm(mcp_id, endpoint, transport, replicas)
+            except Exception as e:
+                log.warning(f'MCP server 预热失败: {mcp_id}, {e}')
+
+        task = asyncio.create_task(_warm(), name=f'mcp-warmup-{mcp_id}')
+        # 持有任务引用，避免被垃圾回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _ping_once(endpoint: str, transport: str) -> None:
+        async with open_transport(endpoint, transport) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                await session.send_ping()
+
+    @staticmethod
+    async def ping(endpoint: str, transport: str | None = None) -> float:
+        """
+        建立一次性连接并 ping，不占用会话池，供定时任务使用
+
+        :param endpoint: mcp server 端点
+        :param transport: 传输类型
+        :return: 耗时（秒）
+        """
+        start = time.perf_counter()
+        error: Exception | None = None
+        for candidate in negotiate_candidates(transport):
+            try:
+                await asyncio.wait_for(
+                    McpWarmer._ping_once(endpoint, candidate), client_settings.MCP_SESSION_CONNECT_TIMEOUT
+                )
+                return time.perf_counter() - start
+            except Exception as e:
+                error = e
+        raise error
+
+    @staticmethod
+    def get_cold_start_seconds(pooled: PooledSession, start: float) -> float | None:
+        """
+        判断本次调用是否命中冷启动：会话在本次调用中新建，且等待耗时超过 MCP_WARMUP_COLD_START_SECONDS
+
+        :param pooled: 借用的会话
+        :param start: 开始借用会话的时间（time.monotonic）
+        :return: 冷启动耗时（秒），未命中时为空
+        """
+        elapsed = time.monotonic() - start
+        if pooled.created_time >= start and elapsed >= client_settings.MCP_WARMUP_COLD_START_SECONDS:
+            return elapsed
+        return None
+
+    async def record_call(self, mcp_id: int, *, calls: int = 1, cold_start_seconds: float | None = None) -> None:
+        """
+        记录调用量和冷启动情况
+
+        :param mcp_id: mcp server id
+        :param calls: 调用次数
+        :param cold_start_seconds: 冷启动建连耗时，未命中冷启动时为空
+        :return:
+        """
+        now = datetime.now()
+        calls_key = self._calls_key(now)
+        stats_key = self._stats_key(mcp_id)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zincrby(calls_key, calls, mcp_id)
+                pipe.expire(calls_key, (client_settings.MCP_WARMUP_WINDOW_HOURS + 1) * 3600)
+                pipe.hincrby(stats_key, 'calls', calls)
+                if cold_start_seconds is not None:
+                    pipe.hincrby(stats_key, 'cold_starts', 1)
+                    pipe.hincrbyfloat(stats_key, 'cold_start_seconds', cold_start_seconds)
+                await pipe.execute()
+        except Exception as e:
+            log.warning(f'MCP 调用统计写入失败: {e}')
+
+    async def get_top(self, limit: int) -> list[tuple[int, int]]:
+        """
+        获取近期调用量最高的 server
+
+        :param limit: 数量
+        :return: [(mcp_id, 调用量)]
+        """
+        now = datetime.now()
+        keys = [self._calls_key(now - timedelta(hours=i)) for i in range(client_settings.MCP_WARMUP_WINDOW_HOURS)]
+        result = await redis_client.zunion(keys, withscores=True)
+        result.sort(key=lambda item: item[1], reverse=True)
+        return [(int(mcp_id), int(score)) for mcp_id, score in result[:limit]]
+
+    async def get_stats(self, limit: int) -> list[dict[str, Any]]:
+        """
+        获取近期调用量最高的 server 的冷启动统计
+
+        :param limit: 数量
+        :return:
+        """
+        top = await self.get_top(limit)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for mcp_id, _ in top:
+                pipe.hgetall(self._stats_key(mcp_id))
+            stats = await pipe.execute()
+        result = []
+        for (mcp_id, recent_calls), data in zip(top, stats):
+            calls = int(data.get('calls', 0))
+            cold_starts = int(data.get('cold_starts', 0))
+            cold_start_seconds = float(data.get('cold_start_seconds', 0))
+            result.append({
+                'mcp_id': mcp_id,
+                'recent_calls': recent_calls,
+                'calls': calls,
+                'cold_starts': cold_starts,
+                'cold_start_rate': cold_starts / calls if calls else 0,
+                'avg_cold_start_seconds': cold_start_seconds / cold_starts if cold_starts else 0,
+            })
+        return result
+
+
+# 创建预热单例
+mcp_warmer: McpWarmer = McpWarmer(prefix=client_settings.MCP_WARMUP_REDIS_PREFIX)
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from anyio import sleep
 
+from backend.app.client.service.mcp_server_service import mcp_server_service
 from backend.app.task.celery import celery_app
 from backend.app.task.service.serverless_service import serverless_service
 
@@ -16,3 +17,57 @@ async def task_demo_async() -> str:
 @celery_app.task(name='create_serverless')
 async def create_serverless(mcp_server_id, function_name, image, envs, run_cmd):
     return await serverless_service.create_serverless(mcp_server_id, function_name, image, envs, run_cmd)
+
+
+@celery_app.task(name='introspect_local_mcp')
+async def introspect_local_mcp(mcp_server_id: int, command: str) -> dict:
+    """获取本地 stdio mcp server 的能力和工具列表"""
+    return await serverless_service.introspect_local(mcp_server_id, command)
+
+
+@celery_app.task(name='warm_mcp_servers')
+async def warm_mcp_servers() -> dict[str, int]:
+    """预热近期调用量最高的 mcp server"""
+    return await serverless_service.warm_top_servers()
+
+
+@celery_app.task(name='rebuild_mcp_facets')
+async def rebuild_mcp_facets() -> int:
+    """全量重建搜索分面计数，修正增量更新的偏差"""
+    return await mcp_server_service.rebuild_facets()
+
+
+@celery_app.task(name='rebuild_mcp_feed')
+async def rebuild_mcp_feed() -> int:
+    """全量重建最新列表，修正用户信息变更等未增量更新的内容"""
+    return await mcp_server_service.rebuild_feed()
+
+
+@celery_app.task(name='rebuild_mcp_search_index')
+async def rebuild_mcp_search_index() -> int:
+    """重建全文检索列，新增该列后手动执行一次回填"""
+    return await mcp_server_service.rebuild_search_index()
+
+
+@celery_app.task(name='rebuild_mcp_tools')
+async def rebuild_mcp_tools() -> int:
+    """将工具列表同步到 mcp_tool 表，新增该表后手动执行一次回填"""
+    return await mcp_server_service.rebuild_tools()
+
+
+@celery_app.task(name='embed_mcp_server')
+async def embed_mcp_server(mcp_server_id: int) -> bool:
+    """内省结果或公开状态变更后重新生成语义检索向量"""
+    return await mcp_server_service.embed_server(mcp_server_id)
+
+
+@celery_app.task(name='rebuild_mcp_embeddings')
+async def rebuild_mcp_embeddings() -> int:
+    """检查全部 mcp server 的语义检索向量，回填缺失的及切换模型后重新生成"""
+    return await mcp_server_service.rebuild_embeddings()
+
+
+@celery_app.task(name='flush_mcp_usage')
+async def flush_mcp_usage() -> int:
+    """将 mcp 调用量批量落库"""
+    return await mcp_server_service.flush_usage()
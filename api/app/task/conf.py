@@ -37,6 +37,22 @@ class TaskSettings(BaseSettings):
         #     'task': 'task_demo_async',
         #     'schedule': 10,
         # },
+        'exec-every-minute': {
+            'task': 'flush_mcp_usage',
+            'schedule': 60,
+        },
+        'exec-every-4-minutes': {
+            'task': 'warm_mcp_servers',
+            'schedule': 240,
+        },
+        'exec-every-day': {
+            'task': 'rebuild_mcp_facets',
+            'schedule': crontab('30', '3'),
+        },
+        'exec-every-day-feed': {
+            'task': 'rebuild_mcp_feed',
+            'schedule': crontab('40', '3'),
+        },
         'exec-every-sunday': {
             'task': 'delete_db_opera_log',
             'schedule': crontab('0', '0', day_of_week='6'),
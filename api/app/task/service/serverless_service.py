@@ -1,3 +1,4 @@
+import asyncio
 import traceback
 
 from typing import Any, List
@@ -6,13 +7,25 @@ from alibabacloud_tea_openapi import models as open_api_models
 from alibabacloud_tea_openapi.client import Client as OpenApiClient
 from alibabacloud_tea_util import models as util_models
 from loguru import logger
-from mcp import ClientSession
-from mcp.client.sse import sse_client
 from tenacity import retry, stop_after_attempt, wait_fixed
 
+from backend.app.client.conf import client_settings
 from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.crud.crud_mcp_tool import mcp_tool_dao
 from backend.app.client.schema.mcp import UpdateMcpServerParam
+from backend.app.client.service.mcp_server_service import mcp_server_service
+from backend.app.client.utils.circuit_breaker import circuit_breaker
+from backend.app.client.utils.etag import mcp_version
+from backend.app.client.utils.facet_index import mcp_facet_index
+from backend.app.client.utils.feed import mcp_feed
+from backend.app.client.utils.mcp_session_pool import mcp_session_pool
+from backend.app.client.utils.route_cache import mcp_route_cache
+from backend.app.client.utils.suggest_index import mcp_suggest_index
+from backend.app.client.utils.tool_cache import tool_cache
+from backend.app.client.utils.tool_index import build_tool_rows
+from backend.app.client.utils.warmup import mcp_warmer
 from backend.app.task.schema.task import CustomContainerConfig, ServerlessParam
+from backend.common.enums import McpTransportType
 from backend.core.conf import settings
 from backend.database.db import async_db_session
 
@@ -124,40 +137,41 @@ class ServerlessService:
         return result
 
     @retry(stop=stop_after_attempt(20), wait=wait_fixed(3))
-    async def create_see(self, sse_url: str) -> dict:
-        async with sse_client(sse_url) as streams:
-            async with ClientSession(streams[0], streams[1]) as session:
-                capabilities = await session.initialize()
-                logger.info(f'capabilities: {capabilities}')
-                if not capabilities:
-                    return {}
-
-                result = {
-                    'capabilities': capabilities.model_dump(),
-                }
-                capabilities = capabilities.capabilities
-                if capabilities.tools:
-                    try:
-                        tools = await session.list_tools()
-                        result.update({'tools': tools.model_dump()})
-                    except Exception:
-                        result.update({'tools': None})
-
-                if capabilities.prompts:
-                    try:
-                        prompts = await session.list_prompts()
-                        result.update({'prompts': prompts.model_dump()})
-                    except Exception:
-                        result.update({'prompts': None})
-
-                if capabilities.resources:
-                    try:
-                        resources = await session.list_resources()
-                        result.update({'resources': resources.model_dump()})
-                    except Exception:
-                        result.update({'resources': None})
-
-                return result
+    async def create_see(self, mcp_server_id: int, mcp_endpoint: str, transport: str | None = None) -> dict:
+        async with mcp_session_pool.session(mcp_server_id, mcp_endpoint, transport) as pooled:
+            session = pooled.session
+            capabilities = pooled.initialize_result
+            logger.info(f'capabilities: {capabilities}')
+            if not capabilities:
+                return {}
+
+            result = {
+                'transport': pooled.transport,
+                'capabilities': capabilities.model_dump(),
+            }
+            capabilities = capabilities.capabilities
+            if capabilities.tools:
+                try:
+                    tools = await session.list_tools()
+                    result.update({'tools': tools.model_dump()})
+                except Exception:
+                    result.update({'tools': None})
+
+            if capabilities.prompts:
+                try:
+                    prompts = await session.list_prompts()
+                    result.update({'prompts': prompts.model_dump()})
+                except Exception:
+                    result.update({'prompts': None})
+
+            if capabilities.resources:
+                try:
+                    resources = await session.list_resources()
+                    result.update({'resources': resources.model_dump()})
+                except Exception:
+                    result.update({'resources': None})
+
+            return result
 
     async def create_serverless(self, mcp_server_id, function_name, image, envs, run_cmd) -> dict:
         """
@@ -176,26 +190,28 @@ class ServerlessService:
             logger.error(e)
             return {}
         # httpTrigger.urlInternet
+        mcp_endpoint = trigger_result['body']['httpTrigger']['urlInternet']
         try:
-            sse_url = trigger_result['body']['httpTrigger']['urlInternet'] + '/sse'
-            sse_result = await self.create_see(sse_url)
+            sse_result = await self.create_see(mcp_server_id, mcp_endpoint)
             logger.info(f'sse_result: {sse_result}')
         except Exception as e:
             logger.error(e)
             traceback.print_exc()
             return {}
+        finally:
+            # worker 进程不承接工具调用，内省结束后释放会话
+            await mcp_session_pool.evict(mcp_server_id)
         # 写入数据库
         param = UpdateMcpServerParam(
-            mcp_endpoint=trigger_result['body']['httpTrigger']['urlInternet'],
+            mcp_endpoint=mcp_endpoint,
+            transport=sse_result.get('transport', None),
             capabilities=sse_result['capabilities'],
             tools=sse_result.get('tools', None),
             prompts=sse_result.get('prompts', None),
             resources=sse_result.get('resources', None),
             is_public=True,
         )
-        async with async_db_session.begin() as db:
-            rowcount = await mcp_server_dao.update_mcp_server(db, mcp_server_id, param)
-            logger.info(f'update mcp_server success: {rowcount}')
+        await self._save_introspection(mcp_server_id, param)
 
         return {
             'function_result': function_result,
@@ -203,5 +219,84 @@ class ServerlessService:
             'sse_result': sse_result,
         }
 
+    @staticmethod
+    async def _save_introspection(mcp_server_id: int, param: UpdateMcpServerParam) -> None:
+        """
+        写入内省结果
+
+        :param mcp_server_id: mcp server id
+        :param param: 内省结果
+        :return:
+        """
+        async with async_db_session.begin() as db:
+            rowcount = await mcp_server_dao.update_mcp_server(db, mcp_server_id, param)
+            logger.info(f'update mcp_server success: {rowcount}')
+            # 工具列表变更后更新全文检索和工具表
+            await mcp_server_dao.refresh_search_vector(db, mcp_server_id)
+            await mcp_tool_dao.sync_tools(db, mcp_server_id, build_tool_rows(param.tools))
+        # 重新部署后端点和工具可能变更，旧实例的熔断统计也不再适用
+        await mcp_route_cache.invalidate(mcp_server_id)
+        await tool_cache.invalidate(mcp_server_id)
+        await circuit_breaker.reset(mcp_server_id)
+        # 公开后计入搜索分面和最新列表，并重新生成语义检索向量
+        await mcp_facet_index.refresh(mcp_server_id)
+        await mcp_feed.refresh(mcp_server_id)
+        await mcp_suggest_index.publish(mcp_server_id)
+        await mcp_version.bump(mcp_server_id)
+        mcp_server_service.enqueue_embedding(mcp_server_id)
+
+    async def introspect_local(self, mcp_server_id: int, command: str) -> dict:
+        """
+        启动本地 stdio mcp server 获取能力和工具列表，不需要部署函数
+        """
+        try:
+            result = await self.create_see(mcp_server_id, command, McpTransportType.stdio)
+            logger.info(f'stdio_result: {result}')
+        except Exception as e:
+            logger.error(e)
+            return {}
+        finally:
+            # worker 进程不承接工具调用，内省结束后结束子进程
+            await mcp_session_pool.evict(mcp_server_id)
+        param = UpdateMcpServerParam(
+            capabilities=result['capabilities'],
+            tools=result.get('tools', None),
+            prompts=result.get('prompts', None),
+            resources=result.get('resources', None),
+            is_public=True,
+        )
+        await self._save_introspection(mcp_server_id, param)
+        return result
+
+    @staticmethod
+    async def warm_top_servers() -> dict[str, int]:
+        """
+        预热近期调用量最高的 mcp server，避免热门函数实例被回收后冷启动
+        """
+        top = await mcp_warmer.get_top(client_settings.MCP_WARMUP_TOP_N)
+        if not top:
+            return {'warmed': 0, 'failed': 0}
+        async with async_db_session() as db:
+            mcp_servers = await mcp_server_dao.get_mcp_list_by_ids(db, [mcp_id for mcp_id, _ in top])
+        semaphore = asyncio.Semaphore(client_settings.MCP_WARMUP_CONCURRENCY)
+
+        async def ping(mcp_server) -> bool:
+            async with semaphore:
+                try:
+                    cost = await mcp_warmer.ping(mcp_server.mcp_endpoint, mcp_server.transport)
+                except Exception as e:
+                    logger.warning(f'warm mcp_server {mcp_server.id} failed: {e}')
+                    return False
+                logger.info(f'warm mcp_server {mcp_server.id} success: {cost:.2f}s')
+                return True
+
+        # api 类型在进程内转发、stdio 类型在本机运行，没有函数实例需要保活
+        results = await asyncio.gather(*[
+            ping(s)
+            for s in mcp_servers
+            if s.mcp_endpoint and s.transport not in (McpTransportType.api, McpTransportType.stdio)
+        ])
+        return {'warmed': sum(results), 'failed': len(results) - sum(results)}
+
 
 serverless_service: ServerlessService = ServerlessService()
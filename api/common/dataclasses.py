@@ -64,3 +64,11 @@ class TokenPayload:
 @dataclasses.dataclass
 class UploadUrl:
     url: str
+
+
+@dataclasses.dataclass
+class McpCaller:
+    user: str
+    agent: str | None
+    user_key: str | None
+    timeout: float | None = None
@@ -114,6 +114,47 @@ class UserSocialType(StrEnum):
     linux_do = 'LinuxDo'
 
 
+class McpTransportType(StrEnum):
+    """MCP 传输类型"""
+
+    stdio = 'stdio'
+    sse = 'sse'
+    streamable_http = 'streamable_http'
+    api = 'api'
+
+
+class McpServerType(StrEnum):
+    """MCP server 运行方式"""
+
+    remote = 'remote'
+    local = 'local'
+
+
+class McpSearchMode(StrEnum):
+    """MCP server 搜索方式"""
+
+    keyword = 'keyword'
+    semantic = 'semantic'
+    hybrid = 'hybrid'
+    fusion = 'fusion'
+
+
+class McpSuggestType(StrEnum):
+    """MCP 输入联想类型"""
+
+    server = 'server'
+    tag = 'tag'
+    tool = 'tool'
+
+
+class McpCircuitState(StrEnum):
+    """MCP server 熔断状态"""
+
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half_open'
+
+
 class FileType(StrEnum):
     """文件类型"""
 
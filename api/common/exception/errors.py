@@ -82,6 +82,15 @@ class GatewayError(BaseExceptionMixin):
         super().__init__(msg=msg, data=data, background=background)
 
 
+class ServiceUnavailableError(BaseExceptionMixin):
+    """服务不可用异常"""
+
+    code = StandardResponseCode.HTTP_503
+
+    def __init__(self, *, msg: str = 'Service Unavailable', data: Any = None, background: BackgroundTask | None = None):
+        super().__init__(msg=msg, data=data, background=background)
+
+
 class AuthorizationError(BaseExceptionMixin):
     """授权异常"""
 
@@ -29,6 +29,9 @@ def _get_exception_code(status_code: int) -> int:
     :param status_code: HTTP 状态码
     :return:
     """
+    # 自定义错误码的前三位为对应的 HTTP 状态码，如 50401 -> 504
+    if status_code >= 10000 and status_code // 100 in STATUS_PHRASES:
+        return status_code // 100
     try:
         STATUS_PHRASES[status_code]
         return status_code
@@ -2,6 +2,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import base64
+import json
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from decimal import Decimal
 from math import ceil
 from typing import TYPE_CHECKING, Any, Generic, Sequence, TypeVar
 
@@ -11,9 +17,13 @@ from fastapi_pagination.bases import AbstractPage, AbstractParams, RawParams
 from fastapi_pagination.ext.sqlalchemy import paginate
 from fastapi_pagination.links.bases import create_links
 from pydantic import BaseModel, Field
+from sqlalchemy import and_, func, or_, select as sa_select
+from sqlalchemy.sql import operators
+
+from backend.common.exception import errors
 
 if TYPE_CHECKING:
-    from sqlalchemy import Select
+    from sqlalchemy import ColumnElement, Select
     from sqlalchemy.ext.asyncio import AsyncSession
 
 T = TypeVar('T')
@@ -126,3 +136,179 @@ async def paging_data(db: AsyncSession, select: Select) -> dict[str, Any]:
 
 # 分页依赖注入
 DependsPagination = Depends(pagination_ctx(_CustomPage))
+
+
+class CursorPageParams(BaseModel):
+    """游标分页参数，放在请求体中"""
+
+    cursor: str | None = Field(None, description='分页游标，取自上次返回的 links.next / links.prev，为空时获取第一页')
+    size: int = Field(20, gt=0, le=200, description='每页数量')
+    with_total: bool = Field(False, description='是否统计数据总条数，需要额外执行一次 COUNT')
+
+
+class _CursorLinks(BaseModel):
+    """游标分页链接"""
+
+    next: str | None = Field(None, description='下一页游标')
+    prev: str | None = Field(None, description='上一页游标')
+
+
+class CursorPageData(BaseModel, Generic[SchemaT]):
+    """游标分页统一返回模型"""
+
+    items: Sequence[SchemaT]
+    size: int = Field(description='每页数量')
+    total: int | None = Field(None, description='数据总条数，仅 with_total 时统计')
+    links: _CursorLinks = Field(description='分页链接')
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def _encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    data = json.dumps({'d': direction, 'v': [_encode_value(value) for value in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, key_count: int) -> tuple[str, list[Any]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, values = data['d'], [_decode_value(value) for value in data['v']]
+    except (ValueError, TypeError, KeyError):
+        raise errors.RequestError(msg='分页游标无效')
+    if direction not in ('next', 'prev') or len(values) != key_count:
+        raise errors.RequestError(msg='分页游标无效')
+    return direction, values
+
+
+def _get_sort_keys(select: Select) -> list[tuple[ColumnElement, bool]]:
+    """
+    从查询的排序条件中获取排序键，并追加主键保证排序唯一
+
+    :param select: 单个模型的 SQL 查询语句
+    :return: [(排序表达式, 是否降序)]
+    """
+    keys = []
+    for clause in select._order_by_clauses:
+        if getattr(clause, 'modifier', None) in (operators.desc_op, operators.asc_op):
+            keys.append((clause.element, clause.modifier is operators.desc_op))
+        else:
+            keys.append((clause, False))
+    entity = select.column_descriptions[0]['entity']
+    descending = keys[-1][1] if keys else True
+    for column in entity.__mapper__.primary_key:
+        if not any(key is column for key, _ in keys):
+            keys.append((column, descending))
+    return keys
+
+
+def _after(keys: list[tuple[ColumnElement, bool]], values: list[Any], reverse: bool) -> ColumnElement[bool]:
+    """
+    排序在游标之后的条件：(k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...，逐个判断以支持升降序混合
+
+    :param keys: 排序键
+    :param values: 游标中的排序键取值
+    :param reverse: 是否反向（向前翻页）
+    :return:
+    """
+    conditions = []
+    for index, (key, descending) in enumerate(keys):
+        later = key < values[index] if descending != reverse else key > values[index]
+        conditions.append(and_(*(keys[i][0] == values[i] for i in range(index)), later))
+    return or_(*conditions)
+
+
+async def cursor_paging_data(db: AsyncSession, select: Select, params: CursorPageParams) -> dict[str, Any]:
+    """
+    基于 SQLAlchemy 创建游标分页数据
+
+    按查询的排序条件（自动追加主键）做 keyset 分页，翻页不使用 OFFSET，不随页数变慢；
+    游标由当前页首尾数据的排序键生成，排序键不能为 NULL
+
+    :param db: 数据库会话
+    :param select: 单个模型的 SQL 查询语句，需包含排序条件
+    :param params: 游标分页参数
+    :return:
+    """
+    keys = _get_sort_keys(select)
+    direction, values = _decode_cursor(params.cursor, len(keys)) if params.cursor else ('next', None)
+    reverse = direction == 'prev'
+
+    stmt = select.order_by(None).order_by(
+        *(key.desc() if descending != reverse else key.asc() for key, descending in keys)
+    )
+    if values is not None:
+        stmt = stmt.where(_after(keys, values, reverse))
+    stmt = stmt.add_columns(*(key.label(f'_cursor_{index}') for index, (key, _) in enumerate(keys)))
+    rows = (await db.execute(stmt.limit(params.size + 1))).all()
+    has_more = len(rows) > params.size
+    rows = rows[: params.size]
+    if reverse:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # 向前翻页时当前页之后必然还有数据；向后翻页时带有游标说明之前还有数据
+        if has_more or reverse:
+            next_cursor = _encode_cursor('next', rows[-1][1:])
+        if (has_more and reverse) or (values is not None and not reverse):
+            prev_cursor = _encode_cursor('prev', rows[0][1:])
+    total = None
+    if params.with_total:
+        total = await db.scalar(sa_select(func.count()).select_from(select.order_by(None).subquery()))
+    return {
+        'items': [row[0] for row in rows],
+        'size': params.size,
+        'total': total,
+        'links': {'next': next_cursor, 'prev': prev_cursor},
+    }
+
+
+def cursor_paging_list(items: Sequence[T], keys: Sequence[Sequence[Any]], params: CursorPageParams) -> dict[str, Any]:
+    """
+    对已排序的内存列表做游标分页，用于无法在 SQL 中排序的结果，如多路检索融合后的结果
+
+    游标与 cursor_paging_data 格式一致，由排序键生成，列表在两次请求之间变化时也不会重复或遗漏排序在游标之后的数据
+
+    :param items: 按排序键升序排列的数据
+    :param keys: 与数据一一对应的排序键，需唯一
+    :param params: 游标分页参数
+    :return:
+    """
+    keys = [tuple(key) for key in keys]
+    start, end = 0, min(params.size, len(items))
+    if params.cursor and keys:
+        direction, values = _decode_cursor(params.cursor, len(keys[0]))
+        if direction == 'next':
+            start = bisect_right(keys, tuple(values))
+            end = min(start + params.size, len(items))
+        else:
+            end = bisect_left(keys, tuple(values))
+            start = max(end - params.size, 0)
+
+    next_cursor = prev_cursor = None
+    if start < end:
+        if end < len(items):
+            next_cursor = _encode_cursor('next', keys[end - 1])
+        if start > 0:
+            prev_cursor = _encode_cursor('prev', keys[start])
+    return {
+        'items': list(items[start:end]),
+        'size': params.size,
+        'total': len(items) if params.with_total else None,
+        'links': {'next': next_cursor, 'prev': prev_cursor},
+    }
@@ -44,6 +44,7 @@ class CustomErrorCode(CustomCodeBase):
     """自定义错误状态码"""
 
     CAPTCHA_ERROR = (40001, '验证码错误')
+    MCP_CALL_TIMEOUT = (50401, 'MCP 工具调用超时')
 
 
 @dataclasses.dataclass
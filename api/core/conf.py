@@ -116,6 +116,7 @@ class Settings(BaseSettings):
     ]
     CORS_EXPOSE_HEADERS: list[str] = [
         'X-Request-ID',
+        'ETag',
     ]
 
     # 中间件配置
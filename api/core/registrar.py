@@ -14,6 +14,10 @@ from fastapi_pagination import add_pagination
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.staticfiles import StaticFiles
 
+from backend.app.client.utils.mcp_session_pool import mcp_session_pool
+from backend.app.client.utils.mcp_transport import close_shared_http_pool
+from backend.app.client.utils.metrics import mcp_metrics
+from backend.app.client.utils.suggest_index import mcp_suggest_index
 from backend.common.exception.exception_handler import register_exception
 from backend.common.log import set_custom_logfile, setup_logging
 from backend.core.conf import settings
@@ -46,9 +50,18 @@ async def register_init(app: FastAPI) -> AsyncGenerator[None, None]:
         prefix=settings.REQUEST_LIMITER_REDIS_PREFIX,
         http_callback=http_limit_callback,
     )
+    # 构建 MCP 输入联想索引并订阅变更
+    await mcp_suggest_index.start()
 
     yield
 
+    # 停止 MCP 输入联想索引订阅
+    await mcp_suggest_index.close()
+    # 关闭 MCP 会话池
+    await mcp_session_pool.close()
+    await close_shared_http_pool()
+    # 写入未落地的调用指标
+    await mcp_metrics.flush()
     # 关闭 redis 连接
     await redis_client.close()
     # 关闭 limiter
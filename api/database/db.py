@@ -6,7 +6,7 @@ from typing import Annotated, AsyncGenerator
 from uuid import uuid4
 
 from fastapi import Depends
-from sqlalchemy import URL
+from sqlalchemy import URL, text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from backend.common.log import log
@@ -78,6 +78,10 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 async def create_table() -> None:
     """创建数据库表"""
     async with async_engine.begin() as coon:
+        if settings.DATABASE_TYPE == 'postgresql':
+            # mcp_embedding 表使用 pgvector，mcp_tool 表的名称索引使用 pg_trgm
+            await coon.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+            await coon.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
         await coon.run_sync(MappedBase.metadata.create_all)
 
 
@@ -0,0 +1,116 @@
+-- mcp 相关表结构升级脚本
+-- 新部署由 create_table() 按模型建表；已有数据库不会自动添加列，需按顺序执行以下语句
+-- mysql 不支持 add column if not exists，重复执行时跳过报 Duplicate column / Duplicate key name 的语句
+-- 每一段以引入该变更的需求编号标注
+
+-- user-003 工具结果缓存配置
+alter table mcp_server
+    add column cache_config json null comment '工具结果缓存配置';
+
+-- user-009 调用量，按天汇总，用于计费
+create table if not exists mcp_usage
+(
+    id           int auto_increment comment '主键 ID'
+        primary key,
+    usage_date   date        not null comment '日期',
+    mcp_id       int         not null comment 'mcp server id',
+    subject_type varchar(20) not null comment '计费主体类型',
+    subject      varchar(64) not null comment '计费主体',
+    calls        int         not null comment '调用次数',
+    created_time datetime    not null comment '创建时间',
+    updated_time datetime    null comment '更新时间',
+    constraint uix_usage_date_mcp_subject
+        unique (usage_date, mcp_id, subject_type, subject)
+);
+
+create index ix_mcp_usage_id
+    on mcp_usage (id);
+
+create index ix_mcp_usage_usage_date
+    on mcp_usage (usage_date);
+
+create index ix_mcp_usage_mcp_id
+    on mcp_usage (mcp_id);
+
+-- user-011 工具调用超时时间
+alter table mcp_server
+    add column call_timeout int null comment '工具调用超时时间（秒）';
+
+-- user-012 mcp server 组合
+create table if not exists mcp_bundle
+(
+    id           int auto_increment comment '主键 ID'
+        primary key,
+    name         varchar(64) not null comment '组合名称',
+    mcp_ids      json        not null comment 'mcp server id 列表',
+    description  text        null comment '描述',
+    user_id      int         null comment '用户关联ID',
+    created_time datetime    not null comment '创建时间',
+    updated_time datetime    null comment '更新时间',
+    constraint mcp_bundle_ibfk_1
+        foreign key (user_id) references mcp_user (id)
+            on delete set null
+)
+    comment 'mcp server 组合，通过网关以一个 mcp 端点对外提供';
+
+create index ix_mcp_bundle_id
+    on mcp_bundle (id);
+
+-- user-013 OpenAPI 转发配置
+alter table mcp_server
+    add column api_config json null comment 'OpenAPI 转发配置';
+
+-- user-016 副本端点和幂等工具
+alter table mcp_server
+    add column mcp_endpoints json null comment '副本端点',
+    add column idempotent_tools json null comment '幂等工具';
+
+-- user-018 全文检索列，执行后运行 rebuild_mcp_search_index 任务回填已有数据
+alter table mcp_server
+    add column search_vector longtext null comment '全文检索';
+
+create fulltext index ix_mcp_server_search_vector
+    on mcp_server (search_vector) with parser ngram;
+
+-- user-019 语义检索向量，以 JSON 文本保存，执行后运行 rebuild_mcp_embeddings 任务生成已有数据的向量
+create table if not exists mcp_embedding
+(
+    mcp_server_id int         not null comment 'mcp server id'
+        primary key,
+    embedding     longtext    not null comment '向量',
+    model         varchar(64) not null comment '向量模型',
+    content_hash  varchar(64) not null comment '文本摘要',
+    created_time  datetime    not null comment '创建时间',
+    updated_time  datetime    null comment '更新时间',
+    constraint mcp_embedding_ibfk_1
+        foreign key (mcp_server_id) references mcp_server (id)
+            on delete cascade
+)
+    comment 'mcp server 语义检索向量';
+
+-- user-023 工具检索表，多值索引需要 mysql 8.0.17 及以上，执行后运行 rebuild_mcp_tools 任务展开已有数据的工具
+create table if not exists mcp_tool
+(
+    id            int auto_increment comment '主键 ID'
+        primary key,
+    mcp_server_id int          not null comment 'mcp server id',
+    name          varchar(128) not null comment '工具名称',
+    description   text         null comment '工具描述',
+    params        json         not null comment '参数',
+    created_time  datetime     not null comment '创建时间',
+    updated_time  datetime     null comment '更新时间',
+    constraint uix_mcp_tool_server_name
+        unique (mcp_server_id, name),
+    constraint mcp_tool_ibfk_1
+        foreign key (mcp_server_id) references mcp_server (id)
+            on delete cascade
+);
+
+create index ix_mcp_tool_id
+    on mcp_tool (id);
+
+create index ix_mcp_tool_name
+    on mcp_tool (name);
+
+create index ix_mcp_tool_param_names
+    on mcp_tool ((cast(params -> '$[*].name' as char(128) array)));
@@ -0,0 +1,170 @@
+-- mcp 相关表结构升级脚本
+-- 新部署由 create_table() 按模型建表；已有数据库不会自动添加列，需按顺序执行以下语句，可重复执行
+-- 每一段以引入该变更的需求编号标注
+
+-- user-003 工具结果缓存配置
+alter table mcp_server
+    add column if not exists cache_config json;
+
+comment on column mcp_server.cache_config is '工具结果缓存配置';
+
+-- user-009 调用量，按天汇总，用于计费
+create table if not exists mcp_usage
+(
+    id           serial
+        primary key,
+    usage_date   date                     not null,
+    mcp_id       integer                  not null,
+    subject_type varchar(20)              not null,
+    subject      varchar(64)              not null,
+    calls        integer                  not null,
+    created_time timestamp with time zone not null,
+    updated_time timestamp with time zone,
+    constraint uix_usage_date_mcp_subject
+        unique (usage_date, mcp_id, subject_type, subject)
+);
+
+comment on column mcp_usage.usage_date is '日期';
+
+comment on column mcp_usage.mcp_id is 'mcp server id';
+
+comment on column mcp_usage.subject_type is '计费主体类型';
+
+comment on column mcp_usage.subject is '计费主体';
+
+comment on column mcp_usage.calls is '调用次数';
+
+create index if not exists ix_mcp_usage_id
+    on mcp_usage (id);
+
+create index if not exists ix_mcp_usage_usage_date
+    on mcp_usage (usage_date);
+
+create index if not exists ix_mcp_usage_mcp_id
+    on mcp_usage (mcp_id);
+
+-- user-011 工具调用超时时间
+alter table mcp_server
+    add column if not exists call_timeout integer;
+
+comment on column mcp_server.call_timeout is '工具调用超时时间（秒）';
+
+-- user-012 mcp server 组合
+create table if not exists mcp_bundle
+(
+    id           serial
+        primary key,
+    name         varchar(64)              not null,
+    mcp_ids      json                     not null,
+    description  text,
+    user_id      integer
+        references mcp_user
+            on delete set null,
+    created_time timestamp with time zone not null,
+    updated_time timestamp with time zone
+);
+
+comment on table mcp_bundle is 'mcp server 组合，通过网关以一个 mcp 端点对外提供';
+
+comment on column mcp_bundle.name is '组合名称';
+
+comment on column mcp_bundle.mcp_ids is 'mcp server id 列表';
+
+comment on column mcp_bundle.description is '描述';
+
+comment on column mcp_bundle.user_id is '用户关联ID';
+
+create index if not exists ix_mcp_bundle_id
+    on mcp_bundle (id);
+
+-- user-013 OpenAPI 转发配置
+alter table mcp_server
+    add column if not exists api_config json;
+
+comment on column mcp_server.api_config is 'OpenAPI 转发配置';
+
+-- user-016 副本端点和幂等工具
+alter table mcp_server
+    add column if not exists mcp_endpoints json,
+    add column if not exists idempotent_tools json;
+
+comment on column mcp_server.mcp_endpoints is '副本端点';
+
+comment on column mcp_server.idempotent_tools is '幂等工具';
+
+-- user-018 全文检索列，执行后运行 rebuild_mcp_search_index 任务回填已有数据
+alter table mcp_server
+    add column if not exists search_vector tsvector;
+
+comment on column mcp_server.search_vector is '全文检索';
+
+create index if not exists ix_mcp_server_search_vector
+    on mcp_server using gin (search_vector);
+
+-- user-019 语义检索向量，维度与 MCP_EMBEDDING_DIMENSION 一致，执行后运行 rebuild_mcp_embeddings 任务生成已有数据的向量
+create extension if not exists vector;
+
+create table if not exists mcp_embedding
+(
+    mcp_server_id integer                  not null
+        primary key
+        references mcp_server
+            on delete cascade,
+    embedding     vector(512)              not null,
+    model         varchar(64)              not null,
+    content_hash  varchar(64)              not null,
+    created_time  timestamp with time zone not null,
+    updated_time  timestamp with time zone
+);
+
+comment on table mcp_embedding is 'mcp server 语义检索向量';
+
+comment on column mcp_embedding.mcp_server_id is 'mcp server id';
+
+comment on column mcp_embedding.embedding is '向量';
+
+comment on column mcp_embedding.model is '向量模型';
+
+comment on column mcp_embedding.content_hash is '文本摘要';
+
+create index if not exists ix_mcp_embedding_hnsw
+    on mcp_embedding using hnsw (embedding vector_cosine_ops);
+
+-- user-023 工具检索表，执行后运行 rebuild_mcp_tools 任务展开已有数据的工具
+create extension if not exists pg_trgm;
+
+create table if not exists mcp_tool
+(
+    id            serial
+        primary key,
+    mcp_server_id integer                  not null
+        references mcp_server
+            on delete cascade,
+    name          varchar(128)             not null,
+    description   text,
+    params        jsonb                    not null,
+    created_time  timestamp with time zone not null,
+    updated_time  timestamp with time zone,
+    constraint uix_mcp_tool_server_name
+        unique (mcp_server_id, name)
+);
+
+comment on column mcp_tool.mcp_server_id is 'mcp server id';
+
+comment on column mcp_tool.name is '工具名称';
+
+comment on column mcp_tool.description is '工具描述';
+
+comment on column mcp_tool.params is '参数';
+
+create index if not exists ix_mcp_tool_id
+    on mcp_tool (id);
+
+create index if not exists ix_mcp_tool_name
+    on mcp_tool (name);
+
+create index if not exists ix_mcp_tool_params
+    on mcp_tool using gin (params jsonb_path_ops);
+
+create index if not exists ix_mcp_tool_name_trgm
+    on mcp_tool using gin (name gin_trgm_ops);
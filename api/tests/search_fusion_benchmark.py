@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+融合搜索基准测试
+
+在 postgresql 中生成 10 万个合成 mcp server（标题、描述、工具、全文检索列、向量、前一天的调用量），
+对比 keyword / semantic / hybrid / fusion 四种搜索方式的延迟和首页结果的准确率（与查询同主题的比例），
+并单独统计融合阶段（RRF 合并、调用量重排、分页）的耗时
+
+需连接单独的测试数据库，先执行 scripts/init_data.py 建表：
+    python tests/search_fusion_benchmark.py seed [数量]
+    python tests/search_fusion_benchmark.py run [每种方式的查询轮数]
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from datetime import timedelta
+
+from sqlalchemy import insert, select
+
+from backend.app.client.conf import client_settings
+from backend.app.client.crud.crud_mcp_server import mcp_server_dao
+from backend.app.client.model import McpEmbedding, McpServer, McpUsage, McpUser
+from backend.app.client.schema.mcp import SearchMcpParam
+from backend.app.client.service.mcp_server_service import mcp_server_service
+from backend.app.client.utils.embedding import build_embedding_text, mcp_embedder
+from backend.app.client.utils.search_fusion import fuse, rerank
+from backend.app.client.utils.search_index import build_search_document
+from backend.common.enums import McpSearchMode
+from backend.common.pagination import cursor_paging_data, cursor_paging_list
+from backend.database.db import async_db_session
+from backend.utils.timezone import timezone
+
+# (英文关键字, 中文描述, 工具名称)
+TOPICS = [
+    ('weather', '天气预报', 'forecast'),
+    ('maps', '地图导航', 'route'),
+    ('postgres', '数据库查询', 'sql'),
+    ('github', '代码仓库', 'issue'),
+    ('search', '网页搜索', 'web'),
+    ('browser', '浏览器自动化', 'click'),
+    ('translate', '多语言翻译', 'translate'),
+    ('stock', '股票行情', 'quote'),
+    ('email', '邮件发送', 'send'),
+    ('calendar', '日程管理', 'event'),
+    ('pdf', '文档解析', 'extract'),
+    ('image', '图片生成', 'draw'),
+    ('slack', '团队消息', 'message'),
+    ('filesystem', '文件读写', 'read'),
+    ('news', '新闻资讯', 'headline'),
+    ('music', '音乐播放', 'play'),
+    ('travel', '酒店机票', 'booking'),
+    ('crypto', '加密货币', 'price'),
+    ('payment', '支付订单', 'charge'),
+    ('kubernetes', '容器集群', 'deploy'),
+]
+ADJECTIVES = ['fast', 'simple', 'open', 'smart', 'tiny', 'pro', 'cloud', 'local', 'lite', 'super']
+MODES = [McpSearchMode.keyword, McpSearchMode.semantic, McpSearchMode.hybrid, McpSearchMode.fusion]
+BATCH_SIZE = 1000
+PAGE_SIZE = 20
+
+
+def make_server(index: int, rng: random.Random) -> tuple[int, dict]:
+    """生成合成 server，描述中混入其他主题的词，使单一检索方式出现误差"""
+    topic = rng.randrange(len(TOPICS))
+    other = rng.randrange(len(TOPICS))
+    name, phrase, tool = TOPICS[topic]
+    title = f'{rng.choice(ADJECTIVES)}-{name}-{index}'
+    description = f'{phrase}服务，支持{TOPICS[other][1]}相关的扩展能力'
+    tools = {
+        'tools': [
+            {'name': f'{name}_{tool}', 'description': f'{phrase}接口', 'inputSchema': {'type': 'object'}},
+            {'name': f'{TOPICS[other][2]}_helper', 'description': TOPICS[other][1], 'inputSchema': {'type': 'object'}},
+        ]
+    }
+    return topic, {'title': title, 'description': description, 'tools': tools}
+
+
+async def seed(count: int) -> None:
+    rng = random.Random(42)
+    async with async_db_session.begin() as db:
+        user = McpUser(username='bench', nickname='bench', password=None, salt=None, email='bench@example.com')
+        db.add(user)
+        await db.flush()
+        user_id = user.id
+
+    now = timezone.now()
+    yesterday = now.date() - timedelta(days=1)
+    for start in range(0, count, BATCH_SIZE):
+        servers = [make_server(index, rng)[1] for index in range(start, min(start + BATCH_SIZE, count))]
+        rows = [
+            {
+                **server,
+                'user_id': user_id,
+                'is_public': True,
+                'server_type': 'remote',
+                'search_vector': build_search_document(server['title'], server['description'], None, server['tools']),
+                'created_time': now,
+            }
+            for server in servers
+        ]
+        texts = [
+            build_embedding_text(server['title'], server['description'], None, server['tools']) for server in servers
+        ]
+        embeddings = await mcp_embedder.embed(texts)
+        async with async_db_session.begin() as db:
+            pks = (await db.scalars(insert(McpServer).returning(McpServer.id), rows)).all()
+            await db.execute(
+                insert(McpEmbedding),
+                [
+                    {
+                        'mcp_server_id': pk,
+                        'embedding': embedding,
+                        'model': mcp_embedder.model,
+                        'content_hash': '',
+                        'created_time': now,
+                    }
+                    for pk, embedding in zip(pks, embeddings)
+                ],
+            )
+            # 调用量服从 Zipf 分布，约 5% 的 server 有调用
+            usage = [
+                {
+                    'usage_date': yesterday,
+                    'mcp_id': pk,
+                    'subject_type': 'user',
+                    'subject': 'bench',
+                    'calls': int(100_000 / rng.randint(1, 20_000)),
+                    'created_time': now,
+                }
+                for pk in pks
+                if rng.random() < 0.05
+            ]
+            if usage:
+                await db.execute(insert(McpUsage), usage)
+        print(f'seeded {start + len(servers)}/{count}')
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def search(obj: SearchMcpParam) -> list:
+    if obj.mode == McpSearchMode.fusion:
+        return (await mcp_server_service.search_fusion(obj))['items']
+    async with async_db_session() as db:
+        stmt = await mcp_server_service.get_select(
+            keyword=obj.keyword, mode=obj.mode, semantic_weight=obj.semantic_weight
+        )
+        await mcp_server_service.prepare_search(db, obj.mode)
+        return (await cursor_paging_data(db, stmt, obj))['items']
+
+
+async def run(rounds: int) -> None:
+    async with async_db_session() as db:
+        total = len((await db.scalars(select(McpServer.id).where(McpServer.is_public.is_(True)))).all())
+    print(f'catalog: {total} public servers, candidates per retriever: {client_settings.MCP_FUSION_CANDIDATES}')
+    queries = [(topic, keyword) for topic, (name, phrase, _) in enumerate(TOPICS) for keyword in (name, phrase)]
+
+    print(f'{"mode":<10}{"p50 ms":>10}{"p95 ms":>10}{"precision@20":>15}')
+    for mode in MODES:
+        latencies, precisions = [], []
+        for _ in range(rounds):
+            for topic, keyword in queries:
+                obj = SearchMcpParam(keyword=keyword, mode=mode, size=PAGE_SIZE)
+                start = time.perf_counter()
+                items = await search(obj)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits = sum(TOPICS[topic][0] in item.title for item in items)
+                precisions.append(hits / PAGE_SIZE)
+        print(
+            f'{mode:<10}{statistics.median(latencies):>10.1f}{percentile(latencies, 0.95):>10.1f}'
+            f'{statistics.mean(precisions):>15.3f}'
+        )
+
+    # 融合阶段单独计时，候选取自真实检索
+    limit = client_settings.MCP_FUSION_CANDIDATES
+    weights = mcp_server_service.get_fusion_weights()
+    embedding = (await mcp_embedder.embed(['天气预报']))[0]
+    async with async_db_session() as db:
+        keyword_hits = await mcp_server_dao.get_keyword_candidates(db, '天气预报', None, None, None, limit)
+        semantic_hits = await mcp_server_dao.get_semantic_candidates(db, embedding, None, None, None, limit)
+    calls = {pk: random.randint(0, 1000) for pk, _ in keyword_hits + semantic_hits}
+    iterations = 1000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        ranked = rerank(fuse(keyword_hits, semantic_hits, weights), calls, weights)
+        cursor_paging_list(ranked, [(-hit.score, hit.id) for hit in ranked], SearchMcpParam(size=PAGE_SIZE))
+    elapsed = (time.perf_counter() - start) / iterations * 1000
+    print(f'fusion stage: {elapsed:.3f} ms for {len(keyword_hits)} + {len(semantic_hits)} candidates')
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    if command == 'seed':
+        asyncio.run(seed(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000))
+    else:
+        asyncio.run(run(int(sys.argv[2]) if len(sys.argv) > 2 else 3))
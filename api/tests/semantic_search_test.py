@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语义搜索检查
+
+使用本地哈希向量（结果确定，不依赖外部服务）为几个不同主题的 mcp server 生成向量，
+按 semantic / hybrid 方式搜索，检查排序、未变更时跳过重新生成、取消公开后移除向量
+
+需连接 postgresql 测试数据库（安装 vector 扩展），先执行 scripts/init_data.py 建表：
+    python tests/semantic_search_test.py
+"""
+
+import asyncio
+
+from sqlalchemy import delete, select
+
+from backend.app.client.conf import client_settings
+from backend.app.client.model import McpEmbedding, McpServer, McpUser
+from backend.app.client.schema.mcp import SearchMcpParam
+from backend.app.client.service import mcp_server_service as service_module
+from backend.app.client.service.mcp_server_service import mcp_server_service
+from backend.app.client.utils.embedding import HashEmbedder
+from backend.app.client.utils.search_index import build_search_document
+from backend.common.enums import McpSearchMode
+from backend.common.pagination import cursor_paging_data
+from backend.database.db import async_db_session
+
+# (标题, 描述, 工具名称, 工具描述)
+SERVERS = [
+    ('semantic-test-weather', '天气预报服务，查询城市实时天气和未来七天预报', 'weather_forecast', '查询天气预报'),
+    ('semantic-test-maps', '地图导航服务，规划驾车和步行路线', 'maps_route', '规划路线'),
+    ('semantic-test-postgres', '数据库查询服务，执行只读 SQL', 'postgres_query', '执行 SQL 查询'),
+]
+
+
+async def seed() -> tuple[int, list[int]]:
+    async with async_db_session.begin() as db:
+        user = McpUser(
+            username='semantic_test',
+            nickname='semantic_test',
+            password=None,
+            salt=None,
+            email='semantic_test@example.com',
+        )
+        db.add(user)
+        await db.flush()
+        pks = []
+        for title, description, tool, tool_description in SERVERS:
+            tools = {'tools': [{'name': tool, 'description': tool_description, 'inputSchema': {'type': 'object'}}]}
+            server = McpServer(title=title, description=description, tools=tools, is_public=True, user_id=user.id)
+            server.search_vector = build_search_document(title, description, None, tools)
+            db.add(server)
+            await db.flush()
+            pks.append(server.id)
+        return user.id, pks
+
+
+async def search(keyword: str, mode: McpSearchMode) -> list[str]:
+    obj = SearchMcpParam(keyword=keyword, mode=mode, size=20)
+    async with async_db_session() as db:
+        stmt = await mcp_server_service.get_select(
+            keyword=obj.keyword, mode=obj.mode, semantic_weight=obj.semantic_weight
+        )
+        await mcp_server_service.prepare_search(db, obj.mode)
+        items = (await cursor_paging_data(db, stmt, obj))['items']
+    return [item.title for item in items if item.title.startswith('semantic-test-')]
+
+
+async def cleanup(user_id: int, pks: list[int]) -> None:
+    async with async_db_session.begin() as db:
+        await db.execute(delete(McpServer).where(McpServer.id.in_(pks)))
+        await db.execute(delete(McpUser).where(McpUser.id == user_id))
+
+
+async def main() -> None:
+    # 固定使用本地哈希向量，与配置的向量服务无关
+    service_module.mcp_embedder = HashEmbedder(client_settings.MCP_EMBEDDING_DIMENSION)
+    user_id, pks = await seed()
+    try:
+        for pk in pks:
+            assert await mcp_server_service.embed_server(pk), f'向量未生成: {pk}'
+            assert not await mcp_server_service.embed_server(pk), f'文本未变更时应跳过: {pk}'
+        print('embedded', pks)
+
+        for keyword, expected in (
+            ('天气预报', SERVERS[0][0]),
+            ('驾车路线规划', SERVERS[1][0]),
+            ('SQL 查询', SERVERS[2][0]),
+        ):
+            for mode in (McpSearchMode.semantic, McpSearchMode.hybrid):
+                titles = await search(keyword, mode)
+                print(f'{mode:<10}{keyword:<12}{titles}')
+                assert titles, f'{mode} {keyword} 没有结果'
+                assert titles[0] == expected, f'{mode} {keyword} 排序错误: {titles}'
+
+        # 取消公开后移除向量，语义搜索不再返回
+        async with async_db_session.begin() as db:
+            server = await db.get(McpServer, pks[0])
+            server.is_public = False
+        assert not await mcp_server_service.embed_server(pks[0])
+        async with async_db_session() as db:
+            assert (
+                await db.scalar(select(McpEmbedding.mcp_server_id).where(McpEmbedding.mcp_server_id == pks[0])) is None
+            )
+        titles = await search('天气预报', McpSearchMode.semantic)
+        assert SERVERS[0][0] not in titles, titles
+        print('unpublished', titles)
+    finally:
+        await cleanup(user_id, pks)
+    print('ok')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
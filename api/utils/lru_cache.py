@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    """带过期时间的进程内 LRU 缓存（非线程安全，仅在事件循环内使用）"""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> V | Any:
+        """
+        获取缓存
+
+        :param key: 缓存键
+        :param default: 未命中或已过期时的返回值
+        :return:
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expire_at, value = item
+        if expire_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: float) -> None:
+        """
+        写入缓存
+
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 过期时间（秒）
+        :return:
+        """
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        删除缓存
+
+        :param key: 缓存键
+        :return:
+        """
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        删除指定前缀的字符串键
+
+        :param prefix: 前缀
+        :return:
+        """
+        for key in [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
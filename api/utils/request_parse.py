@@ -7,7 +7,7 @@ from fastapi import Request
 from ip2loc import XdbSearcher
 from user_agents import parse
 
-from backend.common.dataclasses import IpInfo, UserAgentInfo
+from backend.common.dataclasses import IpInfo, McpCaller, UserAgentInfo
 from backend.common.log import log
 from backend.core.conf import settings
 from backend.core.path_conf import IP2REGION_XDB
@@ -35,6 +35,35 @@ def get_request_ip(request: Request) -> str:
     return request.client.host
 
 
+def parse_mcp_caller(request: Request) -> McpCaller:
+    """
+    解析 mcp 工具调用方：登录用户以昵称区分，未登录时以 IP 区分；X-Request-Timeout 为客户端指定的超时时间（秒）
+    X-Agent-Id 只对登录用户生效，agent 归属于该用户，未登录时按普通调用计
+
+    :param request: FastAPI 请求对象
+    :return:
+    """
+    user = request.scope.get('user')
+    try:
+        timeout = float(request.headers.get('X-Request-Timeout', 0))
+    except ValueError:
+        timeout = None
+    agent = None
+    if isinstance(user, dict) and user.get('nickname'):
+        caller = f'user:{user["nickname"]}'
+        agent_id = (request.headers.get('X-Agent-Id') or '')[:32]
+        if agent_id:
+            agent = f'{caller}/{agent_id}'
+    else:
+        caller = f'ip:{get_request_ip(request)}'
+    return McpCaller(
+        user=caller,
+        agent=agent,
+        user_key=request.headers.get('X-Mcp-User-Key') or None,
+        timeout=timeout if timeout and timeout > 0 else None,
+    )
+
+
 async def get_location_online(ip: str, user_agent: str) -> dict | None:
     """
     在线获取 IP 地址属地，无法保证可用性，准确率较高